@@ -0,0 +1,92 @@
+import json
+import sys
+import time
+
+import numpy as np
+
+from visualizacaoconwaycrypt import create_mapping, evolve, seed_grids
+
+
+# Busca padrões iniciais aleatórios para cada caractere, sem colisões.
+#
+# Os candidatos são grades aleatórias (cada célula viva com probabilidade density), geradas e evoluídas em lotes de
+# batch grades de uma vez. Um candidato é descartado se o estado final estiver morto (todas as casas apagadas) ou for
+# igual ao de um padrão já escolhido (o estado final empacotado em bytes é a chave de um conjunto). Os padrões aceitos
+# são dados aos caracteres na ordem do alfabeto.
+#
+# O resultado só depende de seed e da ordem dos caracteres: a mesma busca sempre gera a mesma tabela, e aumentar o
+# alfabeto no fim não muda os padrões dos caracteres anteriores. Os padrões de reserved (por exemplo,
+# PREDEFINED_PATTERNS) são mantidos para os seus caracteres, menos os que morrem ou colidem. Retorna
+# {caractere: [(x, y), ...]}, no formato de PREDEFINED_PATTERNS, válido para o grid_size e o steps usados na busca.
+def find_patterns(characters, grid_size=(10, 10), steps=10, density=0.3, batch=4096, seed=0, reserved=None, max_batches=1000):
+    chars = list(dict.fromkeys(characters))  # Sem repetições, na ordem em que aparecem
+    rows, cols = grid_size
+    patterns = {}
+    seen = set()
+
+    kept = [char for char in chars if reserved and char in reserved]
+    if kept:
+        finals = evolve(seed_grids([reserved[char] for char in kept], grid_size), steps)
+        for char, final in zip(kept, finals):
+            key = np.packbits(final).tobytes()
+            if not final.any() or key in seen:
+                continue  # Padrão que morre ou colide: o caractere recebe um padrão da busca
+            seen.add(key)
+            patterns[char] = [(int(x), int(y)) for x, y in reserved[char]]
+
+    missing = iter([char for char in chars if char not in patterns])
+    char = next(missing, None)
+    rng = np.random.default_rng(seed)
+    for _ in range(max_batches):
+        if char is None:
+            break
+        seeds = (rng.random((batch, rows, cols)) < density).astype(np.uint8)
+        finals = evolve(seeds, steps).reshape(batch, -1)
+        keys = np.packbits(finals, axis=1)
+        for index in np.flatnonzero(finals.any(axis=1)):
+            key = keys[index].tobytes()
+            if key in seen:
+                continue
+            seen.add(key)
+            patterns[char] = [(int(x), int(y)) for x, y in zip(*np.nonzero(seeds[index]))]
+            char = next(missing, None)
+            if char is None:
+                break
+    if char is not None:
+        raise RuntimeError(f"só foram encontrados {len(patterns)} padrões distintos em {max_batches} lotes")
+    return {char: patterns[char] for char in chars}
+
+
+# Caracteres imprimíveis com código de start até stop (exclusive): 0x20-0x7F é o ASCII imprimível
+def printable_alphabet(start=0x20, stop=0x7F):
+    return [chr(code) for code in range(start, stop) if chr(code).isprintable() and not 0xD800 <= code < 0xE000]
+
+
+# Salva a tabela de padrões em JSON, junto com o tamanho da grade e o número de passos para os quais ela vale
+def save_patterns(path, patterns, grid_size=(10, 10), steps=10):
+    table = {"grid_size": list(grid_size), "steps": steps, "patterns": {char: [list(p) for p in positions] for char, positions in patterns.items()}}
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(table, file, ensure_ascii=False)
+
+
+# Lê uma tabela salva com save_patterns. Retorna (patterns, grid_size, steps)
+def load_patterns(path):
+    with open(path, encoding="utf-8") as file:
+        table = json.load(file)
+    patterns = {char: [tuple(p) for p in positions] for char, positions in table["patterns"].items()}
+    return patterns, tuple(table["grid_size"]), table["steps"]
+
+
+# Exemplo: tabela para o ASCII imprimível ou, com o argumento "unicode", para alguns milhares de caracteres
+
+if __name__ == "__main__":
+    alphabet = printable_alphabet(0x20, 0x3000) if sys.argv[1:] == ["unicode"] else printable_alphabet()
+    grid_size, steps = (10, 10), 10
+
+    start = time.perf_counter()
+    patterns = find_patterns(alphabet, grid_size, steps)
+    print(f"{len(patterns)} padrões em {time.perf_counter() - start:.2f} s")
+    save_patterns("padroes.json", patterns, grid_size, steps)
+
+    mapping = create_mapping(alphabet, steps, grid_size, patterns)
+    print("Padrões distintos:", len(set(mapping.values())) == len(mapping))
@@ -0,0 +1,255 @@
+import hashlib
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+# Segundo modo de criptografia: em vez de uma tabela de substituição, o Jogo da Vida em um toro grande é usado como
+# gerador de fluxo de chave (keystream). A chave (e um nonce) definem o tabuleiro inicial, cada geração vira
+# rows * cols / 8 bytes de chave e a mensagem é combinada com eles por XOR; descriptografar é repetir o XOR com o mesmo
+# fluxo. Depois de algumas centenas de gerações só uns 4% das células ficam vivas e o tabuleiro acaba em padrões
+# estáveis ou periódicos, então as gerações não são usadas diretamente: cada palavra passa por um embaralhamento
+# (whiten) junto com um contador secreto derivado da chave, o que deixa cerca de metade dos bits em 1 e impede que o
+# fluxo se repita, e um tabuleiro que parou de mudar é ressemeado a partir da chave. É um experimento: nada disso
+# torna o Jogo da Vida um gerador criptograficamente seguro.
+
+# Formato do arquivo: cabeçalho (MAGIC, linhas, colunas, gerações descartadas, nonce) seguido dos bytes cifrados.
+# CGK2: fluxo embaralhado por whiten (os arquivos CGKS da versão sem embaralhamento não são mais aceitos)
+MAGIC = b"CGK2"
+_HEADER = struct.Struct("<4sIII16s")
+_ONE = np.uint64(1)
+_HIGH = np.uint64(63)
+_MIX = (np.uint64(30), np.uint64(0xBF58476D1CE4E5B9), np.uint64(27), np.uint64(0x94D049BB133111EB), np.uint64(31))
+
+
+# Passo do Jogo da Vida em um tabuleiro empacotado: uma matriz (rows, cols / 64) de uint64 em que o bit j da palavra w
+# da linha x é a célula (x, 64 * w + j), com as bordas ligadas (toro). A contagem de vizinhos é feita com somadores
+# bit a bit, 64 células por operação.
+def packed_life_step(board):
+    # Vizinhos da mesma linha: a oeste (coluna - 1) e a leste (coluna + 1), passando o bit de uma palavra para a outra
+    west = (board << _ONE) | (np.roll(board, 1, axis=1) >> _HIGH)
+    east = (board >> _ONE) | (np.roll(board, -1, axis=1) << _HIGH)
+
+    # Soma de oeste + centro + leste de cada linha em dois bits (0 a 3), e a mesma soma sem o centro para a própria linha
+    row_low = west ^ board ^ east
+    row_high = (west & board) | (east & (west ^ board))
+    side_low = west ^ east
+    side_high = west & east
+    up_low, up_high = np.roll(row_low, 1, axis=0), np.roll(row_high, 1, axis=0)
+    down_low, down_high = np.roll(row_low, -1, axis=0), np.roll(row_high, -1, axis=0)
+
+    # Total = cima + lados + baixo. Bit 0 da soma e o vai-um para o bit 1
+    low = up_low ^ side_low ^ down_low
+    carry = (up_low & side_low) | (down_low & (up_low ^ side_low))
+    # O total é 2 ou 3 quando exatamente um entre os quatro termos de peso 2 está aceso
+    odd = up_high ^ side_high ^ down_high ^ carry
+    exactly_one = odd & ~((up_high & side_high) | (down_high & carry))
+    # Regras do Jogo da Vida: nasce com 3 vizinhos, sobrevive com 2 ou 3
+    return exactly_one & (low | board)
+
+
+# Empacota uma grade (rows, cols) de 0 e 1 no formato de packed_life_step (cols múltiplo de 64)
+def pack_board(grid):
+    grid = np.asarray(grid) == 1
+    bits = np.packbits(grid, axis=1, bitorder="little")
+    return bits.view("<u8").astype(np.uint64)
+
+
+# Desempacota um tabuleiro de packed_life_step em uma grade (rows, cols) de uint8
+def unpack_board(board):
+    return np.unpackbits(board.astype("<u8").view(np.uint8), axis=1, bitorder="little")
+
+
+# Gerador pseudoaleatório definido pela chave (str ou bytes) e pelo nonce
+def key_generator(key, nonce=b""):
+    if isinstance(key, str):
+        key = key.encode()
+    digest = hashlib.sha256(len(key).to_bytes(8, "little") + key + nonce).digest()
+    return np.random.Generator(np.random.PCG64(int.from_bytes(digest, "little")))
+
+
+# Tabuleiro aleatório (rows, cols / 64) tirado de rng: cada célula viva com probabilidade 1/2
+def random_board(rng, rows, cols):
+    if cols % 64:
+        raise ValueError("o número de colunas deve ser múltiplo de 64")
+    return rng.integers(0, 1 << 64, size=(rows, cols // 64), dtype=np.uint64, endpoint=False)
+
+
+# Tabuleiro inicial definido pela chave e pelo nonce
+def board_from_key(key, rows, cols, nonce=b""):
+    return random_board(key_generator(key, nonce), rows, cols)
+
+
+# Finalizador do splitmix64, aplicado a cada palavra de um array de uint64: uma bijeção em que mudar um bit da entrada
+# muda em média metade dos bits da saída
+def mix(words):
+    shift1, multiplier1, shift2, multiplier2, shift3 = _MIX
+    words = words ^ (words >> shift1)
+    words *= multiplier1
+    words ^= words >> shift2
+    words *= multiplier2
+    words ^= words >> shift3
+    return words
+
+
+# Embaralha palavras de tabuleiros seguidas (um array de uint64) com os contadores secretos counter, counter + 1, ...
+# (um por palavra). Palavras iguais em posições ou gerações diferentes dão saídas diferentes, então as regiões mortas
+# ou periódicas do tabuleiro não aparecem no fluxo.
+def whiten(words, counter):
+    counters = np.arange(words.size, dtype=np.uint64).reshape(words.shape) + np.uint64(counter)
+    return mix(words ^ mix(counters))
+
+
+# Fluxo de chave gerado pelo Jogo da Vida.
+#
+# Uma thread produz o fluxo em blocos de pelo menos chunk_size bytes (várias gerações juntas) e os põe em uma fila de
+# depth blocos; enquanto isso quem consome lê e escreve arquivos e faz o XOR. As operações do numpy liberam o GIL, então
+# a geração realmente roda ao mesmo tempo que a E/S. As warmup primeiras gerações são descartadas. Cada bloco passa por
+# whiten, e quando o tabuleiro fica igual ao de duas gerações antes (parado ou com período 2, o que sobra quando
+# tudo vira cinzas) um novo tabuleiro aleatório tirado do mesmo gerador da chave é combinado com ele por XOR.
+class LifeKeystream:
+    def __init__(self, key, rows=512, cols=512, nonce=b"", warmup=64, chunk_size=1 << 20, depth=4):
+        self.rows, self.cols = rows, cols
+        self._rng = key_generator(key, nonce)
+        self._board = random_board(self._rng, rows, cols)
+        self._counter = int(self._rng.integers(0, 1 << 64, dtype=np.uint64, endpoint=False))
+        self.reseeds = 0
+        self._warmup = warmup
+        self._generations = max(1, -(-chunk_size // (rows * cols // 8)))  # Gerações por bloco
+        self._queue = queue.Queue(depth)
+        self._stop = threading.Event()
+        self._error = None
+        self._buffer = np.empty(0, dtype=np.uint8)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Próximos size bytes do fluxo, como um array de uint8
+    def read(self, size):
+        parts = []
+        while size > 0:
+            if len(self._buffer) == 0:
+                self._buffer = self._next_chunk()
+            part, self._buffer = self._buffer[:size], self._buffer[size:]
+            parts.append(part)
+            size -= len(part)
+        return np.concatenate(parts) if len(parts) != 1 else parts[0]
+
+    # Encerra a thread produtora
+    def close(self):
+        self._stop.set()
+        while self._thread.is_alive():
+            try:
+                self._queue.get_nowait()  # Libera a thread se ela estiver esperando espaço na fila
+            except queue.Empty:
+                self._thread.join(0.01)
+
+    def _next_chunk(self):
+        chunk = self._queue.get()
+        if chunk is None:
+            raise RuntimeError("a geração do fluxo de chave falhou") from self._error
+        return chunk
+
+    # Próxima geração de board (previous é a geração anterior a board) e a própria board, ressemeando quando o
+    # tabuleiro repete o de duas gerações antes
+    def _step(self, board, previous):
+        following = packed_life_step(board)
+        if previous is not None and not (following ^ previous).any():
+            following ^= random_board(self._rng, self.rows, self.cols)
+            self.reseeds += 1
+        return following, board
+
+    def _run(self):
+        # Thread produtora: gera blocos até close()
+        try:
+            board, previous = self._board, None
+            for _ in range(self._warmup):
+                board, previous = self._step(board, previous)
+            while not self._stop.is_set():
+                chunk = np.empty((self._generations, *board.shape), dtype=np.uint64)
+                for index in range(self._generations):
+                    board, previous = self._step(board, previous)
+                    chunk[index] = board
+                chunk = whiten(chunk, self._counter)
+                self._counter = (self._counter + chunk.size) % (1 << 64)
+                chunk = chunk.astype("<u8", copy=False).view(np.uint8).ravel()
+                while not self._stop.is_set():
+                    try:
+                        self._queue.put(chunk, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+        except Exception as error:
+            self._error = error
+            self._queue.put(None)
+
+
+# Gerador dos bytes de source (arquivo binário) combinados por XOR com o fluxo de chave. Serve para os dois sentidos
+def xor_stream(source, keystream, chunk_size=1 << 20):
+    while True:
+        data = source.read(chunk_size)
+        if not data:
+            return
+        yield np.bitwise_xor(np.frombuffer(data, dtype=np.uint8), keystream.read(len(data))).tobytes()
+
+
+# Criptografa o arquivo source_path em target_path. Sem nonce, um aleatório é gerado e guardado no cabeçalho
+def encrypt_file(key, source_path, target_path, rows=512, cols=512, warmup=64, nonce=None):
+    nonce = os.urandom(16) if nonce is None else nonce
+    with open(source_path, "rb") as source, open(target_path, "wb") as target, \
+            LifeKeystream(key, rows, cols, nonce, warmup) as keystream:
+        target.write(_HEADER.pack(MAGIC, rows, cols, warmup, nonce))
+        for data in xor_stream(source, keystream):
+            target.write(data)
+
+
+# Descriptografa em target_path um arquivo criado por encrypt_file (os parâmetros vêm do cabeçalho)
+def decrypt_file(key, source_path, target_path):
+    with open(source_path, "rb") as source, open(target_path, "wb") as target:
+        header = source.read(_HEADER.size)
+        if len(header) < _HEADER.size or header[:4] != MAGIC:
+            raise ValueError("o arquivo não foi criado por encrypt_file")
+        _, rows, cols, warmup, nonce = _HEADER.unpack(header)
+        with LifeKeystream(key, rows, cols, nonce, warmup) as keystream:
+            for data in xor_stream(source, keystream):
+                target.write(data)
+
+
+# Mede a velocidade de geração do fluxo de chave (MB/s) para cada tamanho de tabuleiro
+def benchmark(sizes=(128, 256, 512, 1024, 2048), megabytes=64):
+    results = {}
+    for size in sizes:
+        with LifeKeystream("benchmark", size, size) as keystream:
+            keystream.read(1)  # Espera as gerações descartadas
+            start = time.perf_counter()
+            remaining = megabytes << 20
+            while remaining > 0:
+                remaining -= len(keystream.read(min(remaining, 1 << 20)))
+            results[size] = megabytes / (time.perf_counter() - start)
+    return results
+
+
+# Exemplo: mede a geração do fluxo e, se um arquivo for passado, criptografa e descriptografa esse arquivo
+
+if __name__ == "__main__":
+    for size, speed in benchmark().items():
+        print(f"Tabuleiro {size}x{size}: {speed:.1f} MB/s")
+
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+        start = time.perf_counter()
+        encrypt_file("chave secreta", path, path + ".cgks")
+        middle = time.perf_counter()
+        decrypt_file("chave secreta", path + ".cgks", path + ".dec")
+        end = time.perf_counter()
+        megabytes = os.path.getsize(path) / (1 << 20)
+        print(f"Criptografar: {megabytes / (middle - start):.1f} MB/s, descriptografar: {megabytes / (end - middle):.1f} MB/s")
@@ -0,0 +1,115 @@
+import struct
+
+import numpy as np
+
+# Formato binário da mensagem criptografada: cabeçalho (MAGIC + número de bits de cada padrão) seguido dos
+# padrões, um por caractere, com os bits empacotados (np.packbits) em registros de bytes inteiros
+MAGIC = b"CGOL"
+_HEADER = struct.Struct("<4sI")
+
+
+# Codificador binário de um mapeamento de caracteres para padrões (o dict de create_mapping ou um Mapping).
+#
+# Cada padrão de '0' e '1' vira um registro de ceil(bits / 8) bytes, 8 vezes menor que a string. Criptografar é
+# indexar a tabela de registros pelos caracteres; descriptografar é uma busca binária de cada registro (comparado
+# como um bloco de bytes) na tabela ordenada. As duas direções são feitas com numpy em blocos, inclusive em fluxos
+# de arquivos, em que a memória usada depende só do tamanho do bloco.
+class PackedCodec:
+    def __init__(self, mapping):
+        chars = list(mapping)
+        if any(len(char) != 1 for char in chars):
+            raise ValueError("o mapeamento deve ter um caractere por chave")
+        patterns = list(mapping.values())
+        self.bits = len(patterns[0]) if patterns else 0
+        if any(len(pattern) != self.bits for pattern in patterns):
+            raise ValueError("todos os padrões devem ter o mesmo tamanho")
+        self.record_size = -(-self.bits // 8)
+
+        cells = np.frombuffer("".join(patterns).encode("ascii"), dtype=np.uint8).reshape(len(patterns), self.bits)
+        self.table = np.packbits(cells == ord("1"), axis=1)  # Registro de cada caractere
+        codes = np.array([ord(char) for char in chars], dtype=np.uint32)
+
+        # Índice para criptografar: código do caractere -> linha da tabela
+        order = np.argsort(codes, kind="stable")
+        self._codes = codes[order]
+        self._code_rows = order
+        # Índice para descriptografar: registros ordenados como blocos de bytes -> caractere.
+        # Em colisões vale o último caractere, como no mapeamento inverso de decrypt_message
+        records = self._as_blocks(self.table)
+        order = np.argsort(records, kind="stable")
+        self._records = records[order]
+        self._record_chars = codes[order]
+
+    # Mensagem -> bytes (sem cabeçalho). Caracteres fora do mapeamento são ignorados, como em encrypt_message
+    def encode(self, message):
+        codes = np.frombuffer(message.encode("utf-32-le"), dtype="<u4")
+        found = np.minimum(np.searchsorted(self._codes, codes), max(len(self._codes) - 1, 0))
+        known = self._codes[found] == codes if len(self._codes) else np.zeros(len(codes), dtype=bool)
+        return self.table[self._code_rows[found[known]]].tobytes()
+
+    # Bytes (sem cabeçalho, um número inteiro de registros) -> mensagem
+    def decode(self, data):
+        if len(data) % max(self.record_size, 1):
+            raise ValueError("os dados não têm um número inteiro de registros")
+        if len(data) == 0:
+            return ""
+        records = self._as_blocks(np.frombuffer(data, dtype=np.uint8).reshape(-1, self.record_size))
+        found = np.searchsorted(self._records, records, side="right") - 1
+        valid = found >= 0
+        valid[valid] = self._records[found[valid]] == records[valid]
+        if not valid.all():
+            raise KeyError(f"padrão desconhecido no registro {int(np.argmin(valid))}")
+        return self._record_chars[found].astype("<u4").tobytes().decode("utf-32-le")
+
+    # Gerador de bytes criptografados a partir de um arquivo de texto (ou qualquer objeto com read() que retorne str)
+    def encrypt_stream(self, source, chunk_chars=1 << 20):
+        yield _HEADER.pack(MAGIC, self.bits)
+        while True:
+            text = source.read(chunk_chars)
+            if not text:
+                return
+            yield self.encode(text)
+
+    # Gerador da mensagem, em pedaços, a partir de um arquivo binário criado por encrypt_stream
+    def decrypt_stream(self, source, chunk_records=1 << 16):
+        header = _read_exactly(source, _HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError("arquivo sem cabeçalho")
+        magic, bits = _HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError("o arquivo não está no formato binário criptografado")
+        if bits != self.bits:
+            raise ValueError(f"os padrões do arquivo têm {bits} bits e os do mapeamento têm {self.bits}")
+        chunk = chunk_records * self.record_size
+        while True:
+            data = _read_exactly(source, chunk)
+            if not data:
+                return
+            yield self.decode(data)
+
+    # Criptografa o arquivo de texto source_path em target_path
+    def encrypt_file(self, source_path, target_path, encoding="utf-8"):
+        with open(source_path, encoding=encoding, newline="") as source, open(target_path, "wb") as target:
+            for data in self.encrypt_stream(source):
+                target.write(data)
+
+    # Descriptografa o arquivo binário source_path no arquivo de texto target_path
+    def decrypt_file(self, source_path, target_path, encoding="utf-8"):
+        with open(source_path, "rb") as source, open(target_path, "w", encoding=encoding, newline="") as target:
+            for text in self.decrypt_stream(source):
+                target.write(text)
+
+    def _as_blocks(self, records):
+        # Cada registro como um único valor de record_size bytes, comparável e ordenável pelo numpy
+        return np.ascontiguousarray(records).view(f"V{max(self.record_size, 1)}").ravel()
+
+
+def _read_exactly(source, size):
+    # read() de arquivos (e pipes) pode retornar menos bytes que o pedido antes do fim
+    data = source.read(size)
+    while data and len(data) < size:
+        more = source.read(size - len(data))
+        if not more:
+            break
+        data += more
+    return data
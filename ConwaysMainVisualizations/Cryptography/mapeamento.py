@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from visualizacaoconwaycrypt import PREDEFINED_PATTERNS, create_mapping, decrypt_message, encrypt_message, evolve, grids_to_strings, seed_grids
+
+
+# Mapeamento de caracteres para padrões, com o mapeamento inverso já calculado. Funciona como o dict de create_mapping
+class Mapping(dict):
+    def __init__(self, forward):
+        super().__init__(forward)
+        self.reverse = {v: k for k, v in self.items()}  # Padrão -> caractere (em colisões vale o último, como em decrypt_message)
+        self.chunk_size = len(next(iter(self.values()), ""))
+
+    def encrypt(self, message):
+        return encrypt_message(message, self)
+
+    def decrypt(self, encrypted_message):
+        return decrypt_message(encrypted_message, self)
+
+
+# Guarda os mapeamentos já calculados, para que quem criptografa muitas mensagens só pague a evolução uma vez.
+#
+# O estado final de um conjunto de padrões só depende dos padrões, do tamanho da grade e do número de passos, então
+# listas de caracteres que usam os mesmos padrões compartilham a evolução; o Mapping de cada lista de caracteres é
+# montado à parte. Os estados ficam em um LRU na memória e, se cache_dir for dado, em arquivos .npy com o hash dos
+# padrões e da grade no nome. Quando um número de passos ainda não foi calculado, a evolução continua do maior número
+# de passos já guardado (na memória ou no disco) para o mesmo conjunto: pedir steps=20 depois de steps=10 só executa
+# 10 passos.
+class MappingStore:
+    def __init__(self, cache_dir=None, capacity=64, patterns=PREDEFINED_PATTERNS):
+        self.cache_dir = cache_dir
+        self.capacity = capacity
+        self.patterns = patterns
+        self.stats = {"memory": 0, "disk": 0, "resumed": 0, "computed": 0}
+        self._mappings = OrderedDict()  # (caracteres, chave dos padrões, passos) -> Mapping
+        self._states = OrderedDict()  # (chave dos padrões, passos) -> pilha (N, rows, cols) de grades
+        self._lock = threading.Lock()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    # Mapeamento dos caracteres (mesmo resultado de create_mapping), reaproveitando o que já foi calculado
+    def get(self, characters, steps=10, grid_size=(10, 10)):
+        grid_size = tuple(grid_size)
+        chars, positions = self._resolve(characters, grid_size)
+        patterns = sorted(set(positions))  # Cada padrão diferente evolui uma vez só
+        key = _pattern_key(patterns, grid_size)
+        memo = (tuple(chars), key, steps)
+        with self._lock:
+            mapping = self._mappings.get(memo)
+            if mapping is not None:
+                self._mappings.move_to_end(memo)
+                self.stats["memory"] += 1
+                return mapping
+            strings = dict(zip(patterns, grids_to_strings(self._evolved(key, patterns, grid_size, steps))))
+            mapping = Mapping((char, strings[pattern]) for char, pattern in zip(chars, positions))
+            _remember(self._mappings, memo, mapping, self.capacity)
+            return mapping
+
+    # Esvazia o cache da memória (os arquivos no disco continuam)
+    def clear(self):
+        with self._lock:
+            self._mappings.clear()
+            self._states.clear()
+
+    def _resolve(self, characters, grid_size):
+        # As posições iniciais de cada caractere, como em create_mapping (um caractere sem padrão usa o do anterior).
+        # Os caracteres ficam na ordem em que aparecem: em colisões, o mapeamento inverso guarda o mesmo caractere
+        resolved = {}
+        for char in characters:
+            if char in self.patterns:
+                starting_positions = self.patterns[char]
+            resolved[char] = starting_positions
+        chars = list(resolved)
+        rows, cols = grid_size
+        positions = [tuple(sorted({(x % rows, y % cols) for x, y in resolved[char]})) for char in chars]
+        return chars, positions
+
+    def _evolved(self, key, positions, grid_size, steps):
+        # Estado guardado com o maior número de passos até steps, na memória ou no disco
+        in_memory = [s for k, s in self._states if k == key and s <= steps]
+        on_disk = [s for s in self._saved_steps(key) if s <= steps]
+        start = max(in_memory + on_disk, default=None)
+        if start is None:
+            start, grids = 0, seed_grids(positions, grid_size)
+            self.stats["computed"] += 1
+        elif start in in_memory:
+            grids = self._states[(key, start)]
+            self._states.move_to_end((key, start))
+        else:
+            grids = np.load(self._path(key, start))
+            _remember(self._states, (key, start), grids, self.capacity)
+            if start == steps:
+                self.stats["disk"] += 1
+
+        if start < steps:
+            if start > 0:
+                self.stats["resumed"] += 1
+            grids = evolve(grids, steps - start)
+            _remember(self._states, (key, steps), grids, self.capacity)
+            self._save(key, steps, grids)
+        return grids
+
+    def _saved_steps(self, key):
+        if self.cache_dir is None:
+            return []
+        prefix = key + "-"
+        return [int(name[len(prefix):-4]) for name in os.listdir(self.cache_dir) if name.startswith(prefix) and name.endswith(".npy")]
+
+    def _path(self, key, steps):
+        return os.path.join(self.cache_dir, f"{key}-{steps}.npy")
+
+    def _save(self, key, steps, grids):
+        if self.cache_dir is None:
+            return
+        path = self._path(key, steps)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as file:
+            np.save(file, grids)
+        os.replace(temporary, path)  # Outro processo nunca lê um arquivo pela metade
+
+
+# Hash do conjunto de padrões (já em ordem e com as posições reduzidas à grade) e do tamanho da grade
+def _pattern_key(positions, grid_size):
+    text = json.dumps([list(grid_size), positions], separators=(",", ":"))
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+def _remember(cache, key, value, capacity):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > capacity:
+        cache.popitem(last=False)
+
+
+# Exemplo: o mesmo resultado de create_mapping, inclusive para listas de caracteres que compartilham padrões
+# ("g" e "h" não têm padrão próprio e usam o do caractere anterior)
+
+if __name__ == "__main__":
+    store = MappingStore()
+    for characters in ["ag", "ah", "ba", "ab", "abcdef", "fedcba", "agbh"]:
+        mapping, expected = store.get(characters), create_mapping(characters)
+        if list(mapping.items()) != list(expected.items()) or mapping.reverse != {v: k for k, v in expected.items()}:
+            raise AssertionError(f"mapeamento diferente de create_mapping para {characters!r}")
+    print("Mapeamentos iguais aos de create_mapping:", store.stats)
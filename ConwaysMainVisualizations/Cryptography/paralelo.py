@@ -0,0 +1,260 @@
+import multiprocessing
+import os
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+if __name__ == "__main__":
+    # Executado como script: memoria.py fica na pasta de cima (quem importa este módulo já a pôs no sys.path)
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from memoria import attach_shared_memory
+from visualizacaoconwaycrypt import create_mapping, decrypt_message, encrypt_message
+
+# Criptografia e descriptografia de mensagens longas em vários processos, com o mesmo resultado de encrypt_message e
+# decrypt_message. A mensagem é dividida em pedaços independentes (na descriptografia, sempre em um número inteiro de
+# padrões), cada processo do pool trata um pedaço e os resultados são juntados na ordem original.
+#
+# A tabela do mapeamento fica em memória compartilhada, criada uma vez: cada processo a abre ao iniciar, e as tarefas
+# só levam o pedaço da mensagem.
+
+
+# Tabela de um mapeamento em memória compartilhada, com os índices das duas direções:
+#   codes/code_rows: códigos dos caracteres em ordem -> linha de patterns (para criptografar)
+#   patterns: o padrão de cada caractere, em bytes ASCII '0' e '1'
+#   records/record_chars: os padrões em ordem (comparados como blocos de bytes) -> caractere (para descriptografar)
+class SharedMapping:
+    def __init__(self, mapping=None, spec=None):
+        if spec is None:
+            chars = list(mapping)
+            if any(len(char) != 1 for char in chars):
+                raise ValueError("o mapeamento deve ter um caractere por chave")
+            values = list(mapping.values())
+            bits = len(values[0]) if values else 0
+            if any(len(value) != bits for value in values):
+                raise ValueError("todos os padrões devem ter o mesmo tamanho")
+            count = len(chars)
+            self._memory = shared_memory.SharedMemory(create=True, size=max(_table_size(count, bits), 1))
+            self._owner = True
+            self.spec = (self._memory.name, count, bits)
+            self._map()
+
+            codes = np.array([ord(char) for char in chars], dtype=np.uint32)
+            order = np.argsort(codes, kind="stable")
+            self.codes[:] = codes[order]
+            self.code_rows[:] = order
+            self.patterns[:] = np.frombuffer("".join(values).encode("ascii"), dtype=np.uint8).reshape(count, bits)
+            # Em colisões vale o último caractere, como no mapeamento inverso de decrypt_message
+            order = np.argsort(self._blocks(self.patterns), kind="stable")
+            self.records[:] = self.patterns[order]
+            self.record_chars[:] = codes[order]
+        else:
+            self._memory = attach_shared_memory(spec[0])
+            self._owner = False
+            self.spec = spec
+            self._map()
+
+    # Códigos de caracteres -> padrões em ASCII, escritos em out. Caracteres fora do mapeamento são ignorados; retorna
+    # quantos padrões foram escritos
+    def encrypt(self, codes, out):
+        if len(self.codes) == 0:
+            return 0
+        found = np.minimum(np.searchsorted(self.codes, codes), len(self.codes) - 1)
+        rows = self.code_rows[found[self.codes[found] == codes]]
+        np.take(self.patterns, rows, axis=0, out=out[:len(rows)])
+        return len(rows)
+
+    # Padrões em ASCII (array (n, bits) de uint8) -> códigos dos caracteres, escritos em out
+    def decrypt(self, data, out):
+        if len(data) == 0:
+            return
+        sorted_records = self._blocks(self.records)
+        records = self._blocks(data)
+        found = np.searchsorted(sorted_records, records, side="right") - 1
+        valid = found >= 0
+        valid[valid] = sorted_records[found[valid]] == records[valid]
+        if not valid.all():
+            raise KeyError(data[int(np.argmin(valid))].tobytes().decode("ascii"))
+        np.take(self.record_chars, found, out=out)
+
+    # Fecha a tabela neste processo; quem criou a tabela também libera a memória compartilhada
+    def close(self):
+        self.codes = self.code_rows = self.patterns = self.records = self.record_chars = None
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
+
+    def _map(self):
+        _, count, bits = self.spec
+        buffer = self._memory.buf
+        offset = 0
+        fields = []
+        for dtype, shape in _table_layout(count, bits):
+            array = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+            offset += array.nbytes
+            fields.append(array)
+        self.code_rows, self.codes, self.record_chars, self.patterns, self.records = fields
+
+    def _blocks(self, rows):
+        return np.ascontiguousarray(rows).view(f"V{max(self.spec[2], 1)}").ravel()
+
+
+# Pool de processos com a tabela do mapeamento compartilhada. Reaproveitar o mesmo ParallelCipher evita pagar a
+# criação dos processos a cada mensagem
+class ParallelCipher:
+    def __init__(self, mapping, workers=None, chunk_chars=1 << 18):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_chars = chunk_chars
+        self.table = SharedMapping(mapping)
+        self._pool = multiprocessing.Pool(self.workers, initializer=_start_worker, initargs=(self.table.spec,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Mesmo resultado de encrypt_message(message, mapping)
+    def encrypt(self, message):
+        bits = self.table.spec[2]
+        codes = np.frombuffer(message.encode("utf-32-le"), dtype="<u4")
+        # Cada pedaço escreve na sua região da saída, que comporta todos os caracteres do pedaço
+        with _SharedArray(codes) as source, _SharedArray(np.empty((len(codes), bits), dtype=np.uint8)) as target:
+            tasks = [(source.name, target.name, len(codes), bits, start, min(start + self.chunk_chars, len(codes)))
+                     for start in range(0, len(codes), self.chunk_chars)]
+            counts = self._pool.map(_encrypt_chunk, tasks)
+            view = target.memory.buf
+            if sum(counts) == len(codes):  # Nenhum caractere ignorado: a saída já está contínua
+                return str(view[:len(codes) * bits], "ascii")
+            return "".join(str(view[task[4] * bits:(task[4] + count) * bits], "ascii") for task, count in zip(tasks, counts))
+
+    # Mesmo resultado de decrypt_message(encrypted_message, mapping)
+    def decrypt(self, encrypted_message):
+        bits = self.table.spec[2]
+        if len(encrypted_message) == 0:
+            return ""
+        if bits == 0 or len(encrypted_message) % bits:
+            raise KeyError(encrypted_message[len(encrypted_message) // max(bits, 1) * bits:])
+        count = len(encrypted_message) // bits
+        data = np.frombuffer(encrypted_message.encode("ascii"), dtype=np.uint8)
+        with _SharedArray(data) as source, _SharedArray(np.empty(count, dtype="<u4")) as target:
+            tasks = [(source.name, target.name, count, bits, start, min(start + self.chunk_chars, count))
+                     for start in range(0, count, self.chunk_chars)]
+            self._pool.map(_decrypt_chunk, tasks)
+            return str(target.memory.buf[:4 * count], "utf-32-le")
+
+    # Encerra os processos e libera a tabela
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+            self.table.close()
+
+
+# Criptografa uma mensagem com um pool temporário (para várias mensagens, use ParallelCipher)
+def parallel_encrypt(message, mapping, workers=None, chunk_chars=1 << 18):
+    with ParallelCipher(mapping, workers, chunk_chars) as cipher:
+        return cipher.encrypt(message)
+
+
+# Descriptografa uma mensagem com um pool temporário (para várias mensagens, use ParallelCipher)
+def parallel_decrypt(encrypted_message, mapping, workers=None, chunk_chars=1 << 18):
+    with ParallelCipher(mapping, workers, chunk_chars) as cipher:
+        return cipher.decrypt(encrypted_message)
+
+
+# Mede a velocidade (milhões de caracteres por segundo) de criptografar e descriptografar uma mensagem de length
+# caracteres com cada número de processos, e também das funções originais (workers = 0)
+def benchmark(worker_counts=(1, 2, 4, 8), length=4_000_000, steps=10, grid_size=(10, 10)):
+    characters = list("abcdef")
+    mapping = create_mapping(characters, steps, grid_size)
+    message = "".join(np.random.default_rng(0).choice(characters, length))
+    results = {}
+
+    start = time.perf_counter()
+    encrypted = encrypt_message(message, mapping)
+    middle = time.perf_counter()
+    decrypt_message(encrypted, mapping)
+    results[0] = (length / (middle - start) / 1e6, length / (time.perf_counter() - middle) / 1e6)
+
+    for workers in worker_counts:
+        with ParallelCipher(mapping, workers) as cipher:
+            start = time.perf_counter()
+            parallel = cipher.encrypt(message)
+            middle = time.perf_counter()
+            decrypted = cipher.decrypt(parallel)
+            end = time.perf_counter()
+        if parallel != encrypted or decrypted != message:
+            raise AssertionError("o resultado paralelo é diferente do original")
+        results[workers] = (length / (middle - start) / 1e6, length / (end - middle) / 1e6)
+    return results
+
+
+_table = None  # Tabela aberta em cada processo do pool
+
+
+def _start_worker(spec):
+    global _table
+    _table = SharedMapping(spec=spec)
+
+
+def _encrypt_chunk(task):
+    source, target, count, bits, start, stop = task
+    with _SharedArray(name=source) as codes, _SharedArray(name=target) as out:
+        return _table.encrypt(codes.array("<u4", (count,))[start:stop], out.array(np.uint8, (count, bits))[start:stop])
+
+
+def _decrypt_chunk(task):
+    source, target, count, bits, start, stop = task
+    with _SharedArray(name=source) as data, _SharedArray(name=target) as out:
+        _table.decrypt(data.array(np.uint8, (count, bits))[start:stop], out.array("<u4", (count,))[start:stop])
+
+
+# Array temporário em memória compartilhada (a mensagem de entrada ou o resultado de uma chamada)
+class _SharedArray:
+    def __init__(self, values=None, name=None):
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(values.shape, dtype=values.dtype, buffer=self.memory.buf)[...] = values
+        else:
+            self.memory = attach_shared_memory(name)
+        self._owner = name is None
+        self._views = []
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def array(self, dtype, shape):
+        view = np.ndarray(shape, dtype=dtype, buffer=self.memory.buf)
+        self._views.append(view)
+        return view
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._views.clear()
+        self.memory.close()
+        if self._owner:
+            self.memory.unlink()
+
+
+def _table_layout(count, bits):
+    # Campos em ordem de alinhamento decrescente: code_rows, codes, record_chars, patterns, records
+    return [(np.int64, (count,)), (np.uint32, (count,)), (np.uint32, (count,)), (np.uint8, (count, bits)), (np.uint8, (count, bits))]
+
+
+def _table_size(count, bits):
+    return sum(np.dtype(dtype).itemsize * int(np.prod(shape)) for dtype, shape in _table_layout(count, bits))
+
+
+# Exemplo: compara as funções originais com 1, 2, 4 e 8 processos
+
+if __name__ == "__main__":
+    for workers, (encrypt_speed, decrypt_speed) in benchmark().items():
+        name = "original" if workers == 0 else f"{workers} processo(s)"
+        print(f"{name}: criptografar {encrypt_speed:.2f} M caracteres/s, descriptografar {decrypt_speed:.2f} M caracteres/s")
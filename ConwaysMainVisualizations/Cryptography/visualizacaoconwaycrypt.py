@@ -10,43 +10,64 @@ PREDEFINED_PATTERNS = {
     "f": [(0, 1), (0, 4), (1, 0), (1, 4), (2, 4), (3, 1), (3, 3)],  # LWSS - "Nave espacial leve" - Padrão gerador
 }
 
-# Função para dar um passo no Jogo da Vida de Conway. Segue as regras normais.
+# Função para dar um passo no Jogo da Vida de Conway. Segue as regras normais, com as bordas ligadas (toro).
 def conway_game_of_life_step(grid):
-    rows, cols = grid.shape
-    new_grid = np.zeros((rows, cols), dtype=int)  # Matriz para o novo estado
-    for x in range(rows):
-        for y in range(cols):
-            neighbors = [(x-1, y-1), (x-1, y), (x-1, y+1), (x, y-1), (x, y+1), (x+1, y-1), (x+1, y), (x+1, y+1)]  #Coordenadas dos vizinhos no grid
-            count = sum(grid[nx % rows, ny % cols] for nx, ny in neighbors)
-            # Regras do Jogo da Vida
-            if grid[x, y] == 1 and count in [2, 3]:  # Sobrevive
-                new_grid[x, y] = 1
-            elif grid[x, y] == 0 and count == 3:  # Nasce
-                new_grid[x, y] = 1
-    return new_grid
+    return life_step(grid).astype(int)
+
+# Passo do Jogo da Vida vetorizado. Aceita uma grade (rows, cols) ou uma pilha (N, rows, cols) de grades, que evoluem todas juntas. Retorna uint8 (0 ou 1)
+def life_step(grids):
+    return _life_step((np.asarray(grids) == 1).astype(np.uint8))
+
+# Executa steps passos em uma grade ou em uma pilha (N, rows, cols) de grades
+def evolve(grids, steps):
+    grids = (np.asarray(grids) == 1).astype(np.uint8)
+    for _ in range(steps):
+        grids = _life_step(grids)
+    return grids
+
+def _life_step(alive):
+    # Soma dos vizinhos em duas etapas, com as bordas ligadas: primeiro cada célula com as vizinhas da mesma linha, depois as linhas de cima e de baixo
+    wrapped = np.concatenate((alive[..., -1:], alive, alive[..., :1]), axis=-1)
+    rows = wrapped[..., :-2] + wrapped[..., 1:-1] + wrapped[..., 2:]
+    wrapped = np.concatenate((rows[..., -1:, :], rows, rows[..., :1, :]), axis=-2)
+    count = wrapped[..., :-2, :] + wrapped[..., 1:-1, :] + wrapped[..., 2:, :] - alive
+    # Regras do Jogo da Vida: nasce com 3 vizinhos, sobrevive com 2 ou 3
+    return ((count == 3) | ((count == 2) & (alive == 1))).view(np.uint8)
+
+# Cria a pilha (N, rows, cols) de grades iniciais, uma para cada lista de posições iniciais
+def seed_grids(starting_positions_list, grid_size=(10, 10)):
+    grids = np.zeros((len(starting_positions_list), *grid_size), dtype=np.uint8)
+    for index, starting_positions in enumerate(starting_positions_list):
+        for x, y in starting_positions:
+            grids[index, x % grid_size[0], y % grid_size[1]] = 1
+    return grids
+
+# Converte uma pilha de grades nas strings de 0 e 1 (linha por linha), uma por grade
+def grids_to_strings(grids):
+    cells = grids.reshape(len(grids), int(np.prod(grids.shape[1:])))
+    text = (cells + ord("0")).astype(np.uint8).tobytes().decode("ascii")
+    size = cells.shape[1]
+    return [text[i:i+size] for i in range(0, len(text), size)]
 
 # Função para gerar o padrão final após um número de passos. Recebe os pontos iniciais, tamanho da grid (padrão 10x10) e o número de passos (padrão 10). Executa os passos e retorna uma string de 0 (azulejo apagado) e 1 (azulejo aceso)
 def generate_game_pattern(starting_positions, grid_size=(10, 10), steps=10):
+    return generate_game_patterns([starting_positions], grid_size, steps)[0]
+
+# Versão em lote de generate_game_pattern: evolui todos os padrões juntos, como uma pilha de grades, e retorna uma string para cada um
+def generate_game_patterns(starting_positions_list, grid_size=(10, 10), steps=10):
+    return grids_to_strings(evolve(seed_grids(starting_positions_list, grid_size), steps))
 
-    grid = np.zeros(grid_size, dtype=int)  #Criando a grid vazia e definindo as posições iniciais baseadas no input da função
-    for x, y in starting_positions:
-        grid[x % grid_size[0], y % grid_size[1]] = 1
-  
-    for _ in range(steps): #Executando os passos
-        grid = conway_game_of_life_step(grid)
-    return ''.join(map(str, grid.flatten()))
-
-# Função para criar o mapeamento de caracteres para padrões do Jogo da Vida. Para este trabalho, usamos apenas padrões predefinidos, porém o código pode ser extendido para gerar naturalmente padrões aleatórios para cada caractere.
-def create_mapping(characters, steps=10, grid_size=(10, 10)):
-    mapping = {}
+# Função para criar o mapeamento de caracteres para padrões do Jogo da Vida. Por padrão usa os padrões predefinidos; tabelas maiores, com padrões aleatórios para cada caractere, podem ser geradas com busca_padroes.py e passadas em patterns.
+def create_mapping(characters, steps=10, grid_size=(10, 10), patterns=PREDEFINED_PATTERNS):
+    chars, positions = [], []
     for char in characters: 
-        if char in PREDEFINED_PATTERNS:
-            starting_positions = PREDEFINED_PATTERNS[char]
-      
-        # Gera o padrão final após a evolução do Jogo da Vida
-        final_state = generate_game_pattern(starting_positions, grid_size, steps)
-        mapping[char] = final_state
-    return mapping
+        if char in patterns:
+            starting_positions = patterns[char]
+        chars.append(char)
+        positions.append(starting_positions)
+
+    # Gera o padrão final após a evolução do Jogo da Vida, todos os caracteres de uma vez
+    return dict(zip(chars, generate_game_patterns(positions, grid_size, steps)))
 
 # Função para criptografar a mensagem usando o mapeamento
 def encrypt_message(message, mapping):
@@ -54,7 +75,9 @@ def encrypt_message(message, mapping):
 
 # Função para descriptografar a mensagem usando o mapeamento invertido
 def decrypt_message(encrypted_message, mapping):
-    reverse_mapping = {v: k for k, v in mapping.items()}  # Gera o mapeamento inverso
+    reverse_mapping = getattr(mapping, "reverse", None)  # Mapping (mapeamento.py) já traz o mapeamento inverso
+    if reverse_mapping is None:
+        reverse_mapping = {v: k for k, v in mapping.items()}  # Gera o mapeamento inverso
     chunk_size = len(next(iter(mapping.values())))  # Obtém o tamanho de cada padrão
 
     #Quebra a mensagem em pedaços do tamanho de cada padrão, e usa o mapeamento inverso para obter a mensagem real
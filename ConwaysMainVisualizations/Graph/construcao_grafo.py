@@ -0,0 +1,159 @@
+import numpy as np
+from scipy.spatial import Delaunay, QhullError, cKDTree
+
+
+class UnionFind:
+    """
+    Conjuntos disjuntos com compressão de caminho e união por tamanho.
+    """
+
+    def __init__(self, n):
+        self.link = list(range(n))
+        self.size = [1] * n
+
+    def find(self, k):
+        root = k
+        while root != self.link[root]:
+            root = self.link[root]
+        while k != root: # Compressão de caminho: todos apontam direto para a raiz
+            self.link[k], k = root, self.link[k]
+        return root
+
+    def unite(self, x, y):
+        """
+        Junta os conjuntos de x e y. Retorna False se já eram o mesmo conjunto.
+        """
+        a, b = self.find(x), self.find(y)
+        if a == b:
+            return False
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.size[a] += self.size[b]
+        self.link[b] = a
+        return True
+
+
+def empire_edges(points, extra=None):
+    """
+    Arestas do grafo das vilas: a árvore geradora mínima euclidiana mais as extra arestas mais curtas fora dela.
+
+    points é uma sequência de coordenadas (x, y). Retorna dois arrays de
+    índices (a, b) dos pontos, com as arestas da árvore primeiro; o padrão de
+    extra é o número de arestas da árvore, como no grafo original.
+
+    A árvore é calculada com Kruskal só sobre as arestas da triangulação de
+    Delaunay, que sempre contém a árvore geradora mínima euclidiana; as
+    arestas extras vêm dos vizinhos mais próximos de cada ponto (cKDTree).
+    Pontos repetidos são tratados como uma única vila: as arestas usam a
+    última ocorrência de cada coordenada, a mesma que aparece na grade.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    unique, inverse = np.unique(points, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    representative = np.full(len(unique), -1, dtype=np.int64)
+    np.maximum.at(representative, inverse, np.arange(len(points))) # Última ocorrência de cada coordenada
+
+    tree = _minimum_spanning_tree(unique)
+    if extra is None:
+        extra = len(tree)
+    extras = _shortest_extra_edges(unique, tree, extra)
+    edges = np.concatenate((tree, extras)).astype(np.int64).reshape(-1, 2)
+    return representative[edges[:, 0]], representative[edges[:, 1]]
+
+
+def _minimum_spanning_tree(points):
+    """
+    Kruskal sobre as arestas candidatas; retorna um array (n - 1, 2) de índices.
+    """
+    candidates = _candidate_edges(points)
+    if len(candidates) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    lengths = np.hypot(*(points[candidates[:, 0]] - points[candidates[:, 1]]).T)
+    sets = UnionFind(len(points))
+    tree = []
+    for a, b in candidates[np.argsort(lengths, kind="stable")].tolist():
+        if sets.unite(a, b):
+            tree.append((a, b))
+            if len(tree) == len(points) - 1:
+                break
+    return np.array(tree, dtype=np.int64).reshape(-1, 2)
+
+
+def _candidate_edges(points):
+    """
+    Arestas que com certeza contêm a árvore geradora mínima.
+    """
+    n = len(points)
+    if n <= 3: # Poucos pontos: todas as arestas
+        a, b = np.triu_indices(n, k=1)
+        return np.stack((a, b), axis=1)
+    try:
+        simplices = Delaunay(points).simplices
+    except QhullError:
+        # Pontos colineares não têm triangulação: a árvore é a sequência dos pontos ao longo da reta
+        direction = points[-1] - points[0]
+        if not direction.any():
+            direction = points.max(axis=0) - points.min(axis=0)
+        order = np.argsort(points @ direction, kind="stable")
+        return np.stack((order[:-1], order[1:]), axis=1)
+    a = simplices[:, [0, 1, 2]].ravel()
+    b = simplices[:, [1, 2, 0]].ravel()
+    keys = np.unique(_pair_keys(a, b, n))
+    return np.stack((keys // n, keys % n), axis=1)
+
+
+def _shortest_extra_edges(points, tree, count):
+    """
+    As count arestas mais curtas que não estão na árvore, buscadas entre os vizinhos mais próximos.
+
+    Primeiro são usados os k vizinhos de cada ponto. Uma aresta que ficou de
+    fora é pelo menos tão longa quanto a distância de cada ponta ao seu
+    k-ésimo vizinho; então, se L é a maior aresta escolhida, só pode faltar
+    aresta mais curta entre pontos cujo k-ésimo vizinho está a menos de L.
+    Para esses pontos todos os vizinhos até a distância L são acrescentados,
+    e a escolha refeita é exata.
+    """
+    n = len(points)
+    if count <= 0 or n < 2:
+        return np.empty((0, 2), dtype=np.int64)
+    index = cKDTree(points)
+    tree_keys = _pair_keys(tree[:, 0], tree[:, 1], n)
+    k = min(n - 1, 2 * -(-count // n) + 3) # Pares suficientes para count arestas fora da árvore
+
+    distances, neighbors = index.query(points, k=k + 1) # O primeiro vizinho é o próprio ponto
+    keys = _pair_keys(np.repeat(np.arange(n), k), neighbors[:, 1:].ravel(), n)
+    lengths = distances[:, 1:].ravel()
+    keys, lengths = _shortest_outside(keys, lengths, tree_keys, count)
+
+    limit = lengths[-1] if len(keys) == count else np.inf
+    close = np.flatnonzero(distances[:, -1] < limit)
+    if len(close) and k < n - 1:
+        balls = index.query_ball_point(points[close], r=limit)
+        a = np.repeat(close, [len(ball) for ball in balls])
+        b = np.fromiter((j for ball in balls for j in ball), dtype=np.int64, count=len(a))
+        a, b = a[a != b], b[a != b]
+        keys = np.concatenate((keys, _pair_keys(a, b, n)))
+        lengths = np.concatenate((lengths, np.hypot(*(points[a] - points[b]).T)))
+        keys, lengths = _shortest_outside(keys, lengths, tree_keys, count)
+    return np.stack((keys // n, keys % n), axis=1)
+
+
+def _pair_keys(a, b, n):
+    """
+    Um inteiro por aresta não orientada (o mesmo para (a, b) e (b, a)).
+    """
+    a = np.asarray(a, dtype=np.int64)
+    b = np.asarray(b, dtype=np.int64)
+    return np.minimum(a, b) * n + np.maximum(a, b)
+
+
+def _shortest_outside(keys, lengths, excluded, count):
+    """
+    As count arestas distintas mais curtas cujas chaves não estão em excluded.
+    """
+    keys, first = np.unique(keys, return_index=True)
+    lengths = lengths[first]
+    keep = ~np.isin(keys, excluded)
+    keys, lengths = keys[keep], lengths[keep]
+    order = np.argsort(lengths, kind="stable")[:count]
+    return keys[order], lengths[order]
@@ -1,72 +1,346 @@
+import itertools
 import time
 import random
 import numpy as np
+from scipy import sparse
 from mesa import Model
 from mesa.datacollection import DataCollector
 from mesa.space import PropertyLayer
 
-class Vertex:
-    
-    def __init__(self, val):
-        self.val = val
-        self.fac = ''
-        self.adj = []
-        self.devoc = [0,0,0]
-        self.caos = 0
-        self.next = ''
+# Cada aresta é guardada nos dois sentidos como a chave origem * _KEY + destino, e cada coordenada (x, y) de vértice
+# como o código x * _KEY + y
+_KEY = 1 << 32
+_REMOVED = -1 # Código de um vértice removido
 
 
-class G:    
+class G:
+    """
+    Grafo das vilas com índices.
+
+    Cada vértice é um id inteiro (a ordem de inserção) com um valor, a
+    coordenada (x, y) da vila, com 0 <= x, y < 2^31. Tudo fica em arrays
+    numpy ordenados: as operações em lote são vetorizadas, e alterar um
+    vértice ou uma aresta custa uma busca binária e uma inserção ou remoção
+    no array, sem ordenar de novo nem percorrer os vértices em Python.
+
+    O índice coordenada -> ids é um multimapa (pares (código, id) em
+    ordem); find devolve o maior id com a coordenada, isto é, o último
+    vértice inserido com ela. As arestas são chaves (origem, destino) nos
+    dois sentidos, então os vizinhos de um vértice são uma fatia contígua
+    do array. csr() devolve o grafo como uma matriz de adjacência CSR
+    somente leitura, guardada até a próxima alteração.
+    """
+
     def __init__(self):
-        self.Core = []
-        
-    def adjacent(self, x: Vertex, y: Vertex):
-        if y in x.adj:
-            return True
-        return False
-
-    def neighbors(self, x: Vertex):
-        ans = []
-        for v in x.adj:
-            ans.append(v)
-        return ans
-
-    def add_vertex(self, x: Vertex):
-        ans = True
-        if x in self.Core:
-            ans = False
-        self.Core.append(x)
-        return ans
-
-    def remove_vertex(self, x: Vertex):     
-        if x in self.Core:
-            self.Core.remove(x)
-            return True
-        return False
-    
-    def add_edge(self, x: Vertex, y: Vertex):
-        if (not y in x.adj ):
-            x.adj.append(y)
-            y.adj.append(x)
-            return True
-        return False
-    
-    def remove_edge(self, x: Vertex, y: Vertex):
-        if (y in x.adj ):
-            x.adj.remove(y)
-            return True
-        return False
-        
-    def get_vertex_value(self, x: Vertex):   
-        return x.val
-
-    def set_vertex_value(self, x: Vertex, v):     
-        x.val = v
+        self._codes = np.empty(0, dtype=np.int64) # Código da coordenada de cada id (cresce em blocos até _size)
+        self._size = 0 # Ids já usados
+        self._count = 0 # Vértices não removidos
+        self._index_codes = np.empty(0, dtype=np.int64) # Multimapa coordenada -> ids, ordenado por (código, id)
+        self._index_ids = np.empty(0, dtype=np.int64)
+        self._keys = np.empty(0, dtype=np.int64)
+        self._frozen = None
+
+    def __len__(self):
+        return self._count
+
+    def find(self, val):
+        """
+        Id do vértice com esse valor, ou None.
+        """
+        code = int(_coordinate_codes(val))
+        i = np.searchsorted(self._index_codes, code, side="right")
+        return int(self._index_ids[i - 1]) if i and self._index_codes[i - 1] == code else None
+
+    def find_all(self, vals):
+        """
+        Ids dos vértices com esses valores (por exemplo, um array (m, 2) de coordenadas).
+        """
+        codes = _coordinate_codes(vals)
+        order = np.argsort(codes) # Buscas em ordem acessam o índice em sequência (bem mais rápido)
+        i = np.empty(len(codes), dtype=np.int64)
+        i[order] = np.searchsorted(self._index_codes, codes[order], side="right") - 1
+        found = (i >= 0) & (self._index_codes[np.maximum(i, 0)] == codes) if len(self._index_codes) else i >= 0
+        if not found.all():
+            missing = int(codes[np.argmin(found)])
+            raise KeyError((missing // _KEY, missing % _KEY))
+        return self._index_ids[i]
+
+    def indexed(self):
+        """
+        Ids que find devolve: o último vértice de cada coordenada, em ordem de coordenada.
+        """
+        last = np.append(self._index_codes[1:] != self._index_codes[:-1], True) if len(self._index_codes) else []
+        return self._index_ids[last]
+
+    def adjacent(self, x, y):
+        i = np.searchsorted(self._keys, x * _KEY + y)
+        return bool(i < len(self._keys) and self._keys[i] == x * _KEY + y)
+
+    def neighbors(self, x):
+        start, stop = np.searchsorted(self._keys, (x * _KEY, (x + 1) * _KEY))
+        return (self._keys[start:stop] % _KEY).tolist()
+
+    def add_vertex(self, val):
+        """
+        Adiciona um vértice e retorna seu id.
+        """
+        return int(self.add_vertices_from([val])[0])
+
+    def add_vertices_from(self, vals):
+        """
+        Adiciona vários vértices (por exemplo, um array (n, 2) de coordenadas) e retorna seus ids.
+        """
+        codes = _coordinate_codes(vals).reshape(-1)
+        first, self._size = self._size, self._size + len(codes)
+        if self._size > len(self._codes):
+            grown = np.empty(max(self._size, 2 * len(self._codes)), dtype=np.int64)
+            grown[:first] = self._codes[:first]
+            self._codes = grown
+        self._codes[first:self._size] = codes
+        self._count += len(codes)
+
+        # Os ids novos são maiores que todos os do índice, então entram depois dos que já têm a mesma coordenada
+        ids = np.arange(first, self._size)
+        order = np.argsort(codes, kind="stable")
+        positions = np.searchsorted(self._index_codes, codes[order], side="right")
+        self._index_codes = np.insert(self._index_codes, positions, codes[order])
+        self._index_ids = np.insert(self._index_ids, positions, ids[order])
+        self._frozen = None
+        return ids
+
+    def remove_vertex(self, x):
+        if not 0 <= x < self._size or self._codes[x] == _REMOVED:
+            return False
+        self._unindex(x)
+        self._codes[x] = _REMOVED
+        self._count -= 1
+
+        # Arestas de x (uma fatia) e as de volta, achadas pela chave de cada vizinho
+        start, stop = np.searchsorted(self._keys, (x * _KEY, (x + 1) * _KEY))
+        back = np.searchsorted(self._keys, self._keys[start:stop] % _KEY * _KEY + x)
+        self._keys = np.delete(self._keys, np.union1d(np.arange(start, stop), back))
+        self._frozen = None
+        return True
+
+    def add_edge(self, x, y):
+        if self.adjacent(x, y):
+            return False
+        self.add_edges_from([(x, y)])
+        return True
+
+    def add_edges_from(self, edges):
+        """
+        Adiciona as arestas de um array (m, 2) de ids; arestas já existentes são ignoradas.
+        """
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        a, b = edges[:, 0], edges[:, 1]
+        keys = np.sort(np.concatenate((a * _KEY + b, b * _KEY + a)))
+        keys = keys[np.append(True, keys[1:] != keys[:-1])] if len(keys) else keys
+        positions = np.searchsorted(self._keys, keys)
+        if len(self._keys):
+            new = self._keys[np.minimum(positions, len(self._keys) - 1)] != keys
+            keys, positions = keys[new], positions[new]
+        self._keys = np.insert(self._keys, positions, keys)
+        self._frozen = None
+
+    def remove_edge(self, x, y):
+        if not self.adjacent(x, y):
+            return False
+        self._keys = np.delete(self._keys, np.unique(np.searchsorted(self._keys, (x * _KEY + y, y * _KEY + x))))
+        self._frozen = None
+        return True
+
+    def get_vertex_value(self, x):
+        if not 0 <= x < self._size:
+            raise IndexError(x)
+        code = int(self._codes[x])
+        return None if code == _REMOVED else (code // _KEY, code % _KEY)
+
+    def set_vertex_value(self, x, v):
+        if not 0 <= x < self._size:
+            raise IndexError(x)
+        code = int(_coordinate_codes(v))
+        if self._codes[x] == _REMOVED:
+            self._count += 1 # O vértice volta a existir, sem arestas
+        else:
+            self._unindex(x)
+        self._codes[x] = code
+        i = self._index_position(code, x)
+        self._index_codes = np.insert(self._index_codes, i, code)
+        self._index_ids = np.insert(self._index_ids, i, x)
+
+    def _index_position(self, code, x):
+        # Posição do par (código, x) no multimapa: entre os ids com a mesma coordenada, em ordem de id
+        start = np.searchsorted(self._index_codes, code, side="left")
+        stop = np.searchsorted(self._index_codes, code, side="right")
+        return start + np.searchsorted(self._index_ids[start:stop], x)
+
+    def _unindex(self, x):
+        i = self._index_position(int(self._codes[x]), x)
+        self._index_codes = np.delete(self._index_codes, i)
+        self._index_ids = np.delete(self._index_ids, i)
+
+    def csr(self):
+        """
+        Matriz de adjacência CSR (somente leitura) com uma linha por id.
+
+        Um laço (x, x) vale 2, como nas listas de adjacência, em que o
+        vértice aparece duas vezes como vizinho de si mesmo.
+        """
+        if self._frozen is None:
+            n = self._size
+            rows, cols = self._keys // _KEY, self._keys % _KEY
+            indptr = np.searchsorted(rows, np.arange(n + 1))
+            data = np.where(rows == cols, 2, 1).astype(np.int32)
+            matrix = sparse.csr_matrix((data, cols.astype(np.int32), indptr), shape=(n, n))
+            for array in (matrix.data, matrix.indices, matrix.indptr):
+                array.flags.writeable = False
+            self._frozen = matrix
+        return self._frozen
+
+
+def _coordinate_codes(vals):
+    # Coordenadas (x, y), ou um array (m, 2) delas, como códigos x * _KEY + y
+    vals = np.asarray(vals, dtype=np.int64)
+    if vals.size and (vals.min() < 0 or vals.max() >= _KEY // 2):
+        raise ValueError("as coordenadas dos vértices devem estar entre 0 e 2^31")
+    return vals[..., 0] * _KEY + vals[..., 1]
+
+
+# Facções guardadas como int8: índice na lista abaixo (-1 = vila sem facção)
+FACTIONS = ['Golgari', 'Boros', 'Dimir', 'Barbarian']
+BARBARIAN = 3
+NO_FACTION = -1
+FACTION_COLORS = np.array([
+    (55, 182, 118),    # Golgari
+    (246, 145, 168),   # Boros
+    (73, 81, 131),     # Dimir
+    (255, 255, 255),   # Bárbaros
+], dtype=np.uint8)
+
+# Sorteios de cada vila a cada passo
+_DRAW_P = 0 # p de 0 a 100, comparado com as taxas
+_DRAW_CONVOKE = 1 # facção escolhida por um bárbaro convocado
+_DRAW_ORDER = 2 # ordem em que as facções são testadas (uma das 6 permutações)
+_DRAWS = 3
+_ORDERS = np.array(list(itertools.permutations(range(3))))
+
+_MASK64 = (1 << 64) - 1
+
+
+def _splitmix64_int(x):
+    x = (x + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+def _splitmix64(x):
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def uniform_draws(seed, step, vertices, channels=_DRAWS):
+    """
+    Números uniformes em [0, 1), um array (len(vertices), channels).
+
+    Cada número depende só de (seed, step, vértice, canal): é o splitmix64
+    de um contador, então o sorteio de uma vila não depende da ordem nem de
+    quantas outras vilas foram sorteadas antes (um pedaço do grafo pode ser
+    simulado separadamente com os mesmos resultados).
+    """
+    key = _splitmix64_int(seed ^ _splitmix64_int(step))
+    counters = np.asarray(vertices, dtype=np.uint64)[:, None] * np.uint64(channels) + np.arange(channels, dtype=np.uint64)
+    bits = _splitmix64(counters + np.uint64(key))
+    return (bits >> np.uint64(11)) * (1.0 / (1 << 53))
+
+
+def devotion(adjacency, factions):
+    """
+    Devoção de cada vila: quantos vizinhos de cada facção (Golgari, Boros, Dimir) ela tem.
+    """
+    one_hot = np.zeros((len(factions), 3), dtype=np.int32)
+    members = (factions >= 0) & (factions < BARBARIAN)
+    one_hot[np.flatnonzero(members), factions[members]] = 1
+    return adjacency @ one_hot
+
+
+def next_factions(factions, devoc, draws, rates):
+    """
+    Aplica as regras de Conway_empires a todas as vilas de uma vez.
+
+    rates = (chaos, convoke, dom, break), em pontos de 0 a 100. Para cada
+    vila é sorteado p de 0 a 100:
+    - um bárbaro com p <= convoke se une a uma facção aleatória;
+    - as outras vilas viram bárbaras com p <= chaos; senão, as facções são
+      percorridas em ordem aleatória e a primeira que se aplicar decide:
+      devoção 1 com p <= dom converte a vila para essa facção, e devoção 2
+      ou mais com p <= break a torna bárbara.
+    """
+    chaos_rate, convoke_rate, dom_rate, break_rate = rates
+    p = np.floor(draws[:, _DRAW_P] * 101)
+    new = factions.copy()
+
+    barbarian = factions == BARBARIAN
+    convoked = barbarian & (p <= convoke_rate)
+    new[convoked] = (draws[convoked, _DRAW_CONVOKE] * 3).astype(np.int8)
+
+    others = ~barbarian
+    chaos = others & (p <= chaos_rate)
+    new[chaos] = BARBARIAN
+
+    # Primeira facção elegível na ordem embaralhada de cada vila
+    rest = others & ~chaos
+    order = _ORDERS[(draws[:, _DRAW_ORDER] * len(_ORDERS)).astype(np.intp)]
+    dom = (devoc == 1) & (p <= dom_rate)[:, None]
+    breaks = (devoc >= 2) & (p <= break_rate)[:, None]
+    eligible = np.take_along_axis(dom | breaks, order, axis=1)
+    decided = rest & eligible.any(axis=1)
+    rows = np.flatnonzero(decided)
+    chosen = order[rows, eligible[rows].argmax(axis=1)]
+    new[rows] = np.where(dom[rows, chosen], chosen, BARBARIAN)
+    return new
+
+
+def generate_world(gradeX, gradeY, num_vilas, rng=random):
+    """
+    Gera a grade inicial preta com num_vilas vilas de facções aleatórias e num_vilas vilas bárbaras.
+
+    As vilas ficam nas coordenadas pares da grade. Retorna a grade ([y][x]
+    de cores) e a lista de coordenadas (x, y) das vilas.
+    """
+    factions = [tuple(color) for color in FACTION_COLORS[:BARBARIAN].tolist()]
+    barbarians = tuple(FACTION_COLORS[BARBARIAN].tolist())
+    grid = [[(0, 0, 0) for _ in range(gradeX)] for _ in range(gradeY)]
+    vilas = []
+
+    for _ in range(num_vilas):
+        x = rng.randint(0, gradeX//2 - 1)
+        y = rng.randint(0, gradeY//2 - 1)
+        grid[2*y][2*x] = rng.choice(factions) # Escolhe uma facção aleatória
+        vilas.append((2*x, 2*y))
+
+    for _ in range(num_vilas):
+        x = rng.randint(0, gradeX//2 - 1)
+        y = rng.randint(0, gradeY//2 - 1)
+        grid[2*y][2*x] = barbarians
+        vilas.append((2*x, 2*y))
+
+    return grid, vilas
+
 
 class Conway_empires(Model):
-    
-    
-    
+    """
+    Simulação das facções em um grafo de vilas, guardada em arrays.
+
+    A facção de cada vila é um int8 (índice em FACTIONS) e o grafo é uma
+    matriz de adjacência esparsa CSR (indptr/indices). A devoção de todas as
+    vilas sai de um único produto da matriz pelas facções em one-hot, e os
+    sorteios de um passo são feitos de uma vez com uniform_draws.
+    """
+
     def __init__(
         self,
         cell,
@@ -77,124 +351,52 @@ class Conway_empires(Model):
         mst,
         grid,
         param,
-        
-        
+        seed=None,
     ):
-        self.graph = G()
-        self.grid = grid
+        super().__init__()
         self.chaos_rate = param[0]
         self.convoke_rate = param[1]
         self.dom_rate = param[2]
         self.break_rate = param[3]
-        
-        BLACK = (0, 0, 0)
-        Barbarians = (255, 255, 255) 
-        Fac = [
-        (55, 182, 118),    # Golgari
-        (246, 145, 168),   # Boros
-        (73, 81, 131),     # Dimir
-        ]
-        
-        super().__init__()
-        self.cell_layer = PropertyLayer("cells", gradeX, gradeY, False, dtype=int)
-           
-        for v in vilas:
-            x, y = v
-            k = Vertex(v)
-            if grid[y][x] == (55, 182, 118):
-                    k.fac = 'Golgari'
-            if grid[y][x] == (246, 145, 168):
-                    k.fac = 'Boros'
-            if grid[y][x] == (73, 81, 131):
-                    k.fac = 'Dimir'
-            if grid[y][x] == (255, 255, 255):
-                    k.fac = 'Barbarian'
-            
-            self.graph.add_vertex(k)
-            
-        for m in mst:
-            n1, n2 = m
-            for v in self.graph.Core:
-                if v.val == n1:
-                    a = v
-                if v.val == n2:
-                    b = v
-            self.graph.add_edge(a, b)
-            
-        
-    def step(self):       
-        
-            for v in self.graph.Core:
-                v.devoc = [0, 0, 0] # mede a devoção, AKA quantidade de vizinho de tal facção
-                v.caos = 0 # mede o tanto de bárbaro perto
-                N = self.graph.neighbors(v)
-            
-
-                for n in N: # calcula a devoção as facções baseado nos vizinhos
-                    if n.fac == 'Golgari':
-                        v.devoc[0] += 1
-                    if n.fac == 'Boros':
-                        v.devoc[1] += 1
-                    if n.fac == 'Dimir':
-                        v.devoc[2] += 1
-                    if n.fac == 'Barbarian':
-                        v.caos += 1
-
-                p = random.randint(0,100)
-
-                
-                facs = ['Golgari', 'Boros', 'Dimir']
-                dice = [0,1,2]
-                
-                random.shuffle(dice)
-                
-                changed = False
-                
-                if v.fac == 'Barbarian':
-                    if p <= self.convoke_rate:
-                        v.next = random.choice(facs)
-                        changed = True
-                        
-                else:
-                    if p <= self.chaos_rate:
-                        changed = True
-                        v.next = 'Barbarian'
-                    
-                    for i in dice:
-                        if changed:
-                            continue
-                        if v.devoc[i] == 1 and p <= self.dom_rate:
-                            v.next = facs[i]
-                            changed = True
-                        if v.devoc[i] >= 2 and p <= self.break_rate:
-                            v.next = 'Barbarian'
-                            changed = True
-                            
-                if not changed:
-                    v.next = v.fac
-                    
-
-            # Atualiza as facções de cada vértice
-            for v in self.graph.Core:
-                v.fac = v.next
-                x, y = v.val
-                # Agora a cor depende da facção
-                if v.fac == 'Golgari':
-                    self.grid[y][x] = (55, 182, 118)
-                elif v.fac == 'Boros':
-                    self.grid[y][x] = (246, 145, 168)
-                elif v.fac == 'Dimir':
-                    self.grid[y][x] = (73, 81, 131)
-                elif v.fac == 'Barbarian':
-                    self.grid[y][x] = (255, 255, 255) 
-            
-            
-            
-                
-            
-                    
-                
-                        
-                
-                    
-            
+        self.seed = self.random.getrandbits(64) # Chave do gerador (vem da seed do modelo)
+        self.step_count = 0
+
+        # Tile de cada vila indexado por [x][y]: 0 = vazio, 1 + índice da facção nas outras
+        self.cell_layer = PropertyLayer("cells", gradeX, gradeY, 0, dtype=np.uint8)
+        self.grid = np.array(grid, dtype=np.uint8).reshape(gradeY, gradeX, 3) # Cor de cada tile, [y][x]
+
+        # Vilas e facções iniciais (pela cor da vila na grade)
+        self.villages = np.asarray(vilas, dtype=np.int64).reshape(-1, 2)
+        xs, ys = self.villages[:, 0], self.villages[:, 1]
+        colors = self.grid[ys, xs]
+        matches = (colors[:, None, :] == FACTION_COLORS[None, :, :]).all(axis=2)
+        self.factions = np.where(matches.any(axis=1), matches.argmax(axis=1), NO_FACTION).astype(np.int8)
+
+        # Grafo: cada ponta de aresta é a última vila com aquela coordenada
+        self.graph = G()
+        self.graph.add_vertices_from(self.villages)
+        self._shown = np.zeros(len(self.villages), dtype=bool) # Só a última vila de cada coordenada aparece na grade
+        self._shown[self.graph.indexed()] = True
+        shown = np.flatnonzero(self._shown & (self.factions != NO_FACTION))
+        self.cell_layer.data[xs[shown], ys[shown]] = self.factions[shown] + 1
+        ends = self.graph.find_all(np.asarray(mst, dtype=np.int64).reshape(-1, 2))
+        self.graph.add_edges_from(ends.reshape(-1, 2))
+        self.adjacency = self.graph.csr()
+        self.indptr = self.adjacency.indptr
+        self.indices = self.adjacency.indices
+
+    def step(self):
+        draws = uniform_draws(self.seed, self.step_count, np.arange(len(self.factions)))
+        rates = (self.chaos_rate, self.convoke_rate, self.dom_rate, self.break_rate)
+        self.set_factions(next_factions(self.factions, devotion(self.adjacency, self.factions), draws, rates))
+        self.step_count += 1
+
+    def set_factions(self, new):
+        """
+        Troca as facções das vilas, atualizando a cor só das que mudaram.
+        """
+        changed = np.flatnonzero((new != self.factions) & self._shown)
+        self.factions = new
+        xs, ys = self.villages[changed, 0], self.villages[changed, 1]
+        self.grid[ys, xs] = FACTION_COLORS[new[changed]]
+        self.cell_layer.data[xs, ys] = new[changed] + 1
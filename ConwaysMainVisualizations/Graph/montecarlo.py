@@ -0,0 +1,182 @@
+"""
+Estimativa de Monte Carlo de qual facção domina o Conway_empires para cada conjunto de parâmetros.
+
+Cada mundo é gerado e simulado sem tela em um processo do pool; a simulação
+para cedo quando chega a um estado absorvente (nenhuma vila pode mudar),
+quando uma facção (ou os bárbaros) ocupa todas as vilas, ou quando as
+proporções das facções param de variar (estado quase estacionário). As
+trajetórias e o resultado de cada mundo são escritos em disco assim que o
+mundo termina; no fim, a probabilidade de cada resultado, com intervalo de
+confiança de Wilson, vai para outcomes.csv.
+"""
+
+import csv
+import multiprocessing
+import os
+import random
+
+import numpy as np
+from scipy.stats import norm
+
+from modelo import BARBARIAN, FACTIONS, Conway_empires, devotion, generate_world
+from construcao_grafo import empire_edges
+
+
+def shares(factions):
+    """
+    Fração das vilas em cada facção de FACTIONS (vilas sem facção não contam em nenhuma).
+    """
+    counts = np.bincount(factions[factions >= 0], minlength=len(FACTIONS))
+    return counts / max(len(factions), 1)
+
+
+def is_absorbing(model):
+    """
+    True se nenhuma vila tem chance de mudar de facção no próximo passo.
+
+    Como p vai de 0 a 100 e as regras usam p <= taxa, uma regra só fica
+    impossível com taxa negativa.
+    """
+    factions = model.factions
+    barbarian = factions == BARBARIAN
+    if barbarian.any() and model.convoke_rate >= 0:
+        return False
+    others = ~barbarian
+    if not others.any():
+        return True
+    if model.chaos_rate >= 0:
+        return False
+    devoc = devotion(model.adjacency, factions)[others]
+    # Qualquer facção elegível pode ser a primeira da ordem sorteada
+    convert = (devoc == 1) & (model.dom_rate >= 0) & (np.arange(3) != factions[others][:, None])
+    breaks = (devoc >= 2) & (model.break_rate >= 0)
+    return not (convert | breaks).any()
+
+
+def wilson_interval(successes, n, confidence=0.95):
+    """
+    Intervalo de confiança de Wilson para uma proporção.
+    """
+    if n == 0:
+        return 0.0, 1.0
+    z = norm.ppf(0.5 + confidence / 2)
+    p = successes / n
+    center = (p + z**2 / (2*n)) / (1 + z**2 / n)
+    half = z * np.sqrt(p * (1 - p) / n + z**2 / (4 * n**2)) / (1 + z**2 / n)
+    return max(0.0, center - half) if successes else 0.0, min(1.0, center + half) if successes < n else 1.0
+
+
+def simulate(task):
+    """
+    Gera e simula um mundo; retorna (param_id, run, seed, motivo da parada, vencedor, trajetória).
+
+    A trajetória é um array (passos + 1, len(FACTIONS)) com as proporções de
+    cada facção, e o vencedor é o índice da facção com maior proporção no fim.
+    """
+    param_id, run, param, seed, (gradeX, gradeY, nodes), (max_steps, window, tol, dominance) = task
+    grid, vilas = generate_world(gradeX, gradeY, nodes, random.Random(seed))
+    a, b = empire_edges(vilas)
+    vilas = np.asarray(vilas)
+    model = Conway_empires(1, gradeX, gradeY, nodes, vilas, np.stack((vilas[a], vilas[b]), axis=1), grid, param, seed=seed)
+
+    trajectory = [shares(model.factions)]
+    reason = "max_steps"
+    for step in range(max_steps):
+        if is_absorbing(model):
+            reason = "absorbing"
+            break
+        if trajectory[-1].max() >= dominance:
+            reason = "monopoly" # Uma facção (ou os bárbaros) com todas as vilas
+            break
+        if step >= 2 * window:
+            # Média das proporções na última janela comparada com a da janela anterior
+            recent = np.mean(trajectory[-window:], axis=0)
+            previous = np.mean(trajectory[-2 * window:-window], axis=0)
+            if np.abs(recent - previous).max() < tol:
+                reason = "stationary"
+                break
+        model.step()
+        trajectory.append(shares(model.factions))
+
+    trajectory = np.array(trajectory)
+    return param_id, run, seed, reason, int(trajectory[-1].argmax()), trajectory
+
+
+def estimate(
+    params,
+    runs,
+    out_dir,
+    gradeX=180,
+    gradeY=80,
+    nodes=200,
+    max_steps=2000,
+    window=50,
+    tol=0.005,
+    dominance=1.0,
+    processes=None,
+    seed=0,
+    confidence=0.95,
+):
+    """
+    Roda runs mundos para cada lista de parâmetros [chaos, convoke, dom, break] e grava os resultados em out_dir.
+
+    Arquivos gerados:
+        trajectories.csv: proporção de cada facção a cada passo de cada mundo.
+        runs.csv: seed, número de passos, motivo da parada e vencedor de cada mundo.
+        outcomes.csv: probabilidade de cada facção vencer, com o intervalo de confiança.
+
+    Os dois primeiros são escritos à medida que os mundos terminam, então
+    nenhuma trajetória fica guardada na memória. A seed de cada mundo depende
+    só de (seed, índice dos parâmetros, run), e o resultado não depende do
+    número de processos. Retorna as linhas de outcomes.csv.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    limits = (max_steps, window, tol, dominance)
+    tasks = (
+        (param_id, run, list(param), _run_seed(seed, param_id, run), (gradeX, gradeY, nodes), limits)
+        for param_id, param in enumerate(params)
+        for run in range(runs)
+    )
+    wins = np.zeros((len(params), len(FACTIONS)), dtype=np.int64)
+
+    with open(os.path.join(out_dir, "trajectories.csv"), "w", newline="") as trajectories_file, \
+            open(os.path.join(out_dir, "runs.csv"), "w", newline="") as runs_file, \
+            multiprocessing.Pool(processes) as pool:
+        trajectories = csv.writer(trajectories_file)
+        trajectories.writerow(["param", "run", "step", *FACTIONS])
+        results = csv.writer(runs_file)
+        results.writerow(["param", "run", "seed", "steps", "reason", "winner"])
+
+        for param_id, run, run_seed, reason, winner, trajectory in pool.imap_unordered(simulate, tasks):
+            trajectories.writerows([param_id, run, step, *row] for step, row in enumerate(trajectory.tolist()))
+            results.writerow([param_id, run, run_seed, len(trajectory) - 1, reason, FACTIONS[winner]])
+            trajectories_file.flush()
+            runs_file.flush()
+            wins[param_id, winner] += 1
+
+    rows = []
+    for param_id, param in enumerate(params):
+        for faction, name in enumerate(FACTIONS):
+            low, high = wilson_interval(wins[param_id, faction], runs, confidence)
+            rows.append([param_id, *param, runs, name, float(wins[param_id, faction] / runs), float(low), float(high)])
+    with open(os.path.join(out_dir, "outcomes.csv"), "w", newline="") as outcomes_file:
+        outcomes = csv.writer(outcomes_file)
+        outcomes.writerow(["param", "chaos", "convoke", "dom", "break", "runs", "winner", "probability", "low", "high"])
+        outcomes.writerows(rows)
+    return rows
+
+
+def _run_seed(seed, param_id, run):
+    return int(np.random.SeedSequence([seed, param_id, run]).generate_state(1, dtype=np.uint64)[0])
+
+
+if __name__ == "__main__":
+    # Cada linha: chaos, convoke, dom, break (as mesmas taxas de visualizacaoempire.py)
+    params = [
+        [50, 30, 50, 30],
+        [10, 30, 50, 30],
+        [10, 10, 70, 10],
+        [5, 50, 30, 60],
+    ]
+    for row in estimate(params, runs=40, out_dir="resultados_empire", max_steps=1000):
+        print(*row)
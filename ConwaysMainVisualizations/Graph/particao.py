@@ -0,0 +1,258 @@
+"""
+Conway_empires dividido em partições do grafo, cada uma simulada por um processo.
+
+As vilas são divididas por bisseção espacial recursiva: cada corte separa as
+vilas pela coordenada x ou y na posição, perto da mediana, que corta menos
+arestas. Cada processo guarda só as suas vilas e as vilas vizinhas de outras
+partições (a borda); a cada passo ele escreve em memória compartilhada as
+facções das suas vilas de borda e lê de lá as das vizinhas.
+
+Os sorteios de uniform_draws dependem só de (seed, passo, vila), então cada
+processo sorteia apenas para as suas vilas e o resultado é exatamente o
+mesmo de Conway_empires.step() em um único processo.
+"""
+
+import math
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+from scipy import sparse
+
+from memoria import attach_shared_memory  # Da pasta de cima, que os scripts (visualizacaoempire.py) põem no sys.path
+from modelo import devotion, next_factions, uniform_draws
+
+
+def spatial_partition(points, adjacency, parts, imbalance=0.05):
+    """
+    Divide os vértices em parts partições de tamanhos parecidos; retorna a partição de cada vértice.
+
+    points são as coordenadas (x, y) de cada vértice e adjacency a matriz de
+    adjacência. Cada partição final pode se afastar até imbalance (fração) do
+    tamanho ideal n / parts; esse desvio é repartido entre os níveis de
+    bisseção, para não se acumular. A cada bisseção, entre as posições de
+    corte permitidas nos dois eixos, é escolhida a que corta menos arestas.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    n = len(points)
+    parts = min(max(int(parts), 1), max(n, 1))
+    labels = np.zeros(n, dtype=np.int64)
+    edges = sparse.triu(adjacency, k=1).tocoo()
+    sizes = (n / parts * (1 - imbalance), n / parts * (1 + imbalance))
+    _bisect(points, np.arange(n), edges.row.astype(np.int64), edges.col.astype(np.int64), parts, 0, sizes, labels)
+    return labels
+
+
+def edge_cut(adjacency, labels):
+    """
+    Número de arestas entre vértices de partições diferentes.
+    """
+    edges = sparse.triu(adjacency, k=1).tocoo()
+    return int(np.count_nonzero(labels[edges.row] != labels[edges.col]))
+
+
+def _bisect(points, vertices, a, b, parts, label, sizes, labels):
+    # a, b: arestas com as duas pontas em vertices; sizes: tamanhos mínimo e máximo de cada partição final
+    if parts == 1:
+        labels[vertices] = label
+        return
+    n = len(vertices)
+    left_parts = parts // 2
+    right_parts = parts - left_parts
+    target = round(n * left_parts / parts)
+    # O tamanho médio das partições (n / parts) pode se afastar de sizes só até a raiz levels-ésima da razão em cada
+    # uma das levels bisseções que ainda faltam, então nenhuma partição final sai de sizes
+    average = n / parts
+    levels = (parts - 1).bit_length()
+    shrink = (sizes[0] / average) ** (1 / levels) if sizes[0] > 0 else 0.0
+    grow = (sizes[1] / average) ** (1 / levels)
+    low = max(left_parts, math.ceil(max(left_parts * average * shrink, n - right_parts * average * grow)))
+    high = min(n - right_parts, math.floor(min(left_parts * average * grow, n - right_parts * average * shrink)))
+    if low > high:
+        low = high = target  # Nenhum corte cabe (poucos vértices): fica o mais próximo do ideal
+
+    position = np.full(len(points), -1, dtype=np.int64)
+    position[vertices] = np.arange(n)
+    best = None
+    for axis in (0, 1):
+        order = np.argsort(points[vertices, axis], kind="stable")
+        rank = np.empty(n, dtype=np.int64)
+        rank[order] = np.arange(n)
+        first = np.minimum(rank[position[a]], rank[position[b]])
+        last = np.maximum(rank[position[a]], rank[position[b]])
+        # Com os k primeiros de order à esquerda, a aresta é cortada se first < k <= last
+        cut = np.cumsum(np.bincount(first + 1, minlength=n + 1) - np.bincount(last + 1, minlength=n + 1))
+        k = low + int(np.lexsort((np.abs(np.arange(low, high + 1) - target), cut[low:high + 1]))[0])
+        if best is None or (cut[k], abs(k - target)) < (best[0], abs(best[1] - target)):
+            best = (cut[k], k, order, rank)
+
+    _, k, order, rank = best
+    left = rank[position[a]] < k
+    inside = left == (rank[position[b]] < k)
+    _bisect(points, vertices[order[:k]], a[inside & left], b[inside & left], left_parts, label, sizes, labels)
+    _bisect(points, vertices[order[k:]], a[inside & ~left], b[inside & ~left], right_parts,
+            label + left_parts, sizes, labels)
+
+
+class PartitionedEmpires:
+    """
+    Executa os passos de um Conway_empires em vários processos, um por partição do grafo.
+
+    O modelo continua sendo o dono do estado: run() envia as facções atuais
+    para os processos, executa os passos e devolve o resultado ao modelo com
+    model.set_factions(), então a grade e o cell_layer ficam atualizados
+    como se model.step() tivesse sido chamado steps vezes.
+
+    Entre passos só as facções das vilas de borda passam de um processo a
+    outro, por um buffer duplo em memória compartilhada: no passo s cada
+    processo escreve as suas vilas de borda no buffer s % 2, espera os
+    outros em uma barreira e lê as vizinhas do mesmo buffer. Quem escreve o
+    buffer de novo, dois passos depois, já passou pela barreira seguinte,
+    então ninguém ainda o está lendo.
+    """
+
+    def __init__(self, model, parts=None, imbalance=0.05):
+        self.model = model
+        adjacency = model.adjacency
+        n = len(model.factions)
+        self.labels = spatial_partition(model.villages, adjacency, parts or os.cpu_count() or 1, imbalance)
+        self.parts = int(self.labels.max()) + 1 if n else 1
+        self.cut = edge_cut(adjacency, self.labels)
+
+        # Vilas de cada partição e as vizinhas delas em outras partições
+        owned = [np.flatnonzero(self.labels == part) for part in range(self.parts)]
+        ghosts = []
+        for part, vertices in enumerate(owned):
+            neighbors = np.sort(adjacency[vertices].indices.astype(np.int64))
+            neighbors = neighbors[np.r_[True, neighbors[1:] != neighbors[:-1]]] if len(neighbors) else neighbors
+            ghosts.append(neighbors[self.labels[neighbors] != part])
+        boundary = np.sort(np.concatenate(ghosts)) if ghosts else np.empty(0, dtype=np.int64)
+        boundary = boundary[np.r_[True, boundary[1:] != boundary[:-1]]] if len(boundary) else boundary
+        self.boundary = len(boundary)
+
+        self._factions = shared_memory.SharedMemory(create=True, size=max(n, 1))
+        self._exchange = shared_memory.SharedMemory(create=True, size=max(2 * len(boundary), 1))
+        self._shared = np.ndarray((n,), dtype=np.int8, buffer=self._factions.buf)
+        self._barrier = multiprocessing.Barrier(self.parts) # Referência mantida até os processos abrirem a barreira
+
+        self._connections = []
+        self._processes = []
+        for vertices, outside in zip(owned, ghosts):
+            local = np.concatenate((vertices, outside))
+            writes = np.flatnonzero(np.isin(vertices, boundary, assume_unique=True))
+            partition = {
+                "vertices": vertices,
+                "local": local,
+                "adjacency": adjacency[vertices][:, local],
+                "write_rows": writes,
+                "write_slots": np.searchsorted(boundary, vertices[writes]),
+                "read_slots": np.searchsorted(boundary, outside),
+            }
+            connection, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_partition_worker,
+                args=(child, self._factions.name, self._exchange.name, n, len(boundary), partition, self._barrier),
+                daemon=True,
+            )
+            process.start()
+            child.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def step(self):
+        self.run(1)
+
+    def run(self, steps):
+        """
+        Executa steps passos do modelo nos processos das partições.
+        """
+        if not self._processes:
+            raise RuntimeError("os processos das partições já foram encerrados")
+        model = self.model
+        self._shared[:] = model.factions
+        rates = (model.chaos_rate, model.convoke_rate, model.dom_rate, model.break_rate)
+        try:
+            for connection in self._connections:
+                connection.send((model.seed, model.step_count, int(steps), rates))
+            errors = [error for error in (connection.recv() for connection in self._connections) if error is not None]
+        except (EOFError, OSError) as error:
+            # Um processo morreu: sem ele a barreira nunca se completa, então não há como continuar
+            self.close()
+            raise RuntimeError("um processo de partição terminou inesperadamente") from error
+        if errors:
+            # Todos os processos já responderam, então nenhum está esperando na barreira abortada e ela pode
+            # voltar ao estado inicial. O modelo fica como estava antes do run
+            self._barrier.reset()
+            raise RuntimeError(f"partição falhou: {errors[0]}")
+        model.set_factions(self._shared.copy())
+        model.step_count += int(steps)
+
+    def close(self):
+        """
+        Encerra os processos e libera a memória compartilhada.
+        """
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for connection in self._connections:
+            connection.close()
+        self._connections, self._processes = [], []
+        if self._shared is not None:
+            self._shared = None
+            for memory in (self._factions, self._exchange):
+                memory.close()
+                memory.unlink()
+
+
+def _partition_worker(connection, factions_name, exchange_name, n, boundary, partition, barrier):
+    factions_memory = attach_shared_memory(factions_name)
+    exchange_memory = attach_shared_memory(exchange_name)
+    shared = np.ndarray((n,), dtype=np.int8, buffer=factions_memory.buf)
+    exchange = np.ndarray((2, boundary), dtype=np.int8, buffer=exchange_memory.buf)
+
+    vertices = partition["vertices"]
+    local_ids = partition["local"]
+    adjacency = partition["adjacency"]
+    write_rows, write_slots = partition["write_rows"], partition["write_slots"]
+    read_slots = partition["read_slots"]
+    owned = len(vertices)
+
+    try:
+        while True:
+            command = connection.recv()
+            if command is None:
+                break
+            seed, start, steps, rates = command
+            try:
+                # Facções das próprias vilas seguidas das vizinhas de outras partições
+                local = shared[local_ids].copy()
+                for step in range(start, start + steps):
+                    draws = uniform_draws(seed, step, vertices)
+                    local[:owned] = next_factions(local[:owned], devotion(adjacency, local), draws, rates)
+                    buffer = exchange[step % 2]
+                    buffer[write_slots] = local[write_rows]
+                    barrier.wait()
+                    local[owned:] = buffer[read_slots]
+                shared[vertices] = local[:owned]
+            except Exception as error:
+                barrier.abort() # Libera as outras partições presas na barreira
+                connection.send(repr(error))
+                continue
+            connection.send(None)
+    finally:
+        shared = exchange = None
+        factions_memory.close()
+        exchange_memory.close()
@@ -1,8 +1,14 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 import pygame
-from modelo import Conway_empires
+from modelo import Conway_empires, FACTION_COLORS, generate_world
+from construcao_grafo import empire_edges
+from renderizacao import DirtyGridRenderer
+from simulacao import SimulationWorker
 import numpy as np
-import random
-import math
 
 def empire(
     cell,
@@ -21,144 +27,33 @@ def empire(
     clock = pygame.time.Clock()
     
     BLACK = (0, 0, 0)
-    Barbarians = (255, 255, 255) 
-    Fac = [
-    (55, 182, 118),    # Golgari
-    (246, 145, 168),   # Boros
-    (73, 81, 131),     # Dimir
-    ]
-    
-    
-    def generate_grid(gradeX2, gradeY, num_vilas):
-        grid = [[BLACK for _ in range(gradeX)] for _ in range(gradeY)]  # Grade inicial preta
-        vilas = []
-
-        for _ in range(num_vilas):
-            x = random.randint(0, gradeX//2 - 1)
-            y = random.randint(0, gradeY//2 - 1)
-            grid[2*y][2*x] = random.choice(Fac)  # Escolhe uma facção aleatória
-            vilas.append((2*x,2*y))
-            
-        for _ in range(num_vilas):
-            x = random.randint(0, gradeX//2 - 1)
-            y = random.randint(0, gradeY//2 - 1)
-            grid[2*y][2*x] = Barbarians  
-            vilas.append((2*x,2*y))
-            
-        return grid, vilas
-    
-    def draw_fac(grid, tile_size):
-        for y, row in enumerate(grid):
-            for x, color in enumerate(row):
-                pygame.draw.rect(
-                    screen,
-                    color,
-                    (x * tile_size, y * tile_size, tile_size, tile_size)
-                )
-                            
-    def calculate_edges(vilas):
-        edges = []
-        for i, (x1, y1) in enumerate(vilas):
-            for j, (x2, y2) in enumerate(vilas):
-                if i < j:  # Evitar duplicação
-                    weight = math.sqrt((x2 - x1)**2 + (y2 - y1)**2)
-                    edges.append((weight, (x1, y1), (x2, y2)))
-        return edges
-       
-    def Amina(plano: list):
-
-        n = len(plano)
-        
-        dist = [[0.0, 0]]*(n**2)
-        
-        for i in range(n):
-            for j in range(n):
-                dist[i*n + j] = [(plano[i][0] - plano[j][0])**2 + (plano[i][1] - plano[j][1])**2, i*n+j]
-                
-        dist.sort()
-                
-        link = [0]*n
-        size = [0]*n
-        
-        for i in range(n):
-            link[i] = i
-            size[i] = 1
-            
-        def find(k):
-            
-            nonlocal link
-            
-            while k != link[k]:
-                ram = link[k]
-                k = ram
-            
-            return k
-        
-        def same(x, y):
-            
-            nonlocal find
-            
-            return find(x) == find(y)
-        
-        def unite(x, y):
-            
-            nonlocal find
-            nonlocal size
-            nonlocal link
-            
-            a = find(x)
-            b = find(y)
-            
-            if ( size[a] < size[b]):
-                a, b = b, a
-                
-            size[a] += size[b]
-            link[b] = a   
     
-        tree = []
+    # Paleta indexada pelo tile: [0->Vazio, 1->Golgari, 2->Boros, 3->Dimir, 4->Bárbaros]
+    renderer = DirtyGridRenderer([BLACK, *FACTION_COLORS.tolist()])
 
-        q = 0
-
-        for d in dist:
-            
-            a = d[1]//n
-            b = d[1]%n
-            
-            if not same(a,b):
-                unite(a,b)
-                tree.append([plano[a],plano[b]])
-                q+=1
-                
-        
-        id = 0
-        id += q
-        
-        while(q):
-            
-            d = dist[id]
-            q -=1
-            id += 1
-            
-            a = d[1]//n
-            b = d[1]%n
-            
-            tree.append([plano[a],plano[b]])
-            
-
-        return tree
+    def draw_fac(tiles, tile_size):
+        # Só os blocos com vilas que mudaram de facção são redesenhados
+        return renderer.draw(screen, tiles, tile_size)
                             
     def draw_connections(mst, tile_size):
+            # As arestas não mudam: são desenhadas uma única vez em uma camada transparente (colorkey preto)
+            layer = pygame.Surface(screen.get_size())
+            layer.fill(BLACK)
+            layer.set_colorkey(BLACK)
             for (x1, y1), (x2, y2) in mst:
                 pygame.draw.line(
-                    screen,
+                    layer,
                     (200, 200, 200),  # Cor da linha (cinza claro)
                     (x1 * tile_size + tile_size // 2, y1 * tile_size + tile_size // 2),
                     (x2 * tile_size + tile_size // 2, y2 * tile_size + tile_size // 2),
                     1  # Espessura da linha
                 )
+            return layer
                 
-    grid, vilas = generate_grid(gradeX, gradeY, nodes)
-    mst = Amina(vilas)
+    grid, vilas = generate_world(gradeX, gradeY, nodes)
+    # Árvore geradora mínima mais as arestas extras mais curtas, como pares de coordenadas
+    a, b = empire_edges(vilas)
+    mst = [(vilas[i], vilas[j]) for i, j in zip(a.tolist(), b.tolist())]
     
     model = Conway_empires(
         cell, gradeX, gradeY, nodes, vilas, mst, grid, param
@@ -168,21 +63,34 @@ def empire(
     
     empty_color = colors["empty"]
     filled_color = colors["filled"]
-    
+
+    connections = draw_connections(mst, cell)
+
+    # A simulação roda em uma thread própria, a 1 passo por segundo; os tiles são copiados
+    # como [x][y] de índices da paleta, que é o formato esperado pelo renderizador
+    worker = SimulationWorker(model, lambda model: {"tiles": model.cell_layer.data}, steps_per_second=1)
+    worker.start()
+    drawn_version = None
 
     while running:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
 
-        # Atualiza a tela
-        screen.fill(BLACK)
-        draw_fac(grid, cell)
-        draw_connections(mst, cell)
-        pygame.display.flip()
-        clock.tick(1)
-        model.step()
+        # Atualiza a tela só quando há um passo novo, e só nas regiões que mudaram
+        frame = worker.acquire()
+        if frame.version != drawn_version:
+            dirty_rects = draw_fac(frame.data["tiles"], cell)
+            drawn_version = frame.version
+        else:
+            dirty_rects = []
+        worker.release()
+        for rect in dirty_rects:
+            screen.blit(connections, rect, rect) # Arestas por cima dos tiles redesenhados
+        pygame.display.update(dirty_rects)
+        clock.tick(60)
 
+    worker.stop()
     pygame.quit()
     
     
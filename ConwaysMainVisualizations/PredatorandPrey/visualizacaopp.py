@@ -1,4 +1,12 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 from pp_model import GameOfLifeModel
+from renderizacao import DirtyGridRenderer
+from simulacao import SimulationWorker
+from interface import Button, Label, Overlay, Slider, get_font
 import pygame
 import matplotlib.pyplot as plt
 import numpy as np
@@ -34,6 +42,8 @@ def run_GameOfLifeModel(
     empty_color = (0, 0, 0)  # Cor preta para o fundo
     prey_color = colors["prey"]  # Cor para presas
     predator_color = colors["predator"]  # Cor para predadores
+    # Paleta indexada pelo estado da célula: [0->Vazio, 1->Presa, 2->Predador]
+    renderer = DirtyGridRenderer([empty_color, prey_color, predator_color])
 
     # Definir a área do botão RESET (na parte superior direita)
     reset_button_rect = pygame.Rect(width * cell_size + 150, 20, 100, 40)
@@ -55,6 +65,56 @@ def run_GameOfLifeModel(
     base_speed = 10  # Base da velocidade (quanto maior, mais rápido)
     max_speed = 100  # Velocidade máxima
 
+    # Painel de controle: cada elemento é desenhado uma vez e só é redesenhado quando muda
+    control_area_rect = pygame.Rect(width * cell_size, 0, extra_width, height * cell_size)
+    controls = Overlay(control_area_rect, background=(50, 50, 50))
+    button_font = get_font("Arial", 20)
+    controls.add(Button(reset_button_rect, button_font, "RESET", (200, 200, 200), (200, 200, 200), text_offset=(20, 5)))
+    controls.add(Button(clear_button_rect, button_font, "CLEAR", (200, 200, 200), (200, 200, 200), text_offset=(20, 5)))
+
+    # Barra deslizante com a palavra 'Velocidade' acima
+    '''
+    O slider está com um bug em que, caso esteja no final ou começo, ao tentar clicar,
+    o display do jogo fecha, e não consegui consertar isso. 
+    '''
+    rate_label_width = button_font.size("Velocidade:")[0]
+    controls.add(Slider(
+        slider_rect, button_font, "Velocidade:", lambda: slider_pos,
+        label_offset=(slider_rect.width // 2 - rate_label_width // 2, -30),
+    ))
+
+    # Contador de presas e predadores
+    counter_font = get_font("Arial", 24)
+    prey_label = controls.add(Label((width * cell_size + 20, 650), counter_font, "", (0, 255, 0)))  # Cor verde para presas
+    predator_label = controls.add(Label((width * cell_size + 20, 620), counter_font, "", (255, 0, 0)))  # Cor vermelha para predadores
+    redraw_all = True
+
+    def clear_cells(model):
+        model.cell_layer.data = np.zeros((width, height), dtype=bool)
+
+    def set_cell(model, x, y, value):
+        if 0 <= x < width and 0 <= y < height:
+            model.cell_layer.data[x][y] = value
+
+    def record_counts(model):
+        # Armazenar os dados de cada passo (executado na thread da simulação)
+        nonlocal time_step
+        prey_counts.append(np.count_nonzero(model.cell_layer.data == 1))
+        predator_counts.append(np.count_nonzero(model.cell_layer.data == 2))
+        time_steps.append(time_step)
+        time_step += 1
+
+    def snapshot(model):
+        return {
+            "cells": model.cell_layer.data,
+            "prey_count": np.count_nonzero(model.cell_layer.data == 1),
+            "predator_count": np.count_nonzero(model.cell_layer.data == 2),
+        }
+
+    # A simulação roda em uma thread própria; a tela só desenha o último quadro publicado
+    worker = SimulationWorker(model, snapshot, on_step=record_counts)
+    worker.start()
+
     while running:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -72,20 +132,20 @@ def run_GameOfLifeModel(
 
                 # Clique no botão RESET
                 if reset_button_rect.collidepoint(mouse_x, mouse_y):
-                    model = GameOfLifeModel(lamb,width, height, alive_fraction=0.2)  # Reiniciar o modelo
+                    worker.set_model(GameOfLifeModel(lamb,width, height, alive_fraction=0.2))  # Reiniciar o modelo
                 elif slider_rect.collidepoint(mouse_x, mouse_y):
                     slider_pos = max(0, min(200, mouse_x - slider_rect.x))
                     dragging_slider = True
                 # Clique no botão Clear
                 elif clear_button_rect.collidepoint(mouse_x, mouse_y):
-                    model.cell_layer.data = np.zeros((width, height), dtype=bool)   
+                    worker.submit(clear_cells)
                 else:
                     # Clique simples ou duplo
                     current_time = pygame.time.get_ticks()
                     if current_time - last_click_time < 500:
-                        model.cell_layer.data[grid_x][grid_y] = 1  # Presa
+                        worker.submit(set_cell, grid_x, grid_y, 1)  # Presa
                     else:
-                        model.cell_layer.data[grid_x][grid_y] = 2  # Predador
+                        worker.submit(set_cell, grid_x, grid_y, 2)  # Predador
                     last_click_time = current_time
 
             if event.type == pygame.MOUSEBUTTONUP:
@@ -100,69 +160,28 @@ def run_GameOfLifeModel(
         speed_factor = slider_pos / 200  # Ajusta a velocidade com base na posição do slider (0 a 1)
         speed = base_speed * (speed_factor + 0.3)
 
+        worker.steps_per_second = speed  # Passos por segundo da simulação
+        worker.paused = paused
+        frame = worker.acquire()
+        prey_label.text = f"Presas: {frame.data['prey_count']}"
+        predator_label.text = f"Predadores: {frame.data['predator_count']}"
 
-        if not paused:
-            model.step()
-
-        prey_count = sum(1 for x in range(width) for y in range(height) if model.cell_layer.data[x][y] == 1)
-        predator_count = sum(1 for x in range(width) for y in range(height) if model.cell_layer.data[x][y] == 2)
-        # Armazenar os dados
-        prey_counts.append(prey_count)
-        predator_counts.append(predator_count)
-        time_steps.append(time_step)
-        time_step += 1
-
-
-        screen.fill(empty_color)
-        control_area_rect = pygame.Rect(width * cell_size, 0, extra_width, height * cell_size)
-        pygame.draw.rect(screen, (50,50,50,), control_area_rect)
-
-
-        # Desenho das células
-        for x in range(width):
-            for y in range(height):
-                if model.cell_layer.data[x][y] == 1:
-                    pygame.draw.rect(screen, prey_color, (x * cell_size, y * cell_size, cell_size, cell_size))
-                elif model.cell_layer.data[x][y] == 2:
-                    pygame.draw.rect(screen, predator_color, (x * cell_size, y * cell_size, cell_size, cell_size))
-
-        # Desenhando a barra deslizante (sl10)ider)
-        pygame.draw.rect(screen, (255, 255, 255), slider_rect, 2)  # Caixa do slider
-        pygame.draw.circle(screen, (255, 0, 0), (slider_rect.x + slider_pos, slider_rect.centery), 10)
-
-        # Desenhando o botão RESET
-        pygame.draw.rect(screen, (200, 200, 200), reset_button_rect)
-        font = pygame.font.SysFont("Arial", 20)
-        text = font.render("RESET", True, (0, 0, 0))
-        screen.blit(text, (reset_button_rect.x + 20, reset_button_rect.y + 5))
-
-        # Desenhando o botão CLEAR
-        pygame.draw.rect(screen, (200, 200, 200), clear_button_rect)
-        font = pygame.font.SysFont("Arial", 20)
-        text = font.render("CLEAR", True, (0, 0, 0))
-        screen.blit(text, (clear_button_rect.x + 20, clear_button_rect.y + 5))
-
-
-        # Exibindo o contador de presas e predadores
-        counter_font = pygame.font.SysFont("Arial", 24)
-        prey_text = counter_font.render(f"Presas: {prey_count}", True, (0, 255, 0))  # Cor verde para presas
-        predator_text = counter_font.render(f"Predadores: {predator_count}", True, (255, 0, 0))  # Cor vermelha para predadores
-        screen.blit(prey_text, (width * cell_size + 20, 650))  # Exibindo o contador de presas 
-        screen.blit(predator_text, (width * cell_size + 20, 620))  # Exibindo o contador de predadores logo abaixo
-
-        # Adicionando a palavra 'Velocidade' acima do slider
-        '''
-        O slider está com um bug em que, caso esteja no final ou começo, ao tentar clicar,
-        o display do jogo fecha, e não consegui consertar isso. 
-        '''
-        rate_font = pygame.font.SysFont("Arial", 20)
-        rate_text = rate_font.render("Velocidade:", True, (255, 255, 255))  # Cor branca para o texto
-        screen.blit(rate_text, (slider_rect.x + (slider_rect.width // 2) - rate_text.get_width() // 2, slider_rect.y - 30))
+        # Desenho das células (só os blocos que mudaram desde o último quadro)
+        dirty_rects = renderer.draw(screen, frame.data["cells"], cell_size)
+        worker.release()
 
+        # Painel de controle: só os elementos que mudaram são redesenhados
+        controls_dirty = controls.update()
+        if redraw_all:
+            controls_dirty = controls.draw(screen)
+            redraw_all = False
+        else:
+            controls_dirty = controls.draw(screen, controls_dirty)
 
-        pygame.display.flip()  # Atualizar a tela
-        clock.tick(speed)  # Ajusta a velocidade com base no slider (quanto maior o valor de speed, mais rápido será)
+        pygame.display.update(dirty_rects + controls_dirty)  # Atualizar só as regiões da tela que mudaram
+        clock.tick(60)  # A tela é atualizada a 60 quadros por segundo, independente da simulação
 
+    worker.stop()
     pygame.quit()  # Finaliza o pygame
 
 
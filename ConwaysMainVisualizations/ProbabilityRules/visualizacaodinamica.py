@@ -1,5 +1,11 @@
 # Imports (including necessary for graphing and multiprocessing)
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 import numpy as np
+import math
 import pygame
 from mesa import Model
 from mesa.datacollection import DataCollector
@@ -7,9 +13,13 @@ from mesa.space import PropertyLayer
 from scipy.signal import convolve2d
 from scipy.stats import expon
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-from multiprocessing import Process, Event, Manager
-import time
+from multiprocessing import Process, Event
+from renderizacao import AgeColorMap, DirtyGridRenderer # Renderização da grade (só os blocos que mudaram)
+from simulacao import SimulationWorker # Simulação em uma thread separada da renderização
+from camera import Camera # Janela com deslocamento e zoom sobre o tabuleiro
+from interface import Button, Label, Overlay, Slider, get_font # Interface em modo retido (widgets em cache)
+from telemetria import TelemetryRing # Canal em memória compartilhada entre o jogo e o gráfico
+from graficos import LivePlot # Linha do gráfico ao vivo (blitting e histórico em várias resoluções)
 
 
 class GameOfLifeModel(
@@ -113,45 +123,36 @@ class GameOfLifeModel(
 
 # Para plotar o gráfico
 
-def plot_graph(proportions, graph_event):
+def plot_graph(telemetry, graph_event):
     # Configuração da figura do gráfico
     fig, ax = plt.subplots()
     fig.patch.set_facecolor('black')  # Fundo preto para a janela do gráfico
     ax.set_facecolor('black')  # Fundo preto para o gráfico
 
-    x_data, y_data = [], []
-    line, = ax.plot([], [], lw=2, color="cyan")  # Linha ciano para destaque no fundo preto
-
-    def init_plot():
-        ax.set_xlim(0, 100)  # Range inicial do eixo x
-        ax.set_ylim(0, 1)  # Proporção de células vivas entre 0 e 1
-        ax.set_title("Fraction of Alive Cells Over Time", color="white")  # Título branco
-        ax.set_xlabel("Steps", color="white")  # Eixo x em branco
-        ax.set_ylabel("Fraction Alive", color="white")  # Eixo y em branco
-        ax.tick_params(axis='x', colors='white')  # Cor dos ticks do eixo x
-        ax.tick_params(axis='y', colors='white')  # Cor dos ticks do eixo y
-        return line,
-
-    def update_plot(frame):
-        if graph_event.is_set() and len(proportions) > 0:  # Atualiza somente quando não está pausado
-            if len(proportions) < len(x_data):
+    ax.set_xlim(0, 100)  # Range inicial do eixo x
+    ax.set_ylim(0, 1)  # Proporção de células vivas entre 0 e 1
+    ax.set_title("Fraction of Alive Cells Over Time", color="white")  # Título branco
+    ax.set_xlabel("Steps", color="white")  # Eixo x em branco
+    ax.set_ylabel("Fraction Alive", color="white")  # Eixo y em branco
+    ax.tick_params(axis='x', colors='white')  # Cor dos ticks do eixo x
+    ax.tick_params(axis='y', colors='white')  # Cor dos ticks do eixo y
+
+    # Linha ciano para destaque no fundo preto; desenhada com blitting a partir de um histórico reduzido
+    plot = LivePlot(ax, color="cyan", headroom=1.3)
+
+    def update_plot():
+        telemetry.mark_ready()  # A janela do gráfico já está aberta: o jogo pode começar
+        if graph_event.is_set():  # Atualiza somente quando não está pausado
+            records, reset = telemetry.read()  # Todos os passos desde o último quadro, de uma vez
+            if reset:
                 # Reset data on graph when graph data resets
-                x_data.clear()
-                y_data.clear()
-
-            x_data.append(len(proportions))
-            y_data.append(proportions[-1])
-            line.set_data(x_data, y_data)
+                plot.clear()
+            plot.extend(records[:, 0])
+        plot.update()
 
-            # Ajustar dinamicamente o range do eixo y
-            max_y = max(y_data)
-            y_limit = min(1, 1.3 * max_y)
-            ax.set_ylim(0, y_limit)
-
-            ax.set_xlim(0, len(proportions) * 1.3)  # Ajustar dinamicamente o eixo x
-        return line,
-
-    ani = FuncAnimation(fig, update_plot, init_func=init_plot)
+    timer = fig.canvas.new_timer(interval=50)
+    timer.add_callback(update_plot)
+    timer.start()
     plt.show()
 
 
@@ -166,7 +167,8 @@ def run_GameOfLifeModel(
     alive_fraction = 0.2,
     tick=20,
     graph=False,
-    screen_size=None
+    screen_size=None,
+    board_size=None
 ):
     """
     Função principal para executar o jogo da vida probabilístico.
@@ -185,6 +187,8 @@ def run_GameOfLifeModel(
         tick (int): Velocidade inicial da simulação.
         graph (bool): Define se o gráfico (step, alive_fraction) será plotado
         screen_size: tamanho de inicialização da tela
+        board_size (tuple, optional): Tamanho (largura, altura) do tabuleiro em células.
+            Por padrão, o tabuleiro tem o tamanho da janela com o cell_size inicial.
     """
 
     # Definição de cores para células e botões
@@ -192,20 +196,39 @@ def run_GameOfLifeModel(
     filled_color = colors["filled"]
     button_color = (200, 200, 200)
     button_hover_color = (150, 150, 150)
+    renderer = DirtyGridRenderer([empty_color])
+    age_colors = AgeColorMap(empty_color=empty_color)
 
         # Inicializa as configurações do gráfico se graph == True
     if graph:
-        manager = Manager()
-        proportions = manager.list()
+        telemetry = TelemetryRing(("alive_fraction", "mean_age", "max_age"))
         graph_event = Event()
         graph_event.set()  # Inicia os updates no gráfico
 
         # Inicia o gráfico como um processo separado
-        graph_process = Process(target=plot_graph, args=(proportions, graph_event))
+        graph_process = Process(target=plot_graph, args=(telemetry, graph_event))
         graph_process.start()
 
-        # Delay para que o jogo inicie depois que o gráfico estiver configurado
-        time.sleep(4)
+        # O jogo inicia assim que o gráfico avisar que está configurado
+        telemetry.wait_ready()
+
+    stats = {"alive_count": 0, "mean_age": 0.0, "max_age": 0}  # Calculadas na thread da simulação
+
+    def update_stats(model):
+        """
+        Conta as células vivas e calcula a idade média e máxima delas (executado na thread da simulação,
+        após cada passo ou comando, para que a interface só copie os números prontos).
+        """
+        alive_ages = model.age_layer.data[model.cell_layer.data]
+        stats["alive_count"] = alive_ages.size
+        stats["mean_age"] = float(alive_ages.mean()) if alive_ages.size else 0.0
+        stats["max_age"] = int(alive_ages.max()) if alive_ages.size else 0
+
+    def snapshot(model):
+        """
+        Estado copiado da simulação para a interface a cada quadro publicado (as estatísticas já vêm calculadas).
+        """
+        return dict(stats, cells=model.cell_layer.data, ages=model.age_layer.data)
 
     def initialize_pygame(cell_size, screen_size):
         """
@@ -280,9 +303,56 @@ def run_GameOfLifeModel(
         }
         return sliders
 
+    def clear_cells(model):
+        """
+        Apaga todas as células (executado na thread da simulação).
+        """
+        model.cell_layer.data = np.zeros(model.cell_layer.data.shape, dtype=bool)
+        update_stats(model)
+        if graph:
+            telemetry.reset()  # Reinicia o gráfico com o clique
+
+    def randomize_cells(model, alive_fraction):
+        """
+        Sorteia um novo estado com a densidade dada (executado na thread da simulação).
+        """
+        model.cell_layer.data = np.random.rand(*model.cell_layer.data.shape) <= alive_fraction
+        update_stats(model)
+        if graph:
+            telemetry.reset()  # Reinicia o gráfico com o clique
+
+    def record_proportion(model):
+        """
+        Atualiza as estatísticas e envia a fração de células vivas e a idade média e máxima de cada passo
+        para o gráfico (executado na thread da simulação).
+        """
+        update_stats(model)
+        if graph:
+            telemetry.push(model.alive_fraction, stats["mean_age"], stats["max_age"])
+
+    def apply_clicks(model, clicks):
+        """
+        Acende as células clicadas na interface (executado na thread da simulação).
+        """
+        xs, ys = zip(*clicks)
+        model.cell_layer.data[list(xs), list(ys)] = True
+        update_stats(model)
+
+    def slider_to_zoom(pos):
+        """
+        Converte a posição do slider Cell Size (0 a 200) em pixels por célula (5 a 50).
+        """
+        return int(pos / 200 * 45 + 5)
+
+    def zoom_to_slider(zoom):
+        """
+        Posição do slider Cell Size para um zoom (cortada nas pontas do slider).
+        """
+        return max(0, min(200, math.ceil((zoom - 5) / 45 * 200)))
+
     def handle_events(
-        model, width, height, cell_size, clear_button_rect, random_button_rect, exit_button_rect,
-        sliders, paused, dragging_slider
+        worker, camera, clear_button_rect, random_button_rect, exit_button_rect,
+        sliders, paused, dragging_slider, panning
     ):
         """
         Processa eventos do usuário, incluindo mouse, teclado e interação com botões.
@@ -293,21 +363,20 @@ def run_GameOfLifeModel(
             if event.type == pygame.QUIT:
                 running = False
 
-            elif event.type == pygame.MOUSEBUTTONDOWN:
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 3:
+                panning = True  # Botão direito arrasta a janela pelo tabuleiro
+
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                 mouse_x, mouse_y = pygame.mouse.get_pos()
 
                 # Botões
                 if clear_button_rect.collidepoint(mouse_x, mouse_y):
-                    model.cell_layer.data = np.zeros((width, height), dtype=bool)
-                    if graph and proportions is not None:
-                        proportions[:] = []    # Reinicia o gráfico com o clique
+                    worker.submit(clear_cells)
 
                 elif random_button_rect.collidepoint(mouse_x, mouse_y):
                     slider3 = sliders['slider3']
                     alive_fraction = slider3['pos']/200
-                    model.cell_layer.data = np.random.rand(width, height) <= alive_fraction
-                    if graph and proportions is not None:
-                        proportions[:] = []  # Reinicia o gráfico com o clique
+                    worker.submit(randomize_cells, alive_fraction)
 
                 elif exit_button_rect.collidepoint(mouse_x, mouse_y):  
                     running = False
@@ -319,142 +388,96 @@ def run_GameOfLifeModel(
 
                 # Interação com células
                 else:
-                    grid_x = mouse_x // cell_size
-                    grid_y = mouse_y // cell_size
-                    if 0 <= grid_x < width and 0 <= grid_y < height:
-                        click_buffer[grid_x, grid_y] = not click_buffer[grid_x, grid_y]
+                    cell = camera.screen_to_cell(mouse_x, mouse_y)
+                    if cell is not None:
+                        click_buffer.symmetric_difference_update({cell})
 
             elif event.type == pygame.MOUSEBUTTONUP:
+                panning = False
                 for key in dragging_slider:
                     dragging_slider[key] = False
 
             elif event.type == pygame.MOUSEMOTION:
+                if panning:
+                    camera.pan(*event.rel)
                 mouse_x, mouse_y = pygame.mouse.get_pos()
                 for key, slider in sliders.items():
                     if dragging_slider.get(key, False):
                         slider["pos"] = max(0, min(200, mouse_x - slider["rect"].x))
 
+            elif event.type == pygame.MOUSEWHEEL:
+                camera.step_zoom(event.y, *pygame.mouse.get_pos())  # Zoom em torno do cursor
+
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE:
                     paused = not paused
 
         # Calcula valores normalizados dos sliders
         slider_values = {key: slider["pos"] / 200 for key, slider in sliders.items()}
-        return running, paused, dragging_slider, slider_values
+        return running, paused, dragging_slider, panning, slider_values
         
-    def draw_cells(screen, model, cell_size, width, height, empty_color):
-        """
-        Renderiza as células com base no estado do modelo.
-        """
-        for x in range(width):
-            for y in range(height):
-                if model.cell_layer.data[x][y]:
-                    age = model.age_layer.data[x][y]
-                    red_intensity = min(255, max(0, age * 5))
-                    green_intensity = max(0, 255 - age * 5)
-                    blue_intensity = max(0, 255 - age * 5)
-                    cell_color = (red_intensity, green_intensity, blue_intensity)
-                else:
-                    cell_color = empty_color
-
-                pygame.draw.rect(
-                    screen,
-                    cell_color,
-                    (x * cell_size, y * cell_size, cell_size, cell_size)
-                )
-
-    def draw_button(screen, rect, text, font, mouse_pos, color, hover_color):
+    def draw_cells(screen, frame, camera):
         """
-        Renderiza um botão na tela.
+        Renderiza as células visíveis na câmera com base no último quadro publicado pela simulação.
         """
-        if rect.collidepoint(mouse_pos):
-            pygame.draw.rect(screen, hover_color, rect)
-        else:
-            pygame.draw.rect(screen, color, rect)
+        cells, ages = frame.data["cells"], frame.data["ages"]
+
+        def colorize(window):
+            # Cor por idade (vermelho cresce e verde/azul caem com a idade) vinda da tabela pré-calculada
+            return age_colors.colors(ages[window], cells[window])
 
-        button_text = font.render(text, True, (0, 0, 0))
-        screen.blit(button_text, (rect.x + 15, rect.y + 5))
+        return camera.draw(screen, renderer, cells, colorize, frame.version)
 
-    def render_game(screen, model, cell_size, width, height, empty_color):
+    def render_game(screen, frame, camera):
         """
-        Renderiza o estado atual do jogo na tela.
+        Renderiza o estado atual do jogo na tela e retorna as regiões que mudaram.
         """
-        screen.fill((0, 0, 0))  # Limpa a tela
-        draw_cells(screen, model, cell_size, width, height, empty_color)
+        return draw_cells(screen, frame, camera)
 
-    def render_buttons(screen, font, mouse_pos, clear_button_rect, random_button_rect, exit_button_rect, button_color, button_hover_color):
+    def setup_overlays(screen, controls_rect, font, sliders, clear_button_rect, random_button_rect, exit_button_rect):
         """
-        Renderiza os botões na tela.
+        Cria as camadas da interface: os controles abaixo da grade e as informações do modelo sobre ela.
+        Cada widget guarda o próprio desenho e só é redesenhado quando o que ele mostra muda.
         """
-        draw_button(screen, clear_button_rect, "Clear", font, mouse_pos, button_color, button_hover_color)
-        draw_button(screen, random_button_rect, "Random", font, mouse_pos, button_color, button_hover_color) 
-        draw_button(screen, exit_button_rect, "Exit", font, mouse_pos, button_color, button_hover_color) 
+        controls = Overlay(controls_rect, background=(0, 0, 0))
+
+        # Botões
+        controls.add(Button(clear_button_rect, font, "Clear", button_color, button_hover_color))
+        controls.add(Button(random_button_rect, font, "Random", button_color, button_hover_color))
+        controls.add(Button(exit_button_rect, font, "Exit", button_color, button_hover_color))
+
+        # Sliders, com o valor de cada um ao lado da caixa
+        value_texts = {
+            "slider1": lambda pos: f"{int(pos / 200 * 50):.1f}",  # Velocidade de 0 a 50
+            "slider2": lambda pos: f"{100 * pos / 10000:.2f}",  # Respawn de 0% a 2%
+            "slider3": lambda pos: f"{pos / 200:.2f}",  # Densidade de 0 a 1
+            "slider4": lambda pos: f"{slider_to_zoom(pos)}",  # Tamanho das células de 5 a 50 pixels
+        }
+        for key, slider in sliders.items():
+            controls.add(Slider(slider["rect"], font, slider["label"], lambda slider=slider: slider["pos"], value_texts[key]))
+
+        # Status de pausa/execução do jogo
+        controls.add(Label(
+            (screen.get_width() - 120, screen.get_height() - 80), get_font(None, 30),
+            lambda: "PAUSED" if paused else "RUNNING",
+            lambda: (255, 0, 0) if paused else (0, 255, 0),
+        ))
+
+        # Informações do modelo: células vivas, idade média e máxima (o texto fica sobre a grade)
+        info = Overlay((10, 10, 250, 60))
+        info_labels = [info.add(Label((10, 10 + 20 * i), font, "")) for i in range(3)]
+        return controls, info, info_labels
 
-    def render_sliders(screen, font, sliders):
+    def render_model_info(frame, max_age):
         """
-        Renderiza os sliders na tela.
+        Atualiza os textos com informações do modelo: células vivas, idade média e máxima.
+        Os números vêm prontos da simulação, então só é chamada quando chega um quadro novo.
         """
-        for key, slider in sliders.items():
-            # Desenha a legenda em cima do slider
-            label = font.render(slider["label"], True, (255, 255, 255))
-            screen.blit(label, (slider["rect"].x, slider["rect"].y - 20))  # Coloca a legenda 20 pixels acima do slider
-
-            # Desenha o slider
-            pygame.draw.rect(screen, (255, 255, 255), slider["rect"], 2)  # Slider outline
-            pygame.draw.circle(screen, (255, 0, 0), (slider["rect"].x + slider["pos"], slider["rect"].centery), 10)
-
-        # Valor do slider (de 0 a 50) para a velocidade
-        slider1 = sliders['slider1']
-        value = int(slider1["pos"] / 200 * 50)  # Escala o valor de 0 a 50
-        value_text = font.render(f"{value:.1f}", True, (255, 255, 255))
-        screen.blit(value_text, (slider1["rect"].x + slider1["rect"].width + 10, slider1["rect"].y))
-        # Valor do slider (de 0% a 2%) para o respawn
-        slider2 = sliders['slider2']
-        value = slider2["pos"] / 10000  # Escala o valor de 0 a 0.02
-        value_text = font.render(f"{100*value:.2f}", True, (255, 255, 255))
-        screen.blit(value_text, (slider2["rect"].x + slider2["rect"].width + 10, slider2["rect"].y))
-        revive_probabilities[0] = value
-        # Ajustar a densidade
-        slider3 = sliders['slider3']
-        value = slider3["pos"] / 200  # Densidade de 0 a 1
-        value_text = font.render(f"{value:.2f}", True, (255, 255, 255))
-        screen.blit(value_text, (slider3["rect"].x + slider3["rect"].width + 10, slider3["rect"].y))
-        # Valor do slider (de 5 a 50 pixels) para o tamanho das células
-        slider4 = sliders['slider4']
-        value = int(slider4["pos"] / 200 * 45 + 5)  # Escala o valor de 5 a 50
-        value_text = font.render(f"{value}", True, (255, 255, 255))
-        screen.blit(value_text, (slider4["rect"].x + slider4["rect"].width + 10, slider4["rect"].y))
-
-    def render_status(screen, font, width, cell_size, paused):
-        """
-        Exibe o status de pausa/execução do jogo.
-        """
-        pause_text = "PAUSED" if paused else "RUNNING"
-        pause_color = (255, 0, 0) if paused else (0, 255, 0)
-        pause_surface = pygame.font.SysFont(None, 30).render(pause_text, True, pause_color)
-
-        display_info = pygame.display.Info()
-        screen_width = display_info.current_w  # Largura da tela em pixels
-        screen_height = display_info.current_h  # Altura da tela em pixels
-        screen.blit(pause_surface, (screen_width - 120, screen_height - 80))
-
-    def render_model_info(screen, font, model, max_age):
-        """
-        Exibe informações do modelo: células vivas, idade média e máxima.
-        """
-        try:
-            average_age = np.mean(model.age_layer.data[model.cell_layer.data])
-            max_age = max(max_age, np.max(model.age_layer.data[model.cell_layer.data]))
-        except:
-            average_age = 0
-
-        alive_count_text = font.render(f"Vivas: {model.alive_count}", True, (255, 255, 255))
-        avg_age_text = font.render(f"Idade Média: {average_age:.2f}", True, (255, 255, 255))
-        max_age_text = font.render(f"Idade Máxima: {max_age}", True, (255, 255, 255))
-        
-        screen.blit(alive_count_text, (10, 10))
-        screen.blit(avg_age_text, (10, 30))
-        screen.blit(max_age_text, (10, 50))
+        max_age = max(max_age, frame.data["max_age"])
+
+        info_labels[0].text = f"Vivas: {frame.data['alive_count']}"
+        info_labels[1].text = f"Idade Média: {frame.data['mean_age']:.2f}"
+        info_labels[2].text = f"Idade Máxima: {max_age}"
 
         return max_age  # Atualiza o valor de idade máxima
     
@@ -463,8 +486,9 @@ def run_GameOfLifeModel(
         screen_size = (1130, 680)
     # Slider está com problema de renderização para largura screen_size menor que (1100, y). Na prática, o jogo funciona igual, é só um problema de vizualização
     screen, clock, width, height = initialize_pygame(cell_size, screen_size)
+    board_width, board_height = board_size or (width, height) # O tabuleiro pode ser maior que a janela.
     model = GameOfLifeModel( # Instancia o modelo do jogo.
-        width, height, revive_probabilities, survival_probabilities, alive_fraction, lamb, age_death
+        board_width, board_height, revive_probabilities, survival_probabilities, alive_fraction, lamb, age_death
     ) 
     clear_button_rect, random_button_rect, exit_button_rect = setup_buttons(screen.get_width(), screen.get_height()) # Configuração dos botões.
     sliders = setup_sliders(screen.get_width(), screen.get_height()) # Configuração inicial dos sliders
@@ -472,58 +496,81 @@ def run_GameOfLifeModel(
     running, paused = True, False # Estados iniciais do jogo.
     dragging_slider = {key: False for key in sliders}  # Inicialização do estado de arraste
     max_age = 0 # Idade máxima inicial.
-    click_buffer = np.zeros((width, height), dtype=bool)
+    info_version = None # Versão do quadro mostrada nos textos de informação.
+    redraw_all = True # Redesenha a tela inteira no primeiro quadro.
+    panning = False # Arraste da janela com o botão direito.
+    click_buffer = set() # Células clicadas desde o último quadro.
+
+    # A janela mostra parte do tabuleiro; o slider Cell Size e a roda do mouse mudam o zoom
+    camera = Camera((board_width, board_height), (0, 0, screen.get_width(), height * cell_size), zoom=cell_size, colors=(empty_color, filled_color))
+    sliders["slider4"]["pos"] = cell_size_pos = zoom_to_slider(cell_size)
+    camera_state = camera.state()
+    controls_rect = pygame.Rect(0, camera.viewport.bottom, screen.get_width(), screen.get_height() - camera.viewport.bottom)
+    controls, info, info_labels = setup_overlays(screen, controls_rect, font, sliders, clear_button_rect, random_button_rect, exit_button_rect)
+
+    # A simulação roda em uma thread própria; a tela só desenha o último quadro publicado
+    update_stats(model)
+    worker = SimulationWorker(model, snapshot, steps_per_second=0, on_step=record_proportion)
+    worker.start()
 
     # Loop Principal do jogo.
     while running:
-        mouse_pos = pygame.mouse.get_pos()
-        running, paused, dragging_slider, slider_values = handle_events(
-            model, width, height, cell_size, clear_button_rect, random_button_rect, exit_button_rect,
-            sliders, paused, dragging_slider
+        running, paused, dragging_slider, panning, slider_values = handle_events(
+            worker, camera, clear_button_rect, random_button_rect, exit_button_rect,
+            sliders, paused, dragging_slider, panning
         )
         speed = int(slider_values["slider1"] * 50)
 
-        if speed != 0:
-            clock.tick(speed)  # Ajusta a velocidade do jogo
-
         if speed == 0:
             paused = True
 
-        if not paused:
-            model.step()
-        model.cell_layer.data = np.logical_or(model.cell_layer.data, click_buffer)
-        click_buffer.fill(False)
-
-        if not paused:
-            if graph:
-                proportions.append(model.alive_fraction)
-
-        new_cell_size = int(slider_values["slider4"] * 45 + 5)
-
-        # Se o tamanho das células mudou, recalcular a grade
-        if new_cell_size != cell_size:
-            cell_size = new_cell_size
-            width = screen.get_width() // cell_size
-            height = (screen.get_height() - 100) // cell_size
-            model = GameOfLifeModel(
-                width, height, revive_probabilities, survival_probabilities, alive_fraction, lamb, age_death
-            )
-            # Reinicialize o click_buffer para o novo tamanho
-            click_buffer = np.zeros((width, height), dtype=bool)
-
-        # Renderização
-        screen.fill((0, 0, 0))
-        render_game(screen, model, cell_size, width, height, empty_color)
-        render_buttons(screen, font, mouse_pos, clear_button_rect, random_button_rect, exit_button_rect, button_color, button_hover_color)
-        render_sliders(screen, font, sliders)
-        render_status(screen, font, width, cell_size, paused)
-        max_age = render_model_info(screen, font, model, max_age)
-        pygame.display.flip()
+        worker.steps_per_second = speed  # Ajusta a velocidade do jogo (passos por segundo)
+        worker.paused = paused
+        revive_probabilities[0] = sliders["slider2"]["pos"] / 10000  # Respawn de 0% a 2%
+        if click_buffer:
+            worker.submit(apply_clicks, list(click_buffer))
+            click_buffer.clear()
+
+        # O slider Cell Size muda o zoom da câmera (o tabuleiro continua o mesmo)
+        if sliders["slider4"]["pos"] != cell_size_pos:
+            camera.zoom_at(slider_to_zoom(sliders["slider4"]["pos"]), *camera.viewport.center)
+        sliders["slider4"]["pos"] = cell_size_pos = zoom_to_slider(camera.zoom)
+
+        # Deslocamento ou zoom: a janela inteira precisa ser redesenhada
+        if camera.state() != camera_state:
+            camera_state = camera.state()
+            redraw_all = True
+
+        clock.tick(60)  # A tela é atualizada a 60 quadros por segundo, independente da simulação
+        frame = worker.acquire()
+
+        # Renderização: só as regiões que mudaram são enviadas para a tela
+        if redraw_all:
+            screen.fill((0, 0, 0))
+            renderer.invalidate()
+        if frame.version != info_version:
+            max_age = render_model_info(frame, max_age)
+            info_version = frame.version
+        for rect in info.update():
+            renderer.mark_dirty(rect)  # O texto antigo fica sobre a grade, então os blocos embaixo dele são redesenhados
+        dirty_rects = render_game(screen, frame, camera)
+        worker.release()
+        dirty_rects += info.draw(screen, dirty_rects)  # O texto volta só onde a grade foi redesenhada
+        controls_dirty = controls.update()
+
+        if redraw_all:
+            controls.draw(screen)
+            pygame.display.flip()
+            redraw_all = False
+        else:
+            pygame.display.update(dirty_rects + controls.draw(screen, controls_dirty))
 
+    worker.stop()
     if graph:
         graph_process.terminate()
+        telemetry.close()
 
     pygame.quit()
 
 if __name__ == '__main__':
-    run_GameOfLifeModel(10, {0: 0.001, 3: 1.0}, {2: 1, 3: 1}, 1050, False, graph=True)
\ No newline at end of file
+    run_GameOfLifeModel(10, {0: 0.001, 3: 1.0}, {2: 1, 3: 1}, 1050, False, graph=True)
\ No newline at end of file
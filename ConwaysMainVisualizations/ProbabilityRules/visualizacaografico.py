@@ -1,6 +1,11 @@
 # A ideia dessa modificação é implementar um gráfico de evolução da proporção células vivas/ total de células.
 
 # The previous default libraries 
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 import numpy as np
 import pygame
 from mesa import Model
@@ -11,9 +16,14 @@ from scipy.stats import expon
 
 # For the evolution graph ploting
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-from multiprocessing import Process, Event, Manager
-import time  # For adding a delay in the game initialization for the graphic to initialize before the game when graph = True.
+from multiprocessing import Process, Event
+
+# Renderização da grade (só os blocos que mudaram), simulação em uma thread separada e interface em modo retido
+from renderizacao import AgeColorMap, DirtyGridRenderer
+from simulacao import SimulationWorker
+from interface import Button, Label, Overlay, Slider, get_font
+from telemetria import TelemetryRing  # Canal em memória compartilhada entre o jogo e o gráfico
+from graficos import LivePlot  # Linha do gráfico ao vivo (blitting e histórico em várias resoluções)
 
 
 class GameOfLifeModel(
@@ -117,40 +127,33 @@ class GameOfLifeModel(
 
 # Para plotar o gráfico
 
-def plot_graph(proportions, graph_event):
+def plot_graph(telemetry, graph_event):
     # Configuração da figura do gráfico
     fig, ax = plt.subplots()
     fig.patch.set_facecolor('black')  # Fundo preto para a janela do gráfico
     ax.set_facecolor('black')  # Fundo preto para o gráfico
 
-    x_data, y_data = [], []
-    line, = ax.plot([], [], lw=2, color="cyan")  # Linha ciano para destaque no fundo preto
-
-    def init_plot():
-        ax.set_xlim(0, 100)  # Range inicial do eixo x
-        ax.set_ylim(0, 1)  # Proporção de células vivas entre 0 e 1
-        ax.set_title("Fraction of Alive Cells Over Time", color="white")  # Título branco
-        ax.set_xlabel("Steps", color="white")  # Eixo x em branco
-        ax.set_ylabel("Fraction Alive", color="white")  # Eixo y em branco
-        ax.tick_params(axis='x', colors='white')  # Cor dos ticks do eixo x
-        ax.tick_params(axis='y', colors='white')  # Cor dos ticks do eixo y
-        return line,
-
-    def update_plot(frame):
-        if graph_event.is_set() and len(proportions) > 0:  # Atualiza somente quando não está pausado
-            x_data.append(len(proportions))
-            y_data.append(proportions[-1])
-            line.set_data(x_data, y_data)
-
-            # Ajustar dinamicamente o range do eixo y
-            max_y = max(y_data)
-            y_limit = min(1, 1.5 * max_y)
-            ax.set_ylim(0, y_limit)
-
-            ax.set_xlim(0, len(proportions) * 1.3)  # Ajustar dinamicamente o eixo x
-        return line,
-
-    ani = FuncAnimation(fig, update_plot, init_func=init_plot)
+    ax.set_xlim(0, 100)  # Range inicial do eixo x
+    ax.set_ylim(0, 1)  # Proporção de células vivas entre 0 e 1
+    ax.set_title("Fraction of Alive Cells Over Time", color="white")  # Título branco
+    ax.set_xlabel("Steps", color="white")  # Eixo x em branco
+    ax.set_ylabel("Fraction Alive", color="white")  # Eixo y em branco
+    ax.tick_params(axis='x', colors='white')  # Cor dos ticks do eixo x
+    ax.tick_params(axis='y', colors='white')  # Cor dos ticks do eixo y
+
+    # Linha ciano para destaque no fundo preto; desenhada com blitting a partir de um histórico reduzido
+    plot = LivePlot(ax, color="cyan", headroom=1.5)
+
+    def update_plot():
+        telemetry.mark_ready()  # A janela do gráfico já está aberta: o game pode começar
+        if graph_event.is_set():  # Atualiza somente quando não está pausado
+            records, _ = telemetry.read()  # Todos os passos desde o último quadro, de uma vez
+            plot.extend(records[:, 0])
+        plot.update()
+
+    timer = fig.canvas.new_timer(interval=50)
+    timer.add_callback(update_plot)
+    timer.start()
     plt.show()
 
 
@@ -184,17 +187,17 @@ def run_GameOfLifeModel(
 
     # Graph setup. Se graph == False, o código funciona exatamente como antes da modificação
     if graph:
-        manager = Manager()
-        proportions = manager.list()  # Para armazenar as proporções de cada passo (compartilhado entre processos)
+        # Proporção de células vivas, idade média e máxima de cada passo (memória compartilhada entre processos)
+        telemetry = TelemetryRing(("alive_fraction", "mean_age", "max_age"))
         graph_event = Event()
         graph_event.set()  # Permitir atualizações inicialmente
 
         # Processo separado para o gráfico
-        graph_process = Process(target=plot_graph, args=(proportions, graph_event))    # Separa o processo do gráfico para rodar em um processador diferente do game. (para evitar os bugs com fechar o game subitamente etc mencionados antes)
+        graph_process = Process(target=plot_graph, args=(telemetry, graph_event))    # Separa o processo do gráfico para rodar em um processador diferente do game. (para evitar os bugs com fechar o game subitamente etc mencionados antes)
         graph_process.start()
 
-        # Delay para permitir que a janela do gráfico abra antes de iniciar o game
-        time.sleep(4)
+        # Espera a janela do gráfico abrir antes de iniciar o game
+        telemetry.wait_ready()
 
     # Cores
     empty_color = colors["empty"]
@@ -202,6 +205,10 @@ def run_GameOfLifeModel(
     # Cores pros botões
     button_color = (200, 200, 200)
     button_hover_color = (150, 150, 150)
+    renderer = DirtyGridRenderer([empty_color])
+    age_colors = AgeColorMap(empty_color=empty_color)
+    # Área dos controles, abaixo da grade (é a única parte da tela limpa a cada quadro)
+    controls_rect = pygame.Rect(0, height * cell_size, screen.get_width(), screen.get_height() - height * cell_size)
 
     clear_button_rect = pygame.Rect(10, height * cell_size + 10, 100, 30)
 
@@ -210,6 +217,40 @@ def run_GameOfLifeModel(
     slider_pos = 0  # Posição inicial do slider
     dragging_slider = False  # Variável para detectar o arraste do slider
 
+    # Controles e textos são desenhados uma vez e só redesenhados quando mudam
+    font = get_font(None, 24)
+    controls = Overlay(controls_rect, background=(0, 0, 0))
+    controls.add(Button(clear_button_rect, font, "Clear", button_color, button_hover_color, text_offset=(25, 5)))
+    controls.add(Slider(slider_rect, font, None, lambda: slider_pos, lambda pos: f"Speed: {200 - pos}"))
+    controls.add(Label(
+        (width * cell_size - 120, height * cell_size + 10), get_font(None, 30),
+        lambda: "PAUSED" if paused else "RUNNING",
+        lambda: (255, 0, 0) if paused else (0, 255, 0),
+    ))
+    info = Overlay((10, 10, 200, 20))  # Número de células vivas, sobre a grade
+    alive_label = info.add(Label((10, 10), font, ""))
+    redraw_all = True
+
+    def clear_cells(model):
+        model.cell_layer.data = np.zeros(model.cell_layer.data.shape, dtype=bool)
+
+    def toggle_cell(model, x, y):
+        model.cell_layer.data[x, y] = not model.cell_layer.data[x, y]
+
+    def record_proportion(model):
+        if graph:
+            alive_ages = model.age_layer.data[model.cell_layer.data]
+            mean_age, max_age = (alive_ages.mean(), alive_ages.max()) if alive_ages.size else (0.0, 0)
+            telemetry.push(model.alive_fraction, mean_age, max_age)
+
+    # A simulação roda em uma thread própria; a tela só desenha o último quadro publicado
+    worker = SimulationWorker(
+        model,
+        lambda model: {"cells": model.cell_layer.data, "ages": model.age_layer.data, "alive_count": model.alive_count},
+        on_step=record_proportion,
+    )
+    worker.start()
+
     while running:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -219,7 +260,7 @@ def run_GameOfLifeModel(
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 mouse_x, mouse_y = pygame.mouse.get_pos()
                 if clear_button_rect.collidepoint(mouse_x, mouse_y):
-                    model.cell_layer.data = np.zeros((width, height), dtype=bool)  
+                    worker.submit(clear_cells)
                 elif slider_rect.collidepoint(mouse_x, mouse_y):  # Interação com a barra deslizante
                     slider_pos = max(0, min(200, mouse_x - slider_rect.x))  # Limita o valor do slider
                     dragging_slider = True
@@ -228,7 +269,7 @@ def run_GameOfLifeModel(
                     grid_x = mouse_x // cell_size
                     grid_y = mouse_y // cell_size
                     if 0 <= grid_x < width and 0 <= grid_y < height:
-                        model.cell_layer.data[grid_x, grid_y] = not model.cell_layer.data[grid_x, grid_y]
+                        worker.submit(toggle_cell, grid_x, grid_y)
 
             elif event.type == pygame.MOUSEBUTTONUP:
                 dragging_slider = False
@@ -255,72 +296,38 @@ def run_GameOfLifeModel(
         if speed == 0:
             paused = True
             graph_event.clear()
-            
-        clock.tick(speed)
 
-        screen.fill((0, 0, 0)) 
-
-        # Renderizando as células com transição de cor suave
-        for x in range(width):
-            for y in range(height):
-                if model.cell_layer.data[x][y]:  
-                    age = model.age_layer.data[x][y]  
-
-                    red_intensity = min(255, max(0, age * 5))  
-                    green_intensity = max(0, 255 - age * 5) 
-                    blue_intensity = max(0, 255 - age * 5)  
+        worker.steps_per_second = speed  # A simulação roda na velocidade do slider, em passos por segundo
+        worker.paused = paused
+        clock.tick(60)  # A tela é atualizada a 60 quadros por segundo, independente da simulação
+
+        # Renderizando as células com transição de cor suave (só os blocos que mudaram desde o último quadro)
+        frame = worker.acquire()
+        cell_colors = age_colors.colors(frame.data["ages"], frame.data["cells"])
+        alive_count = frame.data["alive_count"]
+        worker.release()
+
+        # Exibindo o número de células vivas (o texto antigo é apagado redesenhando a grade embaixo dele)
+        alive_label.text = f"Vivas: {alive_count}"
+        for rect in info.update():
+            renderer.mark_dirty(rect)
+        dirty_rects = renderer.draw_rgb(screen, cell_colors, cell_size)
+        dirty_rects += info.draw(screen, dirty_rects)
+
+        # Botão, barra deslizante, velocidade e status de pausa
+        controls_dirty = controls.update()
+        if redraw_all:
+            controls_dirty = controls.draw(screen)
+            redraw_all = False
+        else:
+            controls_dirty = controls.draw(screen, controls_dirty)
 
-                    cell_color = (red_intensity, green_intensity, blue_intensity) 
+        pygame.display.update(dirty_rects + controls_dirty)
 
-                else:
-                    cell_color = empty_color
-
-                pygame.draw.rect(
-                    screen,
-                    cell_color,
-                    (x * cell_size, y * cell_size, cell_size, cell_size)
-                )
-
-        # Interação com o botão de limpar
-        mouse_x, mouse_y = pygame.mouse.get_pos()
-        if clear_button_rect.collidepoint(mouse_x, mouse_y):
-            pygame.draw.rect(screen, button_hover_color, clear_button_rect)
-        else:
-            pygame.draw.rect(screen, button_color, clear_button_rect)
-
-        font = pygame.font.SysFont(None, 24)
-        text = font.render("Clear", True, (0, 0, 0))
-        screen.blit(text, (clear_button_rect.x + 25, clear_button_rect.y + 5))
-
-        # Exibe a barra deslizante
-        pygame.draw.rect(screen, (255, 255, 255), slider_rect, 2)  # Caixa do slider
-        pygame.draw.circle(screen, (255, 0, 0), (slider_rect.x + slider_pos, slider_rect.centery), 10)  # Controle do slider
-
-        # Exibe a velocidade atual na tela
-        speed_text = f"Speed: {200 - slider_pos}"
-        speed_surface = pygame.font.SysFont(None, 24).render(speed_text, True, (255, 255, 255))
-        screen.blit(speed_surface, (slider_rect.x + 220, slider_rect.y))
-
-        # Mostrar o status de pausa
-        pause_text = "PAUSED" if paused else "RUNNING"
-        pause_color = (255, 0, 0) if paused else (0, 255, 0)
-        pause_font = pygame.font.SysFont(None, 30)
-        pause_surface = pause_font.render(pause_text, True, pause_color)
-        screen.blit(pause_surface, (width * cell_size - 120, height * cell_size + 10))
-
-        # Exibindo o número de células vivas e a fração
-        alive_count_text = font.render(f"Vivas: {model.alive_count}", True, (255, 255, 255))
-        screen.blit(alive_count_text, (10, 10))
-
-        pygame.display.flip()
-
-        if not paused:
-            model.step()
-            if graph:
-                proportions.append(model.alive_fraction)
-    
+    worker.stop()
     if graph:
         graph_process.terminate()  # Fechar o processo do gráfico ao encerrar
+        telemetry.close()
 
     pygame.quit()
 
@@ -0,0 +1,196 @@
+import math
+
+import numpy as np
+import pygame
+
+from renderizacao import palette_array
+
+
+def block_sum(data, factor):
+    """
+    Soma os valores em blocos de factor x factor (as bordas são completadas com zeros).
+    """
+    width, height = data.shape
+    bw, bh = -(-width // factor), -(-height // factor)
+    padded = np.zeros((bw * factor, bh * factor), dtype=np.uint32)
+    padded[:width, :height] = data
+    return padded.reshape(bw, factor, bh, factor).sum(axis=(1, 3), dtype=np.uint32)
+
+
+class DensityMipmap:
+    """
+    Pirâmide de contagens de células vivas para desenhar o tabuleiro afastado.
+
+    O nível k guarda, para cada bloco de 2^k x 2^k células, quantas estão
+    vivas. Cada nível é calculado a partir do anterior com uma soma em blocos
+    2x2, e a pirâmide só é refeita quando a versão do estado muda; desenhar
+    o tabuleiro afastado lê apenas o nível necessário, sem tocar cada célula.
+    """
+
+    def __init__(self):
+        self._levels = []  # _levels[k - 1] é o nível k
+        self._key = None
+
+    def level(self, cells, level, version):
+        """
+        Retorna as contagens do nível pedido para o estado identificado por version.
+        """
+        key = (version, cells.shape)
+        if key != self._key:
+            self._levels = []
+            self._key = key
+        while len(self._levels) < level:
+            previous = self._levels[-1] if self._levels else cells
+            self._levels.append(block_sum(previous, 2))
+        return self._levels[level - 1]
+
+
+class Camera:
+    """
+    Janela com deslocamento e zoom sobre um tabuleiro maior que a tela.
+
+    x e y são a célula no canto superior esquerdo da janela e zoom é o
+    tamanho de cada célula em pixels. Com zoom >= 1 (inteiro) as células
+    visíveis são desenhadas uma a uma pela função de cores; com zoom < 1
+    (1/2, 1/4, ...) o tabuleiro é desenhado a partir da pirâmide de
+    densidades, com um pixel por bloco e a cor proporcional à fração de
+    células vivas no bloco.
+    """
+
+    def __init__(self, board_size, viewport, zoom=1, max_zoom=50, colors=((0, 0, 0), (255, 255, 255))):
+        self.board_width, self.board_height = board_size
+        self.viewport = pygame.Rect(viewport)
+        self.max_zoom = max_zoom
+        self.x, self.y = 0.0, 0.0
+        self.zoom = zoom
+        self.mipmap = DensityMipmap()
+
+        # Cor de cada densidade (0 a 255) usada com o tabuleiro afastado
+        empty, filled = palette_array(colors)
+        t = np.linspace(0, 1, 256)[:, None]
+        self.density_lut = np.rint(empty + t * (filled.astype(float) - empty)).astype(np.uint8)
+
+    @property
+    def level(self):
+        """
+        Nível da pirâmide usado no zoom atual (0 = uma célula por pixel ou mais).
+        """
+        return 0 if self.zoom >= 1 else round(math.log2(1 / self.zoom))
+
+    @property
+    def min_zoom(self):
+        """
+        Menor zoom necessário para o tabuleiro inteiro caber na janela.
+        """
+        ratio = max(self.board_width / self.viewport.width, self.board_height / self.viewport.height)
+        return 1 if ratio <= 1 else 2.0 ** -math.ceil(math.log2(ratio))
+
+    def state(self):
+        """
+        Posição e zoom atuais (mudam sempre que a tela inteira precisa ser redesenhada).
+        """
+        return (self.x, self.y, self.zoom)
+
+    def pan(self, dx, dy):
+        """
+        Desloca a janela em pixels da tela (por exemplo, o movimento do mouse).
+        """
+        self.x -= dx / self.zoom
+        self.y -= dy / self.zoom
+        self._clamp()
+
+    def zoom_at(self, zoom, px, py):
+        """
+        Muda o zoom mantendo parada a célula sob o ponto (px, py) da tela.
+        """
+        zoom = min(self.max_zoom, max(self.min_zoom, zoom))
+        cell_x, cell_y = self._to_cells(px, py)
+        self.zoom = zoom
+        self.x = cell_x - (px - self.viewport.x) / zoom
+        self.y = cell_y - (py - self.viewport.y) / zoom
+        self._clamp()
+
+    def step_zoom(self, direction, px, py):
+        """
+        Aproxima (direction > 0) ou afasta (direction < 0) um nível a partir do ponto (px, py).
+        """
+        if self.zoom < 1 or (direction < 0 and self.zoom == 1):
+            zoom = self.zoom * 2 if direction > 0 else self.zoom / 2
+        else:
+            step = max(1, int(self.zoom) // 4)  # Passos de ~25% com células grandes
+            zoom = self.zoom + step if direction > 0 else max(1, self.zoom - step)
+        self.zoom_at(zoom, px, py)
+
+    def screen_to_cell(self, px, py):
+        """
+        Célula do tabuleiro sob o ponto (px, py) da tela, ou None se estiver fora dele.
+        """
+        if not self.viewport.collidepoint(px, py):
+            return None
+        cell_x, cell_y = self._to_cells(px, py)
+        x, y = math.floor(cell_x), math.floor(cell_y)
+        if 0 <= x < self.board_width and 0 <= y < self.board_height:
+            return x, y
+        return None
+
+    def window(self):
+        """
+        Intervalo de células visíveis (x0, y0, x1, y1), alinhado aos blocos do nível atual.
+        """
+        block = 1 << self.level
+        x0 = max(0, math.floor(self.x) // block * block)
+        y0 = max(0, math.floor(self.y) // block * block)
+        x1 = min(self.board_width, math.ceil(self.x + self.viewport.width / self.zoom) + block)
+        y1 = min(self.board_height, math.ceil(self.y + self.viewport.height / self.zoom) + block)
+        return x0, y0, x1, y1
+
+    def draw(self, screen, renderer, cells, colorize, version):
+        """
+        Desenha a parte visível do tabuleiro com o renderizador e retorna o que ele retornar.
+
+        colorize recebe as fatias (x, y) das células visíveis e devolve o array
+        RGB delas; só é usada com zoom >= 1. cells e version alimentam a
+        pirâmide de densidades usada com zoom < 1.
+        """
+        x0, y0, x1, y1 = self.window()
+        if x1 <= x0 or y1 <= y0:
+            return []
+
+        level = self.level
+        if level == 0:
+            rgb = colorize((slice(x0, x1), slice(y0, y1)))
+            scale = int(self.zoom)
+        else:
+            block = 1 << level
+            counts = self.mipmap.level(cells, level, version)
+            counts = counts[x0 // block:-(-x1 // block), y0 // block:-(-y1 // block)]
+            rgb = np.take(self.density_lut, counts * 255 // (block * block), axis=0)
+            scale = 1
+
+        offset_x, offset_y = self._offset()
+        origin = (
+            self.viewport.x + round(x0 * self.zoom) - offset_x,
+            self.viewport.y + round(y0 * self.zoom) - offset_y,
+        )
+        clip = screen.get_clip()
+        screen.set_clip(self.viewport)
+        drawn = renderer.draw_rgb(screen, rgb, scale, origin)
+        screen.set_clip(clip)
+        return drawn
+
+    def _offset(self):
+        # Deslocamento da janela em pixels inteiros: desenho e cliques usam o mesmo arredondamento
+        return round(self.x * self.zoom), round(self.y * self.zoom)
+
+    def _to_cells(self, px, py):
+        offset_x, offset_y = self._offset()
+        return (
+            (offset_x + px - self.viewport.x) / self.zoom,
+            (offset_y + py - self.viewport.y) / self.zoom,
+        )
+
+    def _clamp(self):
+        visible_width = self.viewport.width / self.zoom
+        visible_height = self.viewport.height / self.zoom
+        self.x = min(max(self.x, 0.0), max(0.0, self.board_width - visible_width))
+        self.y = min(max(self.y, 0.0), max(0.0, self.board_height - visible_height))
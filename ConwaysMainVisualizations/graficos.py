@@ -0,0 +1,174 @@
+import numpy as np
+
+
+class MinMaxHistory:
+    """
+    Histórico de uma série em várias resoluções, para desenhar execuções longas com custo constante.
+
+    O nível 0 guarda os valores brutos; cada bloco do nível k + 1 junta dois
+    blocos do nível k, guardando o mínimo e o máximo (e em que passo cada um
+    ocorreu). Para desenhar, curve() escolhe o nível mais fino que cabe em
+    points blocos e devolve no máximo dois pontos por bloco (mínimo e máximo),
+    então os picos nunca somem e o número de pontos desenhados não cresce com
+    a duração da execução. Um nível para de guardar blocos quando passa de
+    points (ele nunca mais seria escolhido), então a memória também é limitada.
+    """
+
+    def __init__(self, points=1000):
+        self.points = int(points)
+        self.clear()
+
+    def clear(self):
+        """
+        Apaga todo o histórico.
+        """
+        self._count = 0
+        self._max = -np.inf
+        self._levels = []  # Blocos completos de cada nível: (x_min, mínimo, x_max, máximo)
+        self._sizes = []  # Número de blocos completos de cada nível (inclusive os não guardados)
+        self._pending = []  # Bloco incompleto (metade de um par) de cada nível, ou None
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def max(self):
+        """
+        Maior valor já recebido (-inf se o histórico estiver vazio).
+        """
+        return self._max
+
+    def extend(self, values):
+        """
+        Acrescenta os valores dos próximos passos.
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(values) == 0:
+            return
+        self._max = max(self._max, float(values.max()))
+        for value in values.tolist():
+            self._count += 1
+            x = float(self._count)  # Os passos são numerados a partir de 1
+            self._add(0, (x, value, x, value))
+
+    def curve(self):
+        """
+        Retorna (x, y) da série reduzida a no máximo ~2 * points pontos, na ordem dos passos.
+        """
+        if self._count == 0:
+            return np.empty(0), np.empty(0)
+
+        # Nível mais fino cujos blocos cobrem o histórico inteiro sem passar de points
+        level = next(k for k, size in enumerate(self._sizes) if size <= self.points)
+        blocks = [self._levels[level][:self._sizes[level]]]
+        # O fim do histórico ainda não formou um bloco completo: usa os blocos pendentes dos níveis abaixo
+        tail = [self._pending[k] for k in range(min(level, len(self._pending)) - 1, -1, -1) if self._pending[k] is not None]
+        if tail:
+            blocks.append(np.array(tail))
+        blocks = np.concatenate(blocks)
+
+        if level == 0 and not tail:
+            return blocks[:, 0], blocks[:, 1]
+
+        # Dois pontos por bloco, mínimo e máximo, na ordem em que aconteceram
+        first_is_min = blocks[:, 0] <= blocks[:, 2]
+        x = np.empty(2 * len(blocks))
+        y = np.empty(2 * len(blocks))
+        x[0::2] = np.where(first_is_min, blocks[:, 0], blocks[:, 2])
+        y[0::2] = np.where(first_is_min, blocks[:, 1], blocks[:, 3])
+        x[1::2] = np.where(first_is_min, blocks[:, 2], blocks[:, 0])
+        y[1::2] = np.where(first_is_min, blocks[:, 3], blocks[:, 1])
+        return x, y
+
+    def _add(self, level, block):
+        # Guarda o bloco completo no nível e junta pares de blocos no nível de cima
+        if level == len(self._sizes):
+            self._levels.append(np.empty((self.points, 4)))
+            self._sizes.append(0)
+            self._pending.append(None)
+        size = self._sizes[level]
+        if size < self.points:
+            self._levels[level][size] = block
+        self._sizes[level] = size + 1
+
+        pending = self._pending[level]
+        if pending is None:
+            self._pending[level] = block
+            return
+        self._pending[level] = None
+        x_min, low = (pending[0], pending[1]) if pending[1] <= block[1] else (block[0], block[1])
+        x_max, high = (pending[2], pending[3]) if pending[3] >= block[3] else (block[2], block[3])
+        self._add(level + 1, (x_min, low, x_max, high))
+
+
+class LivePlot:
+    """
+    Linha de um gráfico matplotlib atualizada ao vivo com blitting.
+
+    O fundo do gráfico (eixos, títulos, ticks) é guardado uma vez a cada
+    redesenho completo; cada atualização só restaura esse fundo, desenha a
+    linha e copia a área para a tela. O redesenho completo só acontece quando
+    os limites dos eixos mudam. Os dados passam por um MinMaxHistory com um
+    bloco por pixel de largura dos eixos, então o custo de cada atualização
+    não depende do número de passos já recebidos.
+
+    Os limites seguem o comportamento antigo dos gráficos: o eixo x vai até
+    1.3 vezes o número de passos e o eixo y até headroom vezes o maior valor,
+    limitado a y_cap.
+    """
+
+    def __init__(self, ax, color, headroom=1.3, y_cap=1.0, lw=2, points=None):
+        self.ax = ax
+        self.canvas = ax.figure.canvas
+        self.headroom = headroom
+        self.y_cap = y_cap
+        self.line, = ax.plot([], [], lw=lw, color=color, animated=True)
+        self.history = MinMaxHistory(points or max(100, int(ax.bbox.width)))
+        self._initial_limits = (ax.get_xlim(), ax.get_ylim())
+        self._background = None
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+
+    def extend(self, values):
+        """
+        Acrescenta os valores dos próximos passos.
+        """
+        self.history.extend(values)
+
+    def clear(self):
+        """
+        Apaga os dados e volta aos limites iniciais dos eixos.
+        """
+        self.history.clear()
+        self.ax.set_xlim(*self._initial_limits[0])
+        self.ax.set_ylim(*self._initial_limits[1])
+        self._background = None
+
+    def update(self):
+        """
+        Desenha o estado atual: com blitting, ou completo se os limites dos eixos mudaram.
+        """
+        self.line.set_data(*self.history.curve())
+        if self._update_limits() or self._background is None:
+            self.canvas.draw()  # Redesenho completo; _on_draw guarda o fundo novo
+            return
+        self.canvas.restore_region(self._background)
+        self.ax.draw_artist(self.line)
+        self.canvas.blit(self.ax.figure.bbox)
+
+    def _update_limits(self):
+        count = len(self.history)
+        if count == 0:
+            return False
+        changed = False
+        if count > self.ax.get_xlim()[1]:
+            self.ax.set_xlim(0, count * 1.3)
+            changed = True
+        y_limit = min(self.y_cap, self.headroom * self.history.max)
+        if y_limit > 0 and y_limit != self.ax.get_ylim()[1]:
+            self.ax.set_ylim(0, y_limit)
+            changed = True
+        return changed
+
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.ax.figure.bbox)
+        self.ax.draw_artist(self.line)
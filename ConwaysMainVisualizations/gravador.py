@@ -0,0 +1,385 @@
+import os
+import queue
+import struct
+import threading
+import zlib
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from renderizacao import palette_array
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class Recorder:
+    """
+    Grava uma execução em arquivo sem precisar de tela.
+
+    Cada estado enviado com submit() é um array de índices da paleta
+    indexado por [x, y] (o mesmo formato de PropertyLayer.data). O estado é
+    copiado e posto em uma fila limitada; uma thread em segundo plano
+    converte e escreve cada quadro direto no arquivo, então o filme inteiro
+    nunca fica na memória. O formato vem do caminho:
+
+    - "arquivo.png" ou "arquivo.apng": PNG animado;
+    - "arquivo.gif": GIF animado;
+    - um diretório ou um caminho com "{}" (por exemplo "quadros/{:05d}.png"):
+      um PNG por quadro, numerado pelo passo.
+
+    Se a fila estiver cheia (o disco não acompanha a simulação), o quadro é
+    descartado e contado em skipped, em vez de travar quem chamou; com
+    drop_frames=False, submit() espera a fila. Nos formatos animados, um
+    quadro descartado ou igual ao anterior só aumenta a duração do anterior,
+    então o tempo da animação continua certo.
+    """
+
+    def __init__(self, path, palette, cell_size=1, fps=20, queue_size=32, drop_frames=True, compression=6):
+        self.palette = palette_array(palette)
+        if len(self.palette) > 256:
+            raise ValueError("A paleta de gravação aceita no máximo 256 cores")
+        self.drop_frames = drop_frames
+        self.frames = 0  # Quadros aceitos na fila
+        self.skipped = 0  # Quadros descartados com a fila cheia
+        self._writer = _open_writer(path, self.palette, cell_size, fps, compression)
+        self._queue = queue.Queue(queue_size)
+        self._step = 0
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, cells, step=None):
+        """
+        Envia o estado de um passo para a gravação. Retorna False se o quadro foi descartado.
+
+        step é o número do passo; por padrão, o passo seguinte ao último enviado.
+        """
+        if self._error is not None:
+            raise RuntimeError("A gravação falhou") from self._error
+        if step is None:
+            step = self._step
+        self._step = step + 1
+        if self.drop_frames and self._queue.full():
+            self.skipped += 1  # Descarta antes de copiar o estado
+            return False
+        frame = np.array(cells, dtype=np.uint8)  # Cópia: a simulação continua alterando o original
+        try:
+            self._queue.put((frame, step), block=not self.drop_frames)
+        except queue.Full:
+            self.skipped += 1
+            return False
+        self.frames += 1
+        return True
+
+    def close(self):
+        """
+        Espera os quadros da fila serem escritos e fecha o arquivo.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self._error is not None:
+            raise RuntimeError("A gravação falhou") from self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _run(self):
+        # Thread de escrita: consome a fila até receber None
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                self._writer.add(*item)
+            self._writer.close()
+        except Exception as error:
+            self._error = error
+            while self._queue.get() is not None:  # Continua esvaziando a fila para ninguém travar no put
+                pass
+
+
+def record(model, steps, path, palette, cells=lambda model: model.cell_layer.data, **options):
+    """
+    Roda o modelo por steps passos sem tela, gravando o estado inicial e o de cada passo.
+
+    cells retorna o array de índices da paleta de um modelo. Por padrão
+    nenhum quadro é descartado (drop_frames=False). Retorna o Recorder já
+    fechado, com as contagens de quadros.
+    """
+    options.setdefault("drop_frames", False)
+    with Recorder(path, palette, **options) as recorder:
+        recorder.submit(cells(model))
+        for _ in range(steps):
+            model.step()
+            recorder.submit(cells(model))
+    return recorder
+
+
+def _open_writer(path, palette, cell_size, fps, compression):
+    path = os.fspath(path)
+    if "{" in path or os.path.isdir(path):
+        return _PngSequenceWriter(path, palette, cell_size, compression)
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".png", ".apng"):
+        return _ApngWriter(path, palette, cell_size, fps, compression)
+    if extension == ".gif":
+        return _GifWriter(path, palette, cell_size, fps)
+    raise ValueError(f"Formato de gravação desconhecido: {path!r} (use .png, .apng, .gif ou um diretório)")
+
+
+class _AnimationWriter(ABC):
+    """
+    Base dos formatos animados: escreve só a região de cada quadro que mudou.
+
+    Os quadros chegam com o número do passo. Um quadro só é escrito quando o
+    próximo diferente chega, porque só então a duração dele é conhecida
+    (passos descartados ou sem mudança aumentam a duração). Cada quadro é
+    recortado ao menor retângulo que contém as mudanças; com o quadro
+    anterior mantido na imagem, isso é suficiente para reconstruí-lo.
+    """
+
+    def __init__(self, path, palette, cell_size, fps):
+        self.file = open(path, "wb")
+        self.palette = palette
+        self.cell_size = cell_size
+        self.fps = fps
+        self._previous = None  # Último quadro escrito (linhas = y)
+        self._pending = None  # (x, y, pixels, passo) do quadro ainda sem duração
+        self._last_step = 0
+
+    def add(self, cells, step):
+        image = np.ascontiguousarray(cells.T)
+        self._last_step = step
+        if self._previous is None:
+            height, width = image.shape
+            self._start(width * self.cell_size, height * self.cell_size)
+            region = (0, 0, image)
+        else:
+            changed = image != self._previous
+            if not changed.any():
+                return
+            rows = np.flatnonzero(changed.any(axis=1))
+            cols = np.flatnonzero(changed.any(axis=0))
+            region = (cols[0], rows[0], image[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1])
+        self._flush(step)
+        self._pending = (*region, step)
+        self._previous = image
+
+    def close(self):
+        if self._previous is not None:
+            self._flush(self._last_step + 1)
+            self._finish()
+        self.file.close()
+
+    def _flush(self, next_step):
+        if self._pending is None:
+            return
+        x, y, pixels, step = self._pending
+        self._pending = None
+        duration = (next_step - step) * 1000 / self.fps  # Em milissegundos
+        scale = self.cell_size
+        if scale > 1:
+            pixels = np.repeat(np.repeat(pixels, scale, axis=0), scale, axis=1)
+        self._write_frame(int(x) * scale, int(y) * scale, pixels, duration)
+
+    @abstractmethod
+    def _start(self, width, height):
+        """
+        Escreve o cabeçalho de uma animação de width x height pixels.
+        """
+
+    @abstractmethod
+    def _write_frame(self, x, y, pixels, duration):
+        """
+        Escreve pixels (índices da paleta, linhas = y) na posição (x, y), mostrados por duration milissegundos.
+        """
+
+    @abstractmethod
+    def _finish(self):
+        """
+        Completa o arquivo depois do último quadro.
+        """
+
+
+class _ApngWriter(_AnimationWriter):
+    """
+    PNG animado (APNG) com cores indexadas pela paleta.
+
+    O número de quadros só é conhecido no fim, então o chunk acTL é escrito
+    com zero e corrigido no lugar ao fechar o arquivo.
+    """
+
+    def __init__(self, path, palette, cell_size, fps, compression):
+        super().__init__(path, palette, cell_size, fps)
+        self.compression = compression
+        self.depth = _bit_depth(len(palette))
+        self._sequence = 0
+        self._frames = 0
+        self._actl_offset = None
+
+    def _start(self, width, height):
+        self.file.write(_PNG_SIGNATURE)
+        self.file.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, self.depth, 3, 0, 0, 0)))
+        self._actl_offset = self.file.tell()
+        self.file.write(_png_chunk(b"acTL", struct.pack(">II", 0, 0)))
+        self.file.write(_png_chunk(b"PLTE", self.palette.tobytes()))
+
+    def _write_frame(self, x, y, pixels, duration):
+        height, width = pixels.shape
+        delay, denominator = _apng_delay(duration)
+        self.file.write(_png_chunk(b"fcTL", struct.pack(
+            ">IIIIIHHBB", self._sequence, width, height, x, y, delay, denominator, 0, 0
+        )))
+        self._sequence += 1
+        data = zlib.compress(_png_scanlines(pixels, self.depth), self.compression)
+        if self._frames == 0:
+            self.file.write(_png_chunk(b"IDAT", data))  # O primeiro quadro também é a imagem estática
+        else:
+            self.file.write(_png_chunk(b"fdAT", struct.pack(">I", self._sequence) + data))
+            self._sequence += 1
+        self._frames += 1
+
+    def _finish(self):
+        self.file.write(_png_chunk(b"IEND", b""))
+        self.file.seek(self._actl_offset)
+        self.file.write(_png_chunk(b"acTL", struct.pack(">II", self._frames, 0)))
+        self.file.seek(0, os.SEEK_END)
+
+
+class _GifWriter(_AnimationWriter):
+    """
+    GIF animado com a paleta como tabela de cores global.
+
+    Os pixels são codificados em LZW só com códigos literais: um código de
+    limpeza a cada 2^m - 2 pixels impede que a tabela cresça e mude a
+    largura dos códigos, o que permite codificar o quadro inteiro com
+    operações do numpy. O arquivo fica maior que um GIF comprimido de
+    verdade (cerca de m + 1 bits por pixel), mas a codificação não é o
+    gargalo da gravação; para arquivos pequenos, prefira o APNG.
+    """
+
+    def __init__(self, path, palette, cell_size, fps):
+        super().__init__(path, palette, cell_size, fps)
+        self.bits = max(1, int(len(palette) - 1).bit_length())
+        self.min_code_size = max(2, self.bits)
+
+    def _start(self, width, height):
+        table = np.zeros((1 << self.bits, 3), dtype=np.uint8)
+        table[:len(self.palette)] = self.palette
+        self.file.write(b"GIF89a" + struct.pack("<HHBBB", width, height, 0xF0 | (self.bits - 1), 0, 0))
+        self.file.write(table.tobytes())
+        self.file.write(b"!\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")  # Repetir para sempre
+
+    def _write_frame(self, x, y, pixels, duration):
+        height, width = pixels.shape
+        delay = min(0xFFFF, max(1, round(duration / 10)))  # Em centésimos de segundo
+        self.file.write(b"!\xf9\x04" + struct.pack("<BHBB", 1 << 2, delay, 0, 0))  # Mantém o quadro anterior
+        self.file.write(b"," + struct.pack("<HHHHB", x, y, width, height, 0))
+        self.file.write(bytes([self.min_code_size]))
+        self.file.write(_gif_sub_blocks(_gif_literal_lzw(pixels.ravel(), self.min_code_size)))
+
+    def _finish(self):
+        self.file.write(b";")
+
+
+class _PngSequenceWriter:
+    """
+    Um arquivo PNG por quadro, com o número do passo no nome.
+    """
+
+    def __init__(self, path, palette, cell_size, compression):
+        if "{" not in path:
+            path = os.path.join(path, "frame_{:05d}.png")
+        self.pattern = path
+        self.palette = palette
+        self.cell_size = cell_size
+        self.compression = compression
+        self.depth = _bit_depth(len(palette))
+
+    def add(self, cells, step):
+        pixels = np.ascontiguousarray(cells.T)
+        if self.cell_size > 1:
+            pixels = np.repeat(np.repeat(pixels, self.cell_size, axis=0), self.cell_size, axis=1)
+        height, width = pixels.shape
+        with open(self.pattern.format(step), "wb") as file:
+            file.write(_PNG_SIGNATURE)
+            file.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, self.depth, 3, 0, 0, 0)))
+            file.write(_png_chunk(b"PLTE", self.palette.tobytes()))
+            file.write(_png_chunk(b"IDAT", zlib.compress(_png_scanlines(pixels, self.depth), self.compression)))
+            file.write(_png_chunk(b"IEND", b""))
+
+    def close(self):
+        pass
+
+
+def _bit_depth(colors):
+    """
+    Menor profundidade de PNG indexado (1, 2, 4 ou 8 bits) que comporta a paleta.
+    """
+    bits = max(1, int(colors - 1).bit_length())
+    return next(depth for depth in (1, 2, 4, 8) if depth >= bits)
+
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def _png_scanlines(pixels, depth):
+    """
+    Linhas do PNG (filtro 0 + pixels empacotados com depth bits) prontas para o zlib.
+    """
+    height, width = pixels.shape
+    if depth < 8:
+        per_byte = 8 // depth
+        padded = np.zeros((height, -(-width // per_byte) * per_byte), dtype=np.uint8)
+        padded[:, :width] = pixels
+        shifts = (8 - depth * np.arange(1, per_byte + 1)).astype(np.uint8)
+        packed = np.bitwise_or.reduce(padded.reshape(height, -1, per_byte) << shifts, axis=2)
+    else:
+        packed = pixels
+    rows = np.zeros((height, packed.shape[1] + 1), dtype=np.uint8)
+    rows[:, 1:] = packed
+    return rows.tobytes()
+
+
+def _apng_delay(duration):
+    # O atraso do APNG é uma fração de 16 bits por 16 bits
+    milliseconds = round(duration)
+    if milliseconds <= 0xFFFF:
+        return milliseconds, 1000
+    return min(0xFFFF, round(duration / 1000)), 1
+
+
+def _gif_literal_lzw(indices, min_code_size):
+    """
+    Codifica os índices em LZW do GIF usando só códigos literais de m + 1 bits.
+    """
+    clear = 1 << min_code_size
+    run = clear - 2  # Literais possíveis antes de a largura dos códigos aumentar
+    count = len(indices)
+    groups = -(-count // run)
+    codes = np.full((groups, run + 1), -1, dtype=np.int32)
+    codes[:, 0] = clear
+    codes[:, 1:].flat[:count] = indices
+    codes = codes.ravel()
+    codes = np.append(codes[codes >= 0], clear + 1)  # Código de fim da imagem
+
+    width = min_code_size + 1
+    bits = (codes[:, None] >> np.arange(width)) & 1
+    return np.packbits(bits.astype(np.uint8).ravel(), bitorder="little").tobytes()
+
+
+def _gif_sub_blocks(data):
+    """
+    Divide os dados em sub-blocos de até 255 bytes, terminando com um bloco vazio.
+    """
+    full, rest = divmod(len(data), 255)
+    blocks = np.empty((full, 256), dtype=np.uint8)
+    blocks[:, 0] = 255
+    blocks[:, 1:] = np.frombuffer(data[:full * 255], dtype=np.uint8).reshape(full, 255)
+    tail = bytes([rest]) + data[full * 255:] if rest else b""
+    return blocks.tobytes() + tail + b"\x00"
@@ -0,0 +1,214 @@
+import functools
+from abc import ABC, abstractmethod
+
+import pygame
+
+
+@functools.lru_cache(maxsize=None)
+def get_font(name, size):
+    """
+    Retorna a fonte do sistema pedida, criada uma única vez.
+    pygame.font.SysFont procura a fonte no sistema a cada chamada, o que é caro para fazer a cada quadro.
+    """
+    return pygame.font.SysFont(name, size)
+
+
+def _resolve(value):
+    return value() if callable(value) else value
+
+
+class Widget(ABC):
+    """
+    Elemento da interface desenhado em uma Surface guardada em cache.
+
+    Cada widget descreve o que aparece na tela por um estado (state()); a
+    Surface só é desenhada de novo (render()) quando esse estado muda.
+    O rect é a área ocupada na tela.
+    """
+
+    def __init__(self, rect):
+        self.rect = pygame.Rect(rect)
+        self.surface = None
+        self._state = None  # Estado usado para desenhar a Surface atual
+
+    @abstractmethod
+    def state(self):
+        """
+        Retorna o que determina a aparência do widget; deve ser comparável com ==.
+        """
+
+    @abstractmethod
+    def render(self, state):
+        """
+        Desenha o widget para o estado dado e retorna uma Surface do tamanho de self.rect.
+        """
+
+    def refresh(self):
+        """
+        Redesenha a Surface se o estado mudou; retorna a área da tela afetada ou None.
+        """
+        state = self.state()
+        if self.surface is not None and state == self._state:
+            return None
+        old_rect = self.rect.copy()
+        self.surface = self.render(state)
+        self._state = state
+        return old_rect.union(self.rect) if old_rect.size != (0, 0) else self.rect.copy()
+
+
+class Label(Widget):
+    """
+    Texto em uma posição fixa. text e color podem ser valores ou funções sem argumentos.
+    """
+
+    def __init__(self, position, font, text, color=(255, 255, 255)):
+        super().__init__((position, (0, 0)))
+        self.font = font
+        self.text = text
+        self.color = color
+
+    def state(self):
+        return str(_resolve(self.text)), tuple(_resolve(self.color))
+
+    def render(self, state):
+        text, color = state
+        surface = self.font.render(text, True, color)
+        self.rect.size = surface.get_size()
+        return surface
+
+
+class Button(Widget):
+    """
+    Botão retangular com texto; muda de cor com o mouse em cima.
+    """
+
+    def __init__(self, rect, font, text, color, hover_color, text_offset=(15, 5)):
+        super().__init__(rect)
+        self.font = font
+        self.text = text
+        self.color = color
+        self.hover_color = hover_color
+        self.text_offset = text_offset
+
+    def state(self):
+        return self.rect.collidepoint(pygame.mouse.get_pos())
+
+    def render(self, hovered):
+        surface = pygame.Surface(self.rect.size)
+        surface.fill(self.hover_color if hovered else self.color)
+        surface.blit(self.font.render(self.text, True, (0, 0, 0)), self.text_offset)
+        return surface
+
+
+class Slider(Widget):
+    """
+    Slider horizontal: caixa, controle, rótulo acima (opcional) e valor à direita.
+
+    bar é o retângulo da caixa na tela e position é uma função que retorna a
+    posição atual do controle (0 a bar.width). value_text recebe a posição e
+    retorna o texto mostrado ao lado da caixa (ou None para não mostrar nada).
+    """
+
+    RADIUS = 10  # Raio do controle
+
+    def __init__(self, bar, font, label, position, value_text=None, label_offset=(0, -20), value_offset=10):
+        self.bar = pygame.Rect(bar)
+        self.font = font
+        self.label = label
+        self.position = position
+        self.value_text = value_text
+        self.label_offset = label_offset
+        self.value_offset = value_offset
+
+        # Área que cobre a caixa, o controle nas pontas e o rótulo (o texto do valor é somado ao desenhar)
+        rect = self.bar.inflate(2 * self.RADIUS, 0).union(
+            pygame.Rect(self.bar.x - self.RADIUS, self.bar.centery - self.RADIUS, 2 * self.RADIUS, 2 * self.RADIUS)
+        )
+        if label is not None:
+            rect.union_ip(pygame.Rect((self.bar.x + label_offset[0], self.bar.y + label_offset[1]), font.size(label)))
+        super().__init__(rect)
+        self._base = self.rect.copy()
+
+    def state(self):
+        position = _resolve(self.position)
+        value = self.value_text(position) if self.value_text is not None else None
+        return position, value
+
+    def render(self, state):
+        position, value = state
+        value_surface = self.font.render(value, True, (255, 255, 255)) if value is not None else None
+        self.rect = self._base.copy()
+        if value_surface is not None:
+            value_pos = (self.bar.right + self.value_offset, self.bar.y)
+            self.rect.union_ip(pygame.Rect(value_pos, value_surface.get_size()))
+
+        surface = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        ox, oy = self.rect.topleft
+        pygame.draw.rect(surface, (255, 255, 255), self.bar.move(-ox, -oy), 2)
+        pygame.draw.circle(surface, (255, 0, 0), (self.bar.x + position - ox, self.bar.centery - oy), self.RADIUS)
+        if self.label is not None:
+            label = self.font.render(self.label, True, (255, 255, 255))
+            surface.blit(label, (self.bar.x + self.label_offset[0] - ox, self.bar.y + self.label_offset[1] - oy))
+        if value_surface is not None:
+            surface.blit(value_surface, (self.bar.right + self.value_offset - ox, self.bar.y - oy))
+        return surface
+
+
+class Overlay:
+    """
+    Camada de interface em modo retido.
+
+    Os widgets são desenhados em uma Surface da camada, e só os que mudaram
+    de estado são redesenhados nela (update()). A camada inteira vai para a
+    tela com um único blit (draw()). Sem background a camada é transparente
+    e pode ficar sobre a grade.
+    """
+
+    def __init__(self, rect, background=None):
+        self.rect = pygame.Rect(rect)
+        self.background = background
+        self.surface = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        self.surface.fill(self._fill_color())
+        self.widgets = []
+
+    def add(self, widget):
+        """
+        Adiciona um widget à camada e o retorna.
+        """
+        self.widgets.append(widget)
+        return widget
+
+    def update(self):
+        """
+        Redesenha na camada os widgets cujo estado mudou e retorna as áreas da tela alteradas.
+        """
+        dirty = [rect for rect in (widget.refresh() for widget in self.widgets) if rect is not None]
+        for area in dirty:
+            local = area.move(-self.rect.x, -self.rect.y)
+            self.surface.set_clip(local)
+            self.surface.fill(self._fill_color())
+            # Widgets vizinhos podem se sobrepor à área, então todos que a tocam são copiados de novo
+            for widget in self.widgets:
+                if widget.rect.colliderect(area):
+                    self.surface.blit(widget.surface, widget.rect.move(-self.rect.x, -self.rect.y))
+            self.surface.set_clip(None)
+        return [area.clip(self.rect) for area in dirty]
+
+    def draw(self, screen, areas=None):
+        """
+        Desenha a camada na tela e retorna a lista de retângulos desenhados.
+
+        Com areas, só as partes da camada dentro dessas áreas são copiadas (por
+        exemplo, onde a grade embaixo de uma camada transparente foi redesenhada).
+        """
+        if areas is None:
+            return [screen.blit(self.surface, self.rect)]
+        drawn = []
+        for area in areas:
+            area = self.rect.clip(area)
+            if area.width and area.height:
+                drawn.append(screen.blit(self.surface, area, area.move(-self.rect.x, -self.rect.y)))
+        return drawn
+
+    def _fill_color(self):
+        return (0, 0, 0, 0) if self.background is None else self.background
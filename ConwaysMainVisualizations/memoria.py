@@ -0,0 +1,11 @@
+import sys
+from multiprocessing import shared_memory
+
+
+def attach_shared_memory(name):
+    """
+    Abre uma memória compartilhada já existente (quem a criou é responsável por apagá-la).
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)  # Processos filhos usam o mesmo resource_tracker do pai
@@ -0,0 +1,236 @@
+import numpy as np
+import pygame
+
+
+def palette_array(colors):
+    """
+    Converte uma sequência de cores RGB em um array (n, 3) do tipo uint8.
+    O índice de cada cor é o valor do estado que ela representa.
+    """
+    return np.asarray(colors, dtype=np.uint8).reshape(-1, 3)
+
+
+class GridRenderer:
+    """
+    Desenha uma grade inteira de estados com um único blit.
+
+    Os estados são um array 2D indexado por [x, y] (o mesmo formato de
+    PropertyLayer.data). Cada estado é convertido em cor pela paleta, gerando
+    um array RGB com um pixel por célula; esse array é copiado para uma
+    Surface pequena com pygame.surfarray.blit_array e escalado uma única vez
+    para o tamanho final com pygame.transform.scale. Assim o custo por quadro
+    não depende de uma chamada pygame.draw.rect por célula.
+    """
+
+    def __init__(self, palette):
+        self.palette = palette_array(palette)
+        self._small = None  # Surface com 1 pixel por célula
+        self._scaled = None  # Surface no tamanho final, reaproveitada entre quadros
+
+    def set_palette(self, palette):
+        """
+        Troca a paleta usada para converter estados em cores.
+        """
+        self.palette = palette_array(palette)
+
+    def colors(self, states):
+        """
+        Converte o array de estados em um array RGB (largura, altura, 3).
+        """
+        indices = np.asarray(states).astype(np.intp, copy=False)
+        return np.take(self.palette, indices, axis=0)
+
+    def draw(self, screen, states, cell_size, origin=(0, 0)):
+        """
+        Desenha a grade de estados na tela e retorna o retângulo ocupado.
+        """
+        return self.draw_rgb(screen, self.colors(states), cell_size, origin)
+
+    def draw_rgb(self, screen, rgb, cell_size, origin=(0, 0)):
+        """
+        Desenha um array RGB (largura, altura, 3) já pronto, com um pixel por célula.
+        """
+        width, height = self._upload(rgb)
+
+        size = (width * cell_size, height * cell_size)
+        if self._scaled is None or self._scaled.get_size() != size:
+            self._scaled = pygame.Surface(size)
+        pygame.transform.scale(self._small, size, self._scaled)
+
+        return screen.blit(self._scaled, origin)
+
+    def _upload(self, rgb):
+        """
+        Copia o array RGB para a Surface pequena (1 pixel por célula).
+        """
+        width, height = rgb.shape[:2]
+        if self._small is None or self._small.get_size() != (width, height):
+            self._small = pygame.Surface((width, height))
+        pygame.surfarray.blit_array(self._small, rgb)
+        return width, height
+
+
+class DirtyGridRenderer(GridRenderer):
+    """
+    Renderizador que redesenha apenas os blocos da grade que mudaram.
+
+    A grade é dividida em blocos de tile x tile células. A cada quadro as
+    cores novas são comparadas com as do último quadro desenhado e só os
+    blocos com alguma diferença são escalados e copiados para a tela. Os
+    métodos de desenho retornam a lista de retângulos alterados, pronta para
+    pygame.display.update(rects). Se a fração de blocos alterados passar de
+    threshold (ou se o tamanho, a posição ou o cell_size mudarem), a grade
+    inteira é redesenhada de uma vez.
+    """
+
+    def __init__(self, palette, tile=8, threshold=0.5):
+        super().__init__(palette)
+        self.tile = tile
+        self.threshold = threshold
+        self._last = None  # Cores do último quadro desenhado
+        self._layout = None
+        self._forced = []  # Retângulos da tela que precisam ser redesenhados mesmo sem mudança
+
+    def invalidate(self):
+        """
+        Força o redesenho completo no próximo quadro.
+        """
+        self._last = None
+
+    def mark_dirty(self, rect):
+        """
+        Marca uma região da tela (por exemplo, um texto desenhado sobre a grade)
+        para ser redesenhada no próximo quadro.
+        """
+        self._forced.append(pygame.Rect(rect))
+
+    def draw(self, screen, states, cell_size, origin=(0, 0)):
+        """
+        Desenha a grade de estados e retorna a lista de retângulos alterados.
+        """
+        return self.draw_rgb(screen, self.colors(states), cell_size, origin)
+
+    def draw_rgb(self, screen, rgb, cell_size, origin=(0, 0)):
+        """
+        Desenha um array RGB (largura, altura, 3) e retorna a lista de retângulos alterados.
+        """
+        layout = (rgb.shape, cell_size, tuple(origin))
+        tiles = None
+        if self._last is not None and self._layout == layout:
+            tiles = self._dirty_tiles(rgb, cell_size, origin)
+
+        if tiles is None or tiles.mean() > self.threshold:
+            rects = [super().draw_rgb(screen, rgb, cell_size, origin)]
+        else:
+            self._upload(rgb)
+            rects = self._draw_tiles(screen, tiles, rgb.shape, cell_size, origin)
+
+        if self._last is None or self._last.shape != rgb.shape:
+            self._last = np.empty_like(rgb)
+        np.copyto(self._last, rgb)
+        self._layout = layout
+        self._forced = []
+        return rects
+
+    def _dirty_tiles(self, rgb, cell_size, origin):
+        """
+        Retorna a máscara (blocos_x, blocos_y) dos blocos que precisam ser redesenhados.
+        """
+        width, height = rgb.shape[:2]
+        t = self.tile
+        nx, ny = -(-width // t), -(-height // t)
+
+        changed = np.zeros((nx * t, ny * t), dtype=bool)
+        np.any(rgb != self._last, axis=2, out=changed[:width, :height])
+        tiles = changed.reshape(nx, t, ny, t).any(axis=(1, 3))
+
+        tile_px = t * cell_size
+        for rect in self._forced:
+            rect = rect.move(-origin[0], -origin[1])
+            x0, x1 = max(rect.left // tile_px, 0), min((rect.right - 1) // tile_px + 1, nx)
+            y0, y1 = max(rect.top // tile_px, 0), min((rect.bottom - 1) // tile_px + 1, ny)
+            tiles[x0:x1, y0:y1] = True
+        return tiles
+
+    def _draw_tiles(self, screen, tiles, shape, cell_size, origin):
+        """
+        Escala e desenha os blocos marcados, juntando blocos vizinhos da mesma linha em um só retângulo.
+        """
+        width, height = shape[:2]
+        t = self.tile
+        rects = []
+        for ty in range(tiles.shape[1]):
+            # Início e fim de cada sequência de blocos alterados nesta linha
+            edges = np.diff(np.concatenate(([0], tiles[:, ty].view(np.int8), [0])))
+            starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+            y, h = ty * t, min(t, height - ty * t)
+            for start, end in zip(starts, ends):
+                x, w = start * t, min(end * t, width) - start * t
+                block = self._small.subsurface((x, y, w, h))
+                size = (w * cell_size, h * cell_size)
+                dest = (origin[0] + x * cell_size, origin[1] + y * cell_size)
+                rects.append(screen.blit(pygame.transform.scale(block, size), dest))
+        return rects
+
+
+class AgeColorMap:
+    """
+    Converte a idade das células vivas em cores usando uma tabela pré-calculada.
+
+    A tabela (LUT) tem uma linha por idade, de 0 até max_age, interpolando
+    linearmente as cores do gradiente; idades maiores são cortadas em
+    max_age. A linha 0 é reservada para as células mortas (empty_color), de
+    modo que a imagem inteira sai de um único np.take. A tabela só é refeita
+    quando a paleta muda.
+
+    O gradiente padrão reproduz a cor antiga das visualizações: vermelho
+    cresce 5 por passo de idade e verde/azul caem 5, saturando na idade 51.
+    """
+
+    def __init__(self, gradient=((0, 255, 255), (255, 0, 0)), max_age=51, empty_color=(0, 0, 0)):
+        self.gradient = palette_array(gradient)
+        self.max_age = int(max_age)
+        self.empty_color = tuple(empty_color)
+        self._lut = None
+        self._index = None  # Buffers reaproveitados entre quadros
+        self._rgb = None
+
+    def set_palette(self, gradient=None, max_age=None, empty_color=None):
+        """
+        Altera o gradiente, a idade de saturação ou a cor das células mortas.
+        """
+        if gradient is not None:
+            self.gradient = palette_array(gradient)
+        if max_age is not None:
+            self.max_age = int(max_age)
+        if empty_color is not None:
+            self.empty_color = tuple(empty_color)
+        self._lut = None  # Invalida a tabela
+
+    @property
+    def lut(self):
+        """
+        Tabela (max_age + 2, 3): linha 0 para células mortas, linha i + 1 para a idade i.
+        """
+        if self._lut is None:
+            stops = np.linspace(0, self.max_age, len(self.gradient))
+            ages = np.arange(self.max_age + 1)
+            lut = np.empty((self.max_age + 2, 3), dtype=np.uint8)
+            lut[0] = self.empty_color
+            for channel in range(3):
+                lut[1:, channel] = np.rint(np.interp(ages, stops, self.gradient[:, channel]))
+            self._lut = lut
+        return self._lut
+
+    def colors(self, ages, alive):
+        """
+        Gera o array RGB (largura, altura, 3) das idades mascaradas pelas células vivas.
+        """
+        if self._index is None or self._index.shape != ages.shape:
+            self._index = np.empty(ages.shape, dtype=np.intp)
+            self._rgb = np.empty(ages.shape + (3,), dtype=np.uint8)
+
+        np.clip(ages, 0, self.max_age, out=self._index, casting="unsafe")
+        self._index += 1
+        self._index[~np.asarray(alive, dtype=bool)] = 0
+        return np.take(self.lut, self._index, axis=0, out=self._rgb)
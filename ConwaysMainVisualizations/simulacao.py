@@ -0,0 +1,193 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+class Frame:
+    """
+    Cópia do estado do modelo publicada pela simulação para a interface.
+
+    step é o número de passos executados até a cópia e data é um dicionário
+    com os arrays (copiados) e valores escalares escolhidos pela função
+    snapshot do SimulationWorker. version muda a cada publicação, inclusive
+    quando um comando altera o estado sem executar um passo.
+    """
+
+    def __init__(self):
+        self.step = 0
+        self.version = 0
+        self.data = {}
+
+    def update(self, step, version, values):
+        """
+        Copia os valores para dentro do quadro, reaproveitando os arrays já alocados.
+        """
+        self.step = step
+        self.version = version
+        for key, value in values.items():
+            current = self.data.get(key)
+            if isinstance(value, np.ndarray):
+                if not isinstance(current, np.ndarray) or current.shape != value.shape or current.dtype != value.dtype:
+                    self.data[key] = value.copy()
+                else:
+                    np.copyto(current, value)
+            else:
+                self.data[key] = value
+
+
+class SimulationWorker(threading.Thread):
+    """
+    Executa model.step() em uma thread própria, separada da renderização.
+
+    A simulação roda na velocidade pedida em steps_per_second (None = o mais
+    rápido possível, 0 = parada) e publica cópias do estado em um buffer
+    duplo: enquanto a interface lê um quadro, o próximo é escrito no outro.
+    A troca é feita sem locks, apenas trocando o índice do quadro da frente;
+    se a interface ainda estiver lendo o quadro de trás, ou ainda não tiver
+    pegado o último quadro publicado, a publicação é pulada e a simulação
+    continua. Assim o estado é copiado no máximo uma vez por quadro da
+    interface, por mais rápida que a simulação seja.
+
+    Alterações vindas da interface (cliques, Clear, Random, um modelo novo)
+    são enviadas pela fila de comandos e aplicadas na thread da simulação,
+    entre dois passos, para nunca disputar os arrays com model.step().
+    """
+
+    def __init__(self, model, snapshot, steps_per_second=20, on_step=None, publish_interval=1 / 120):
+        super().__init__(daemon=True)
+        self.model = model
+        self.snapshot = snapshot  # Função model -> dict com o que a interface precisa
+        self.on_step = on_step  # Chamada após cada passo (coleta de dados, gráficos...)
+        self.steps_per_second = steps_per_second
+        self.publish_interval = publish_interval
+        self.paused = False
+        self.steps = 0
+
+        self.commands = queue.Queue()
+        self._frames = [Frame(), Frame()]
+        self._front = 0  # Índice do quadro mais recente
+        self._reading = -1  # Índice do quadro em uso pela interface
+        self._taken = -1  # Versão do último quadro obtido em acquire()
+        self._last_publish = 0.0
+        self._pending = False  # Existe um estado mais novo que o último quadro publicado
+        self._stop_event = threading.Event()
+
+        self._version = 0
+        self._frames[0].update(0, self._version, snapshot(model))
+
+    # Interface -> simulação
+
+    def submit(self, function, *args):
+        """
+        Agenda function(model, *args) para rodar na thread da simulação.
+        """
+        self.commands.put((function, args))
+
+    def set_model(self, model):
+        """
+        Troca o modelo simulado (por exemplo, quando o tamanho da grade muda).
+        """
+        self.commands.put((None, (model,)))
+
+    def stop(self):
+        """
+        Encerra a thread da simulação e espera ela terminar.
+        """
+        self._stop_event.set()
+        self.commands.put((None, ()))  # Acorda a thread se ela estiver esperando comandos
+        if self.is_alive():
+            self.join()
+
+    # Simulação -> interface
+
+    def acquire(self):
+        """
+        Retorna o quadro mais recente. Ele não é sobrescrito até release().
+        """
+        while True:
+            index = self._front
+            self._reading = index
+            if self._front == index:
+                frame = self._frames[index]
+                self._taken = frame.version
+                return frame
+
+    def release(self):
+        """
+        Libera o quadro obtido em acquire() para ser reaproveitado.
+        """
+        self._reading = -1
+
+    # Thread da simulação
+
+    def run(self):
+        next_step = time.perf_counter()
+        while not self._stop_event.is_set():
+            self._drain_commands()
+            rate = self.steps_per_second
+            if self.paused or rate == 0:
+                if self._pending:
+                    self._publish(force=True)
+                self._wait_command(0.05)
+                next_step = time.perf_counter()
+                continue
+
+            self.model.step()
+            self.steps += 1
+            if self.on_step is not None:
+                self.on_step(self.model)
+            self._publish()
+
+            if rate is not None:
+                next_step += 1 / rate
+                delay = next_step - time.perf_counter()
+                if delay < -0.25:
+                    next_step = time.perf_counter()  # Muito atrasada: não tenta recuperar os passos perdidos
+                while delay > 0:
+                    # Até o próximo passo, publica o estado pendente assim que a interface pegar o quadro anterior
+                    self._wait_command(min(delay, self.publish_interval) if self._pending else delay)
+                    if self._pending:
+                        self._publish()
+                    delay = next_step - time.perf_counter()
+
+    def _wait_command(self, timeout):
+        try:
+            command = self.commands.get(timeout=timeout)
+        except queue.Empty:
+            return
+        self._apply(command)
+        self._drain_commands(applied=True)
+
+    def _drain_commands(self, applied=False):
+        while True:
+            try:
+                command = self.commands.get_nowait()
+            except queue.Empty:
+                break
+            self._apply(command)
+            applied = True
+        if applied:
+            self._publish(force=True)
+
+    def _apply(self, command):
+        function, args = command
+        if function is None:
+            if args:
+                self.model = args[0]
+            return
+        function(self.model, *args)
+
+    def _publish(self, force=False):
+        now = time.perf_counter()
+        back = 1 - self._front
+        waiting = now - self._last_publish < self.publish_interval or self._taken != self._frames[self._front].version
+        if (not force and waiting) or self._reading == back:
+            self._pending = True  # Publica depois (intervalo curto, quadro anterior ainda não visto ou ainda em leitura)
+            return
+        self._version += 1
+        self._frames[back].update(self.steps, self._version, self.snapshot(self.model))
+        self._front = back
+        self._last_publish = now
+        self._pending = False
@@ -0,0 +1,144 @@
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from memoria import attach_shared_memory
+
+# Campos do cabeçalho (int64) no início da memória compartilhada
+_HEAD = 0  # Registros já escritos (só o produtor altera)
+_TAIL = 1  # Registros já lidos (só o consumidor altera)
+_READY = 2  # O consumidor está pronto para receber dados
+_DROPPED = 3  # Registros descartados com o buffer cheio (só o produtor altera)
+_HEADER_FIELDS = 8
+
+
+class TelemetryRing:
+    """
+    Canal de telemetria entre dois processos: um buffer circular de float64 em memória compartilhada.
+
+    Cada registro tem um valor por série (por exemplo, fração de células
+    vivas, idade média e idade máxima). Há um único produtor, que escreve com
+    push(), e um único consumidor, que lê em lotes com read(). O produtor só
+    altera o índice head e o consumidor só altera o tail, ambos inteiros de 64
+    bits alinhados; os dados do registro são escritos antes de head avançar,
+    então o consumidor nunca vê um registro pela metade e nenhum lock é
+    necessário. Se o buffer encher, os registros novos são descartados (e
+    contados em dropped) em vez de bloquear a simulação.
+
+    O handshake de inicialização substitui esperas fixas: o consumidor chama
+    mark_ready() quando está pronto e o produtor espera com wait_ready().
+
+    reset() envia pelo próprio canal um registro só com NaN, que marca o
+    início de uma nova série de dados (por exemplo, depois de Clear/Random).
+    """
+
+    def __init__(self, series, capacity=1 << 16, name=None):
+        self.series = tuple(series)
+        self.capacity = int(capacity)
+        size = 8 * (_HEADER_FIELDS + self.capacity * len(self.series))
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            self._owner = True
+        else:
+            self._shm = attach_shared_memory(name)
+            self._owner = False
+        self._map()
+        if self._owner:
+            self._header[:] = 0
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def dropped(self):
+        return int(self._header[_DROPPED])
+
+    def __getstate__(self):
+        # Ao ser enviado para outro processo, o canal é reaberto pelo nome da memória compartilhada
+        return {"series": self.series, "capacity": self.capacity, "name": self.name}
+
+    def __setstate__(self, state):
+        self.__init__(state["series"], state["capacity"], name=state["name"])
+
+    # Produtor
+
+    def push(self, *values):
+        """
+        Escreve um registro (um valor por série). Retorna False se o buffer estiver cheio.
+        """
+        head = int(self._header[_HEAD])
+        if head - int(self._header[_TAIL]) >= self.capacity:
+            self._header[_DROPPED] += 1
+            return False
+        self._data[head % self.capacity] = values
+        self._header[_HEAD] = head + 1  # Publica o registro só depois de escrito
+        return True
+
+    def reset(self):
+        """
+        Marca no canal o início de uma nova série de dados.
+        """
+        return self.push(*([np.nan] * len(self.series)))
+
+    def wait_ready(self, timeout=10.0, poll=0.01):
+        """
+        Espera o consumidor chamar mark_ready(). Retorna False se o tempo acabar.
+        """
+        deadline = time.perf_counter() + timeout
+        while not self._header[_READY]:
+            if time.perf_counter() >= deadline:
+                return False
+            time.sleep(poll)
+        return True
+
+    # Consumidor
+
+    def mark_ready(self):
+        """
+        Avisa o produtor que o consumidor está pronto.
+        """
+        self._header[_READY] = 1
+
+    def read(self):
+        """
+        Lê todos os registros disponíveis de uma vez.
+
+        Retorna (registros, reset): registros é um array (n, número de séries)
+        e reset indica se houve um reset() no lote; nesse caso só os registros
+        posteriores ao último reset são retornados.
+        """
+        tail = int(self._header[_TAIL])
+        head = int(self._header[_HEAD])
+        count = head - tail
+        if count == 0:
+            return np.empty((0, len(self.series))), False
+
+        start = tail % self.capacity
+        first = min(count, self.capacity - start)
+        records = np.concatenate((self._data[start:start + first], self._data[:count - first]))
+        self._header[_TAIL] = head  # Libera o espaço só depois de copiar
+
+        markers = np.flatnonzero(np.isnan(records).all(axis=1))
+        if len(markers):
+            return records[markers[-1] + 1:], True
+        return records, False
+
+    # Encerramento
+
+    def close(self):
+        """
+        Fecha o canal neste processo; quem criou o canal também libera a memória compartilhada.
+        """
+        self._header = self._data = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    def _map(self):
+        buffer = self._shm.buf
+        self._header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=buffer)
+        self._data = np.ndarray(
+            (self.capacity, len(self.series)), dtype=np.float64, buffer=buffer, offset=8 * _HEADER_FIELDS
+        )
@@ -0,0 +1,104 @@
+# Lightweight PNG encoder for the Flask visualizations: writes an indexed (palette) PNG straight
+# from the state array with zlib, without matplotlib, and caches the encoded frame until the
+# model changes.
+import hashlib
+import struct
+import threading
+import zlib
+
+import numpy as np
+from flask import Response, request
+
+# cmap='binary' colors: False/0 -> white, True/1 -> black
+BINARY = [(255, 255, 255), (0, 0, 0)]
+
+
+# Encode a 2D array of palette indices as a PNG, each cell drawn as a scale x scale block.
+# The bit depth is the smallest one that fits the palette (1, 2, 4 or 8 bits per pixel),
+# so a two-color board is a 1-bit PNG.
+def encode_png(cells, palette, scale=1, level=6):
+    indices = np.asarray(cells).astype(np.uint8)
+    if scale > 1:
+        indices = np.repeat(np.repeat(indices, scale, axis=0), scale, axis=1)
+    height, width = indices.shape
+    depth = bit_depth(palette)
+
+    packed = pack_bits(indices, depth)
+    rows = np.zeros((height, packed.shape[1] + 1), dtype=np.uint8)  # Filter byte 0 (none) on every row
+    rows[:, 1:] = packed
+
+    header = struct.pack(">IIBBBBB", width, height, depth, 3, 0, 0, 0)
+    colors = np.asarray(palette, dtype=np.uint8).tobytes()
+    return b"".join((
+        b"\x89PNG\r\n\x1a\n",
+        _chunk(b"IHDR", header),
+        _chunk(b"PLTE", colors),
+        _chunk(b"IDAT", zlib.compress(rows.tobytes(), level)),
+        _chunk(b"IEND", b""),
+    ))
+
+
+# Smallest PNG bit depth (1, 2, 4 or 8 bits per pixel) that fits the palette
+def bit_depth(palette):
+    return next(bits for bits in (1, 2, 4, 8) if len(palette) <= 1 << bits)
+
+
+# Pack palette indices along the last axis into bytes, depth bits each, most significant bits first.
+# Each row is padded with zeros to a whole number of bytes.
+def pack_bits(indices, depth):
+    indices = np.asarray(indices, dtype=np.uint8)
+    per_byte = 8 // depth
+    if depth == 1:
+        return np.packbits(indices, axis=-1)
+    if per_byte == 1:
+        return indices
+    width = indices.shape[-1]
+    padded = np.zeros(indices.shape[:-1] + (-(-width // per_byte) * per_byte,), dtype=np.uint8)
+    padded[..., :width] = indices
+    groups = padded.reshape(indices.shape[:-1] + (-1, per_byte))
+    shifts = np.arange(8 - depth, -1, -depth, dtype=np.uint8)
+    return np.bitwise_or.reduce(groups << shifts, axis=-1).astype(np.uint8)
+
+
+# Largest integer scale that keeps the longest side of the board within size pixels
+def fit_scale(shape, size=480):
+    return max(1, size // max(max(shape), 1))
+
+
+# The current frame of a model, encoded once and reused until the model changes.
+# render(model) returns the PNG bytes. Frames are cached per (model, version): call
+# invalidate() whenever the state changes (step, reset, toggle, new model). The ETag is a
+# hash of the PNG itself, so it stays valid across server restarts.
+class FrameCache:
+    def __init__(self, render):
+        self.render = render
+        self.version = 0
+        self._key = None
+        self._frame = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+
+    # (png, etag) for the current state of model
+    def get(self, model):
+        with self._lock:
+            key = (id(model), self.version)
+            if self._key != key:
+                png = self.render(model)
+                self._frame = (png, '"%s"' % hashlib.blake2b(png, digest_size=12).hexdigest())
+                self._key = key
+            return self._frame
+
+    # PNG response, or 304 Not Modified if the browser already has this frame
+    def response(self, model):
+        png, etag = self.get(model)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag in request.headers.get("If-None-Match", ""):
+            return Response(status=304, headers=headers)
+        return Response(png, mimetype="image/png", headers=headers)
+
+
+def _chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
@@ -0,0 +1,314 @@
+# Push-based streaming of the board to the browser with Server-Sent Events (plain HTTP, no extra dependency).
+# After each change the server publishes one message: a keyframe with the whole board, or a delta with only the
+# cells that changed. The page draws them on a canvas (CLIENT_SCRIPT), and falls back to polling /frame when
+# the browser has no EventSource.
+#
+# Cells are palette indices packed at the smallest bit depth that fits the palette (1 bit for two colors).
+# A delta is the XOR of the packed board against the previous one, sent as a bit mask of the bytes that changed
+# followed by those XOR bytes, so a step that flips a few cells costs a few bytes.
+import base64
+import heapq
+import itertools
+import json
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from flask import Response
+
+from frame_encoder import bit_depth, pack_bits
+
+
+class FrameStream:
+    # state() returns the current board as a 2D array of palette indices; palette is a list of (r, g, b)
+    def __init__(self, state, palette, history=64):
+        self.state = state
+        self.palette = ["#%02x%02x%02x" % tuple(color) for color in palette]
+        self.depth = bit_depth(palette)
+        self.version = 0
+        self.viewers = 0
+        self.closed = False
+        self._history = deque(maxlen=history)  # (version, message) of the latest frames
+        self._packed = None
+        self._shape = None
+        self._keyframe = None
+        self._condition = threading.Condition()
+        self.publish()
+
+    # Send the current board to every client. Call it after each change (step, reset, toggle, new model)
+    def publish(self, step=0):
+        cells = np.asarray(self.state())
+        packed = pack_bits(cells.astype(np.uint8).ravel(), self.depth)
+        with self._condition:
+            self.version += 1
+            self._keyframe = {"type": "key", "version": self.version, "step": step, "shape": list(cells.shape),
+                              "depth": self.depth, "palette": self.palette, "cells": _encode(packed)}
+            if self._packed is None or self._shape != cells.shape:
+                message = self._keyframe
+            else:
+                changes = packed ^ self._packed
+                changed = changes != 0
+                delta = np.concatenate((np.packbits(changed), changes[changed]))
+                message = {"type": "delta", "version": self.version, "step": step, "delta": _encode(delta)}
+            self._packed, self._shape = packed, cells.shape
+            self._history.append((self.version, message))
+            self._condition.notify_all()
+
+    # Keyframe of the current board, for the polling fallback
+    def frame(self):
+        with self._condition:
+            return self._keyframe
+
+    # Event stream for one client: the current keyframe, then every frame as it is published. A client that falls
+    # further behind than the history gets a fresh keyframe instead of the deltas it missed
+    def events(self, heartbeat=15):
+        with self._condition:
+            version, message = self.version, self._keyframe
+            self.viewers += 1
+        try:
+            yield _event(message)
+            while True:
+                with self._condition:
+                    changed = self._condition.wait_for(lambda: self.version != version or self.closed, timeout=heartbeat)
+                    if self.closed:
+                        return  # The browser reconnects by itself and gets the stream that replaced this one
+                    if not changed:
+                        pending = None
+                    elif self._history[0][0] <= version + 1:
+                        pending = [message for number, message in self._history if number > version]
+                    else:
+                        pending = [self._keyframe]
+                    version = self.version
+                if pending is None:
+                    yield ": keepalive\n\n"  # Comment line: lets the server notice clients that went away
+                    continue
+                for message in pending:
+                    yield _event(message)
+        finally:
+            with self._condition:
+                self.viewers -= 1
+
+    # End the event streams of every client
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+    def response(self):
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        return Response(self.events(), mimetype="text/event-stream", headers=headers)
+
+
+# Steps the simulation on the server at a target rate. advance() does one step and returns False when the
+# simulation cannot go on (for example, at max_steps), which stops the playback.
+# Routes that change the model should hold lock, so they never run in the middle of a step.
+#
+# Without a scheduler the playback runs in its own background thread. With a Scheduler, many Autoplay objects
+# share its timer thread and their steps run in its executor.
+class Autoplay:
+    def __init__(self, advance, scheduler=None):
+        self.advance = advance
+        self.scheduler = scheduler
+        self.lock = threading.RLock()
+        self.rate = 0
+        self._stop = threading.Event()
+        self._stop.set()
+        self._thread = None
+
+    @property
+    def playing(self):
+        return not self._stop.is_set()
+
+    # Start (or restart) playing at rate steps per second
+    def play(self, rate=10):
+        self.pause()
+        self.rate = min(max(rate, 0.1), 1000)
+        self._stop = stop = threading.Event()
+        if self.scheduler is None:
+            self._thread = threading.Thread(target=self._run, args=(stop, 1 / self.rate), daemon=True)
+            self._thread.start()
+        else:
+            self._tick(stop, 1 / self.rate, time.monotonic() - 1 / self.rate)
+
+    def pause(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        with self.lock:
+            pass  # Wait for a step that the scheduler may be running
+
+    # One step, outside of the playback
+    def step(self):
+        with self.lock:
+            return self.advance()
+
+    def _run(self, stop, interval):
+        deadline = time.monotonic()
+        try:
+            while not stop.is_set() and self.step():
+                deadline += interval
+                delay = deadline - time.monotonic()
+                if delay < 0:
+                    deadline = time.monotonic()  # Behind schedule: keep the rate instead of catching up in a burst
+                stop.wait(max(delay, 0))
+        finally:
+            stop.set()
+
+    def _tick(self, stop, interval, deadline):
+        deadline = max(deadline + interval, time.monotonic())
+        self.scheduler.schedule(deadline, lambda: self._scheduled_step(stop, interval, deadline))
+
+    def _scheduled_step(self, stop, interval, deadline):
+        with self.lock:
+            if stop.is_set():
+                return
+            try:
+                going = self.advance()
+            except Exception:
+                stop.set()
+                raise
+        if not going:
+            stop.set()
+            return
+        self._tick(stop, interval, deadline)
+
+
+# One timer thread for the playback of many Autoplay objects: callbacks are queued by deadline and, when due,
+# run in executor (a concurrent.futures executor)
+class Scheduler:
+    def __init__(self, executor):
+        self.executor = executor
+        self._queue = []  # Heap of (deadline, order, callback)
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # Run callback in the executor at deadline (a time.monotonic() value)
+    def schedule(self, deadline, callback):
+        with self._condition:
+            heapq.heappush(self._queue, (deadline, next(self._order), callback))
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue or self._queue[0][0] > time.monotonic():
+                    self._condition.wait(self._queue[0][0] - time.monotonic() if self._queue else None)
+                _, _, callback = heapq.heappop(self._queue)
+            self.executor.submit(callback)
+
+
+def _encode(data):
+    return base64.b64encode(data.tobytes()).decode("ascii")
+
+
+def _event(message):
+    return "data: %s\n\n" % json.dumps(message, separators=(",", ":"))
+
+
+# Canvas renderer for the messages of FrameStream, to be placed inside a <script> tag of the page.
+#   const view = new FrameView(canvas);
+#   const streaming = streamFrames(view);  // false without EventSource: call fetchFrame(view) after each change
+CLIENT_SCRIPT = """
+      function FrameView(canvas, size) {
+        this.canvas = canvas;
+        this.size = size || 480;
+        this.version = 0;
+        this.cells = null;
+      }
+
+      // Apply a keyframe or delta; returns false if a delta does not follow the frame on screen
+      FrameView.prototype.apply = function (message) {
+        if (message.type === 'key') {
+          this.shape = message.shape;
+          this.depth = message.depth;
+          this.palette = message.palette.map(color => [1, 3, 5].map(i => parseInt(color.slice(i, i + 2), 16)));
+          this.cells = decodeBytes(message.cells);
+          this.scale = Math.max(1, Math.floor(this.size / Math.max(this.shape[0], this.shape[1])));
+          this.canvas.width = this.shape[1] * this.scale;
+          this.canvas.height = this.shape[0] * this.scale;
+          this.buffer = document.createElement('canvas');
+          this.buffer.width = this.shape[1];
+          this.buffer.height = this.shape[0];
+          this.image = new ImageData(this.shape[1], this.shape[0]);
+        } else {
+          if (this.cells === null || message.version !== this.version + 1) {
+            return false;
+          }
+          const delta = decodeBytes(message.delta);
+          const maskLength = Math.ceil(this.cells.length / 8);
+          let next = maskLength;
+          for (let m = 0; m < maskLength; m++) {
+            if (delta[m] === 0) {
+              continue;
+            }
+            for (let bit = 0; bit < 8; bit++) {
+              if (delta[m] & (0x80 >> bit)) {
+                this.cells[m * 8 + bit] ^= delta[next++];
+              }
+            }
+          }
+        }
+        this.version = message.version;
+        this.draw();
+        return true;
+      };
+
+      FrameView.prototype.draw = function () {
+        const count = this.shape[0] * this.shape[1];
+        const mask = (1 << this.depth) - 1;
+        const pixels = this.image.data;
+        for (let i = 0; i < count; i++) {
+          const offset = i * this.depth;
+          const index = (this.cells[offset >> 3] >> (8 - this.depth - (offset & 7))) & mask;
+          const color = this.palette[index];
+          pixels[4 * i] = color[0];
+          pixels[4 * i + 1] = color[1];
+          pixels[4 * i + 2] = color[2];
+          pixels[4 * i + 3] = 255;
+        }
+        this.buffer.getContext('2d').putImageData(this.image, 0, 0);
+        const context = this.canvas.getContext('2d');
+        context.imageSmoothingEnabled = false;
+        context.drawImage(this.buffer, 0, 0, this.canvas.width, this.canvas.height);
+      };
+
+      // [row, column] of the cell under a mouse event
+      FrameView.prototype.cellAt = function (event) {
+        const box = this.canvas.getBoundingClientRect();
+        const row = Math.floor((event.clientY - box.top) / box.height * this.shape[0]);
+        const column = Math.floor((event.clientX - box.left) / box.width * this.shape[1]);
+        return [row, column];
+      };
+
+      function decodeBytes(text) {
+        const binary = atob(text);
+        const bytes = new Uint8Array(binary.length);
+        for (let i = 0; i < binary.length; i++) {
+          bytes[i] = binary.charCodeAt(i);
+        }
+        return bytes;
+      }
+
+      // Polling fallback: fetch the keyframe of the current board
+      function fetchFrame(view) {
+        return fetch('/frame', {cache: 'no-cache'}).then(response => response.json()).then(message => view.apply(message));
+      }
+
+      function streamFrames(view) {
+        if (!window.EventSource) {
+          fetchFrame(view);
+          return false;
+        }
+        const source = new EventSource('/stream');
+        source.onmessage = event => {
+          if (!view.apply(JSON.parse(event.data))) {
+            fetchFrame(view);
+          }
+        };
+        return true;
+      }
+"""
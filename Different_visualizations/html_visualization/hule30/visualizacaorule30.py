@@ -1,11 +1,13 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 import numpy as np
 from flask import Flask, render_template_string, jsonify
-import matplotlib
-matplotlib.use('Agg')  
-import matplotlib.pyplot as plt
-import io
-import base64
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+from frame_encoder import BINARY, encode_png, fit_scale
+from frame_stream import CLIENT_SCRIPT
+from jobs import JOB_CONTROLS, JOB_SCRIPT, json_body, json_number, register_job_routes
+from sessions import ModelRegistry, Simulation
 
 class Rule30Model:
     def __init__(self, width=128):
@@ -29,37 +31,67 @@ class Rule30Model:
         self.steps.append(row)
 
 app = Flask(__name__)
-model = Rule30Model(width=128) 
 max_steps = 64  
-step_count = 0
+
+# The streamed board has room for max_steps + 1 rows, so each step only sends the new row. Past that (in a
+# run), it shows the latest rows
+def all_rows(model):
+    recent = model.steps[-(max_steps + 1):]
+    rows = np.zeros((max_steps + 1, model.width), dtype=np.uint8)
+    rows[:len(recent)] = recent
+    return rows
+
+def new_simulation(scheduler):
+    return Simulation(Rule30Model(width=128), state=all_rows, palette=BINARY, max_steps=max_steps,
+                      render=lambda m: encode_png(np.array(m.steps[-(max_steps + 1):]), BINARY, fit_scale((1, m.width))),
+                      footprint=lambda m: len(m.steps) * m.width * 8,  # Rows are lists, 8 bytes per entry
+                      metrics=lambda m: {"cells on": bin(m.state).count("1")},
+                      fingerprint=lambda m: m.state.to_bytes(m.width // 8 + 1, "little"),
+                      scheduler=scheduler)
+
+# Each browser session gets its own automaton
+simulations = ModelRegistry(new_simulation)
+simulations.init_app(app)
+# Long runs in the background: /run, /run/<id> and /run/<id>/result. Every row is kept, so runs are shorter
+register_job_routes(app, simulations, max_run_steps=10_000)
 
 @app.route('/')
 def index():
-    return render_template_string(HTML_TEMPLATE, plot_png=plot_png())
+    simulations.current()
+    return render_template_string(HTML_TEMPLATE, stream_script=CLIENT_SCRIPT, job_controls=JOB_CONTROLS, job_script=JOB_SCRIPT)
+
+@app.route('/plot.png')
+def plot_png():
+    simulation = simulations.current()
+    return simulation.frames.response(simulation.model)
 
 @app.route('/step')
 def step():
-    global step_count
-    if step_count < max_steps:
-        model.step()
-        step_count += 1
+    if simulations.run(simulations.current().player.step):
         return jsonify(success=True)
     else:
         return jsonify(success=False, message="Maximum number of steps reached.")
 
-@app.route('/plot.png')
-def plot_png():
-    fig, ax = plt.subplots()
-    ax.imshow(model.steps, cmap='binary', aspect='auto')
-    ax.set_xticks([])
-    ax.set_yticks([])
-    plt.title("Rule 30 - Current State")
-    canvas = FigureCanvas(fig)
-    img = io.BytesIO()
-    canvas.print_png(img)
-    plt.close(fig)
-    img.seek(0)
-    return base64.b64encode(img.getvalue()).decode('utf8')
+@app.route('/play', methods=['POST'])
+def play():
+    rate = json_number(json_body(), 'rate', 10, 0.1, 1000)
+    if rate is None:
+        return jsonify(success=False, message="The rate must be between 0.1 and 1000 steps per second."), 400
+    simulations.current().player.play(rate)
+    return jsonify(success=True)
+
+@app.route('/pause', methods=['POST'])
+def pause():
+    simulations.current().player.pause()
+    return jsonify(success=True)
+
+@app.route('/stream')
+def stream_frames():
+    return simulations.current().stream.response()
+
+@app.route('/frame')
+def frame():
+    return jsonify(simulations.current().stream.frame())
 
 HTML_TEMPLATE = """
 <!doctype html>
@@ -72,23 +104,61 @@ HTML_TEMPLATE = """
   <body>
     <div style="text-align: center;">
       <h1>Rule 30 Cellular Automaton</h1>
-      <img id="rule30-image" src="data:image/png;base64,{{ plot_png }}" alt="Rule 30">
+      <canvas id="board"></canvas>
       <br><br>
       <button onclick="nextStep()">Next Step</button>
+      <br><br>
+      <input type="number" id="rate" value="10" min="1" max="60"> steps/s
+      <button onclick="play()">Play</button>
+      <button onclick="pause()">Pause</button>
+      <br><br>
+{{ job_controls|safe }}
     </div>
     <script>
+{{ stream_script|safe }}
+{{ job_script|safe }}
+
+      const view = new FrameView(document.getElementById('board'), 512);
+      const streaming = streamFrames(view);
+      let polling = null;
+
+      // Without the stream, fetch the board after each change
+      function refresh() {
+        if (!streaming) {
+          fetchFrame(view);
+        }
+      }
+
       function nextStep() {
         fetch('/step').then(response => response.json()).then(data => {
           if (data.success) {
-            updateImage();
+            refresh();
           } else {
             alert(data.message);
           }
         });
       }
-      function updateImage() {
-        fetch('/plot.png').then(response => response.text()).then(data => {
-          document.getElementById('rule30-image').src = 'data:image/png;base64,' + data;
+
+      function play() {
+        const rate = Number(document.getElementById('rate').value);
+        fetch('/play', {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json'
+          },
+          body: JSON.stringify({rate: rate})
+        }).then(() => {
+          if (!streaming) {
+            clearInterval(polling);
+            polling = setInterval(refresh, 1000 / rate);
+          }
+        });
+      }
+
+      function pause() {
+        fetch('/pause', {method: 'POST'}).then(() => {
+          clearInterval(polling);
+          refresh();
         });
       }
     </script>
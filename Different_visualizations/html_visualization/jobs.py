@@ -0,0 +1,245 @@
+# Long runs in the background: POST /run steps the model of the session n times (past max_steps), without one
+# HTTP request per step. The run goes in short slices in the thread pool of the registry, so it never holds a
+# worker for long and the page keeps receiving frames through the stream. Progress and the result (final frame
+# and metrics) are fetched by the id of the run.
+import hashlib
+import threading
+import time
+import uuid
+
+from flask import jsonify, request
+
+SLICE = 0.05  # Seconds of stepping before the run gives the worker back (and publishes a frame)
+
+
+# A run of steps generations on a Simulation. With stop_on_cycle, the run stops as soon as the board repeats
+# a state seen during the run (every later state would repeat too) and reports where the cycle starts and its
+# period. Without an executor, the run goes in its own thread.
+class Job:
+    def __init__(self, simulation, steps, stop_on_cycle=False, executor=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.simulation = simulation
+        self.steps = steps
+        self.stop_on_cycle = stop_on_cycle
+        self.executor = executor
+        self.status = "running"  # Then "done", "cycle", "cancelled" or "failed"
+        self.steps_done = 0
+        self.cycle = None
+        self.error = None
+        self.started = time.monotonic()
+        self.finished = None
+        self._result = None
+        self._seen = {}  # State fingerprint -> step at which it was seen
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def running(self):
+        return not self._done.is_set()
+
+    def start(self):
+        if self.stop_on_cycle:
+            with self.simulation.lock:
+                self._seen[self._fingerprint()] = self.simulation.step_count
+        if self.executor is not None:
+            self.executor.submit(self._slice)
+        else:
+            threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    # Wait until the run ends; returns False on timeout
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def progress(self):
+        elapsed = (self.finished or time.monotonic()) - self.started
+        return {"id": self.id, "status": self.status, "steps": self.steps, "steps_done": self.steps_done,
+                "elapsed": elapsed, "steps_per_second": self.steps_done / elapsed if elapsed > 0 else 0.0,
+                "cycle": self.cycle, "error": self.error}
+
+    # Progress plus the final frame and metrics of the model, once the run has ended
+    def result(self):
+        return dict(self.progress(), **self._result) if self._result is not None else None
+
+    def _run(self):
+        while self._slice(resubmit=False):
+            pass
+
+    # Run steps for up to SLICE seconds; returns True while there is more to do
+    def _slice(self, resubmit=True):
+        simulation = self.simulation
+        try:
+            with simulation.lock:
+                deadline = time.monotonic() + SLICE
+                while self.steps_done < self.steps and not self._cancel.is_set() and time.monotonic() < deadline:
+                    simulation.model.step()
+                    simulation.step_count += 1
+                    self.steps_done += 1
+                    if self.stop_on_cycle and self._repeated():
+                        break
+                simulation.changed()
+                if self.cycle is not None:
+                    self._finish("cycle")
+                elif self._cancel.is_set():
+                    self._finish("cancelled")
+                elif self.steps_done >= self.steps:
+                    self._finish("done")
+        except Exception as error:
+            self.error = "%s: %s" % (type(error).__name__, error)
+            with simulation.lock:
+                self._finish("failed")
+            return False
+        if not self.running:
+            return False
+        if resubmit:
+            self.executor.submit(self._slice)
+        return True
+
+    def _repeated(self):
+        fingerprint = self._fingerprint()
+        step = self.simulation.step_count
+        first = self._seen.setdefault(fingerprint, step)
+        if first != step:
+            self.cycle = {"start": first, "period": step - first}
+        return self.cycle is not None
+
+    def _fingerprint(self):
+        return hashlib.blake2b(self.simulation.fingerprint(), digest_size=16).digest()
+
+    def _finish(self, status):
+        simulation = self.simulation
+        self._result = {"step": simulation.step_count, "metrics": simulation.metrics(), "frame": simulation.stream.frame()}
+        self.status = status
+        self.finished = time.monotonic()
+        self._seen = None
+        self._done.set()
+
+
+# The JSON body of the request. A body that is missing, not JSON or not an object reads as {}, so every field
+# takes its default.
+def json_body():
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else {}
+
+
+# Field name of data converted by kind, or None when it is not a number between low and high (NaN included).
+# The routes answer None with a 400 instead of letting the conversion fail with a 500.
+def json_number(data, name, default, low, high, kind=float):
+    try:
+        value = kind(data.get(name, default))
+    except (ValueError, TypeError, OverflowError):
+        return None
+    return value if low <= value <= high else None
+
+
+# Add the run routes to app, for the simulations of a ModelRegistry:
+#   POST /run                  {"steps": n, "stop_on_cycle": false} -> 202 and the progress of the new run
+#   GET  /run/<id>             progress: steps done, steps per second, status
+#   GET  /run/<id>/result      final frame and metrics (409 while the run is going)
+#   POST /run/<id>/cancel
+def register_job_routes(app, simulations, max_run_steps=100_000):
+    def find(job_id):
+        return simulations.current().jobs.get(job_id)
+
+    @app.route('/run', methods=['POST'])
+    def run():
+        data = json_body()
+        steps = json_number(data, 'steps', 0, 1, max_run_steps, kind=int)
+        if steps is None:
+            return jsonify(success=False, message=f"The number of steps must be between 1 and {max_run_steps}."), 400
+        job = simulations.current().start_job(steps, bool(data.get('stop_on_cycle', False)))
+        if job is None:
+            return jsonify(success=False, message="A run is already in progress."), 409
+        return jsonify(success=True, job=job.progress()), 202
+
+    @app.route('/run/<job_id>')
+    def run_progress(job_id):
+        job = find(job_id)
+        if job is None:
+            return jsonify(success=False, message="Unknown run."), 404
+        return jsonify(success=True, job=job.progress())
+
+    @app.route('/run/<job_id>/result')
+    def run_result(job_id):
+        job = find(job_id)
+        if job is None:
+            return jsonify(success=False, message="Unknown run."), 404
+        if job.running:
+            return jsonify(success=False, message="The run has not finished yet.", job=job.progress()), 409
+        return jsonify(success=True, result=job.result())
+
+    @app.route('/run/<job_id>/cancel', methods=['POST'])
+    def cancel_run(job_id):
+        job = find(job_id)
+        if job is None:
+            return jsonify(success=False, message="Unknown run."), 404
+        job.cancel()
+        return jsonify(success=True, job=job.progress())
+
+
+# Controls for the pages: a steps field, the stop-on-cycle box and the progress of the run. The page must
+# define refresh() (see frame_stream.CLIENT_SCRIPT), which is called when the run ends.
+JOB_CONTROLS = """
+      <input type="number" id="run-steps" value="1000" min="1"> steps
+      <label><input type="checkbox" id="stop-on-cycle"> stop on cycle</label>
+      <button onclick="runSteps()">Run</button>
+      <button onclick="cancelRun()">Cancel</button>
+      <p id="run-status"></p>
+"""
+
+JOB_SCRIPT = """
+      let runId = null;
+
+      function runSteps() {
+        fetch('/run', {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json'
+          },
+          body: JSON.stringify({
+            steps: Number(document.getElementById('run-steps').value),
+            stop_on_cycle: document.getElementById('stop-on-cycle').checked
+          })
+        }).then(response => response.json()).then(data => {
+          if (data.success) {
+            runId = data.job.id;
+            watchRun(runId);
+          } else {
+            alert(data.message);
+          }
+        });
+      }
+
+      function cancelRun() {
+        if (runId !== null) {
+          fetch('/run/' + runId + '/cancel', {method: 'POST'});
+        }
+      }
+
+      function watchRun(id) {
+        fetch('/run/' + id).then(response => response.json()).then(data => {
+          const job = data.job;
+          const status = document.getElementById('run-status');
+          status.textContent = job.steps_done + ' / ' + job.steps + ' steps, ' + Math.round(job.steps_per_second) + ' steps/s';
+          if (job.status === 'running') {
+            setTimeout(() => watchRun(id), 250);
+            return;
+          }
+          refresh();
+          fetch('/run/' + id + '/result').then(response => response.json()).then(data => {
+            const result = data.result;
+            let text = result.status + ' at step ' + result.step + ' (' + result.steps_done + ' steps in ' + result.elapsed.toFixed(2) + ' s)';
+            if (result.cycle) {
+              text += ', cycle of period ' + result.cycle.period + ' from step ' + result.cycle.start;
+            }
+            for (const [name, value] of Object.entries(result.metrics)) {
+              text += ', ' + name + ': ' + value;
+            }
+            status.textContent = text;
+          });
+        });
+      }
+"""
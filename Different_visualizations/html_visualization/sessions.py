@@ -0,0 +1,168 @@
+# One simulation per browser session, so concurrent viewers never share (or race on) a single global model.
+# A cookie identifies the session; ModelRegistry keeps the simulations, evicts idle ones (least recently used
+# first, within a count and a memory cap) and runs the steps in a thread pool.
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from flask import g, request
+
+from frame_encoder import FrameCache
+from frame_stream import Autoplay, FrameStream, Scheduler
+from jobs import Job
+
+
+# The model of one session with everything that follows it: step counter, PNG cache, stream, playback and runs.
+# state(model) returns the board as palette indices; render(model), if given, returns the PNG for /plot.png;
+# footprint(model) estimates the bytes the model holds (by default, the size of the board); metrics(model)
+# returns a dict of numbers for the result of a run; fingerprint(model) returns bytes that identify the state of
+# the model, for the cycle detection of runs (by default, the board).
+# Every change to the model must happen under lock and be followed by changed().
+class Simulation:
+    def __init__(self, model, state, palette, max_steps, render=None, footprint=None, metrics=None, fingerprint=None,
+                 scheduler=None, max_jobs=8):
+        self.model = model
+        self.max_steps = max_steps
+        self.step_count = 0
+        self.last_used = time.monotonic()
+        self.jobs = OrderedDict()  # The latest runs, by id
+        self.max_jobs = max_jobs
+        self._footprint = footprint or (lambda m: np.asarray(state(m)).nbytes)
+        self._metrics = metrics or (lambda m: {})
+        self._fingerprint = fingerprint or (lambda m: np.ascontiguousarray(state(m)).tobytes())
+        self._executor = scheduler.executor if scheduler is not None else None
+        self.frames = FrameCache(render) if render is not None else None
+        self.stream = FrameStream(lambda: state(self.model), palette)
+        self.player = Autoplay(self.advance, scheduler)
+        self.lock = self.player.lock
+
+    # One step; False at max_steps
+    def advance(self):
+        with self.lock:
+            if self.step_count >= self.max_steps:
+                return False
+            self.model.step()
+            self.step_count += 1
+            self.changed()
+            return True
+
+    # Start over with a new model
+    def replace(self, model):
+        with self.lock:
+            self.model = model
+            self.step_count = 0
+            self.changed()
+
+    # Call after any change to the model (step, reset, toggle, new model)
+    def changed(self):
+        if self.frames is not None:
+            self.frames.invalidate()
+        self.stream.publish(self.step_count)
+
+    # Run steps generations in the background (see jobs.Job). Playback stops first. Returns None if a run of this
+    # session is still going
+    def start_job(self, steps, stop_on_cycle=False):
+        self.player.pause()
+        with self.lock:
+            if self.busy:
+                return None
+            job = Job(self, steps, stop_on_cycle, self._executor)
+            self.jobs[job.id] = job
+            while len(self.jobs) > self.max_jobs:
+                self.jobs.popitem(last=False)
+        return job.start()
+
+    # True while a run is going
+    @property
+    def busy(self):
+        return any(job.running for job in self.jobs.values())
+
+    def metrics(self):
+        return self._metrics(self.model)
+
+    def fingerprint(self):
+        return self._fingerprint(self.model)
+
+    # Estimated memory: the model plus the packed frames kept by the stream
+    def footprint(self):
+        return self._footprint(self.model) + len(self.stream.frame()["cells"]) * 2
+
+    def close(self):
+        self.player.pause()
+        for job in self.jobs.values():
+            job.cancel()
+        self.stream.close()
+
+
+# Simulations by session. create(scheduler) returns a new Simulation (passing scheduler on to it).
+#
+# A session is evicted, least recently used first, when there are more than capacity sessions, when their
+# estimated memory passes max_bytes, or when nobody has used or watched it for idle_timeout seconds (a session
+# with a run going counts as used). The session of the current request is never evicted. Steps run in a pool of workers threads, which bounds the CPU
+# spent on stepping no matter how many sessions are playing.
+class ModelRegistry:
+    def __init__(self, create, capacity=64, max_bytes=256 << 20, idle_timeout=3600, workers=4, cookie="simulation"):
+        self.create = create
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.idle_timeout = idle_timeout
+        self.cookie = cookie
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="simulation")
+        self.scheduler = Scheduler(self.executor)
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Set the session cookie on responses to new visitors
+    def init_app(self, app):
+        @app.after_request
+        def set_cookie(response):
+            key = g.get("simulation_key")
+            if key is not None and request.cookies.get(self.cookie) != key:
+                response.set_cookie(self.cookie, key, httponly=True, samesite="Lax")
+            return response
+
+    # Simulation of the session of the current request, created on the first visit
+    def current(self):
+        key = request.cookies.get(self.cookie)
+        if not key or len(key) != 32:
+            key = uuid.uuid4().hex
+        g.simulation_key = key
+        return self.get(key)
+
+    def get(self, key):
+        with self._lock:
+            simulation = self._sessions.get(key)
+            if simulation is None:
+                simulation = self._sessions[key] = self.create(self.scheduler)
+            self._sessions.move_to_end(key)
+            simulation.last_used = time.monotonic()
+            evicted = self._evict(key)
+        for old in evicted:
+            old.close()
+        return simulation
+
+    # Run function(*args) in the pool and wait for the result
+    def run(self, function, *args):
+        return self.executor.submit(function, *args).result()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _evict(self, keep):
+        now = time.monotonic()
+        total = sum(simulation.footprint() for simulation in self._sessions.values())
+        evicted = []
+        for key, simulation in list(self._sessions.items()):
+            if key == keep:
+                continue
+            idle = (simulation.stream.viewers == 0 and not simulation.busy
+                    and now - simulation.last_used > self.idle_timeout)
+            if not idle and len(self._sessions) <= self.capacity and total <= self.max_bytes:
+                continue
+            del self._sessions[key]
+            total -= simulation.footprint()
+            evicted.append(simulation)
+        return evicted
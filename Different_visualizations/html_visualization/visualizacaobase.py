@@ -5,13 +5,11 @@ from mesa.datacollection import DataCollector
 from mesa.space import PropertyLayer
 from scipy.signal import convolve2d
 from flask import Flask, render_template_string, jsonify
-import matplotlib
-matplotlib.use('Agg')  # Use a non-GUI backend to avoid threading issues
-import matplotlib.pyplot as plt
+from frame_encoder import BINARY, encode_png, fit_scale
+from frame_stream import CLIENT_SCRIPT
+from jobs import JOB_CONTROLS, JOB_SCRIPT, json_body, json_number, register_job_routes
+from sessions import ModelRegistry, Simulation
 import os
-import io
-import base64
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
 import threading
 import time
 
@@ -47,37 +45,58 @@ class GameOfLifeModel(Model):
         self.datacollector.collect(self)
 
 app = Flask(__name__)
-model = GameOfLifeModel(width=20, height=20, alive_fraction=0.3)
 max_steps = 100
-step_count = 0
+
+def new_simulation(scheduler):
+    return Simulation(GameOfLifeModel(width=20, height=20, alive_fraction=0.3),
+                      state=lambda m: m.cell_layer.data, palette=BINARY, max_steps=max_steps,
+                      render=lambda m: encode_png(m.cell_layer.data, BINARY, fit_scale(m.cell_layer.data.shape)),
+                      metrics=lambda m: {"cells alive": int(m.alive_count), "fraction alive": round(float(m.alive_fraction), 4)},
+                      scheduler=scheduler)
+
+# Each browser session gets its own simulation
+simulations = ModelRegistry(new_simulation)
+simulations.init_app(app)
+# Long runs in the background: /run, /run/<id> and /run/<id>/result
+register_job_routes(app, simulations)
 
 @app.route('/')
 def index():
-    return render_template_string(HTML_TEMPLATE, plot_png=plot_png())
+    simulations.current()
+    return render_template_string(HTML_TEMPLATE, stream_script=CLIENT_SCRIPT, job_controls=JOB_CONTROLS, job_script=JOB_SCRIPT)
+
+@app.route('/plot.png')
+def plot_png():
+    simulation = simulations.current()
+    return simulation.frames.response(simulation.model)
 
 @app.route('/step')
 def step():
-    global step_count
-    if step_count < max_steps:
-        model.step()
-        step_count += 1
+    if simulations.run(simulations.current().player.step):
         return jsonify(success=True)
     else:
         return jsonify(success=False, message="Maximum number of steps reached.")
 
-@app.route('/plot.png')
-def plot_png():
-    fig, ax = plt.subplots()
-    ax.imshow(model.cell_layer.data, cmap='binary')
-    ax.set_xticks([])
-    ax.set_yticks([])
-    plt.title("Game of Life - Current State")
-    canvas = FigureCanvas(fig)
-    img = io.BytesIO()
-    canvas.print_png(img)
-    plt.close(fig)
-    img.seek(0)
-    return base64.b64encode(img.getvalue()).decode('utf8')
+@app.route('/play', methods=['POST'])
+def play():
+    rate = json_number(json_body(), 'rate', 10, 0.1, 1000)
+    if rate is None:
+        return jsonify(success=False, message="The rate must be between 0.1 and 1000 steps per second."), 400
+    simulations.current().player.play(rate)
+    return jsonify(success=True)
+
+@app.route('/pause', methods=['POST'])
+def pause():
+    simulations.current().player.pause()
+    return jsonify(success=True)
+
+@app.route('/stream')
+def stream_frames():
+    return simulations.current().stream.response()
+
+@app.route('/frame')
+def frame():
+    return jsonify(simulations.current().stream.frame())
 
 HTML_TEMPLATE = """
 <!doctype html>
@@ -90,23 +109,61 @@ HTML_TEMPLATE = """
   <body>
     <div style="text-align: center;">
       <h1>Conway's Game of Life</h1>
-      <img id="gol-image" src="data:image/png;base64,{{ plot_png }}" alt="Game of Life">
+      <canvas id="board"></canvas>
       <br><br>
       <button onclick="nextStep()">Next Step</button>
+      <br><br>
+      <input type="number" id="rate" value="10" min="1" max="60"> steps/s
+      <button onclick="play()">Play</button>
+      <button onclick="pause()">Pause</button>
+      <br><br>
+{{ job_controls|safe }}
     </div>
     <script>
+{{ stream_script|safe }}
+{{ job_script|safe }}
+
+      const view = new FrameView(document.getElementById('board'));
+      const streaming = streamFrames(view);
+      let polling = null;
+
+      // Without the stream, fetch the board after each change
+      function refresh() {
+        if (!streaming) {
+          fetchFrame(view);
+        }
+      }
+
       function nextStep() {
         fetch('/step').then(response => response.json()).then(data => {
           if (data.success) {
-            updateImage();
+            refresh();
           } else {
             alert(data.message);
           }
         });
       }
-      function updateImage() {
-        fetch('/plot.png').then(response => response.text()).then(data => {
-          document.getElementById('gol-image').src = 'data:image/png;base64,' + data;
+
+      function play() {
+        const rate = Number(document.getElementById('rate').value);
+        fetch('/play', {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json'
+          },
+          body: JSON.stringify({rate: rate})
+        }).then(() => {
+          if (!streaming) {
+            clearInterval(polling);
+            polling = setInterval(refresh, 1000 / rate);
+          }
+        });
+      }
+
+      function pause() {
+        fetch('/pause', {method: 'POST'}).then(() => {
+          clearInterval(polling);
+          refresh();
         });
       }
     </script>
@@ -1,15 +1,15 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 import numpy as np
 from mesa import Model
 from mesa.datacollection import DataCollector
 from mesa.space import PropertyLayer
-from flask import Flask, render_template_string, jsonify, request
-import matplotlib
-matplotlib.use('Agg')  
-import matplotlib.pyplot as plt
-import os
-import io
-import base64
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+from flask import Flask, render_template_string, jsonify
+from frame_stream import CLIENT_SCRIPT
+from jobs import JOB_CONTROLS, JOB_SCRIPT, json_body, json_number, register_job_routes
+from sessions import ModelRegistry, Simulation
 import threading
 import time
 
@@ -18,6 +18,8 @@ EMPTY = 0
 ELECTRON_HEAD = 1
 ELECTRON_TAIL = 2
 CONDUCTOR = 3
+# Color of each state, indexed by the state values above
+COLORS = [(0, 0, 0), (0, 0, 255), (255, 0, 0), (255, 255, 0)]
 
 class WireworldModel(Model):
     def __init__(self, width=10, height=10, initial_configuration=None):
@@ -55,39 +57,80 @@ class WireworldModel(Model):
         self.datacollector.collect(self)
 
 app = Flask(__name__)
-model = WireworldModel(width=20, height=20)
 max_steps = 100
-step_count = 0
+
+def new_simulation(scheduler):
+    return Simulation(WireworldModel(width=20, height=20), state=lambda m: m.cell_layer.data, palette=COLORS,
+                      max_steps=max_steps,
+                      # The data collector keeps a copy of the board for every step
+                      footprint=lambda m: m.cell_layer.data.nbytes * (len(m.datacollector.model_vars["State"]) + 1),
+                      metrics=lambda m: {"electron heads": int((m.cell_layer.data == ELECTRON_HEAD).sum()),
+                                         "electron tails": int((m.cell_layer.data == ELECTRON_TAIL).sum()),
+                                         "conductors": int((m.cell_layer.data == CONDUCTOR).sum())},
+                      scheduler=scheduler)
+
+# Each browser session gets its own circuit
+simulations = ModelRegistry(new_simulation)
+simulations.init_app(app)
+# Long runs in the background: /run, /run/<id> and /run/<id>/result. The data collector keeps a copy of the
+# board for every step, so runs are shorter
+register_job_routes(app, simulations, max_run_steps=10_000)
 
 @app.route('/')
 def index():
-    return render_template_string(HTML_TEMPLATE, model=model)
+    simulations.current()
+    return render_template_string(HTML_TEMPLATE, stream_script=CLIENT_SCRIPT, job_controls=JOB_CONTROLS, job_script=JOB_SCRIPT)
 
 @app.route('/toggle_cell', methods=['POST'])
 def toggle_cell():
-    data = request.json
-    x, y = data['x'], data['y']
-    current_state = model.cell_layer.data[x, y]
-    if current_state == EMPTY:
-        model.cell_layer.data[x, y] = CONDUCTOR
-    elif current_state == CONDUCTOR:
-        model.cell_layer.data[x, y] = ELECTRON_HEAD
-    elif current_state == ELECTRON_HEAD:
-        model.cell_layer.data[x, y] = ELECTRON_TAIL
-    elif current_state == ELECTRON_TAIL:
-        model.cell_layer.data[x, y] = EMPTY
+    data = json_body()
+    simulation = simulations.current()
+    with simulation.lock:
+        cells = simulation.model.cell_layer.data
+        x = json_number(data, 'x', None, 0, cells.shape[0] - 1, kind=int)
+        y = json_number(data, 'y', None, 0, cells.shape[1] - 1, kind=int)
+        if x is None or y is None:
+            return jsonify(success=False, message="The cell is outside the board."), 400
+        current_state = cells[x, y]
+        if current_state == EMPTY:
+            cells[x, y] = CONDUCTOR
+        elif current_state == CONDUCTOR:
+            cells[x, y] = ELECTRON_HEAD
+        elif current_state == ELECTRON_HEAD:
+            cells[x, y] = ELECTRON_TAIL
+        elif current_state == ELECTRON_TAIL:
+            cells[x, y] = EMPTY
+        simulation.changed()
     return jsonify(success=True)
 
 @app.route('/step')
 def step():
-    global step_count
-    if step_count < max_steps:
-        model.step()
-        step_count += 1
+    if simulations.run(simulations.current().player.step):
         return jsonify(success=True)
     else:
         return jsonify(success=False, message="Maximum number of steps reached.")
 
+@app.route('/play', methods=['POST'])
+def play():
+    rate = json_number(json_body(), 'rate', 10, 0.1, 1000)
+    if rate is None:
+        return jsonify(success=False, message="The rate must be between 0.1 and 1000 steps per second."), 400
+    simulations.current().player.play(rate)
+    return jsonify(success=True)
+
+@app.route('/pause', methods=['POST'])
+def pause():
+    simulations.current().player.pause()
+    return jsonify(success=True)
+
+@app.route('/stream')
+def stream_frames():
+    return simulations.current().stream.response()
+
+@app.route('/frame')
+def frame():
+    return jsonify(simulations.current().stream.frame())
+
 HTML_TEMPLATE = """
 <!doctype html>
 <html lang="en">
@@ -95,43 +138,37 @@ HTML_TEMPLATE = """
     <meta charset="utf-8">
     <meta name="viewport" content="width=device-width, initial-scale=1, shrink-to-fit=no">
     <title>Wireworld Visualization</title>
-    <style>
-      .grid-container {
-        display: grid;
-        grid-template-columns: repeat(20, 20px);
-        grid-gap: 1px;
-      }
-      .cell {
-        width: 20px;
-        height: 20px;
-        background-color: black;
-      }
-      .conductor {
-        background-color: yellow;
-      }
-      .electron-head {
-        background-color: blue;
-      }
-      .electron-tail {
-        background-color: red;
-      }
-    </style>
   </head>
   <body>
     <div style="text-align: center;">
       <h1>Wireworld Simulation</h1>
-      <div class="grid-container">
-        {% for x in range(20) %}
-          {% for y in range(20) %}
-            <div class="cell {{ 'conductor' if model.cell_layer.data[x, y] == 3 else 'electron-head' if model.cell_layer.data[x, y] == 1 else 'electron-tail' if model.cell_layer.data[x, y] == 2 else '' }}" onclick="toggleCell({{ x }}, {{ y }})"></div>
-          {% endfor %}
-        {% endfor %}
-      </div>
+      <canvas id="board" onclick="toggleCell(event)"></canvas>
       <br><br>
       <button onclick="nextStep()">Run Simulation</button>
+      <br><br>
+      <input type="number" id="rate" value="10" min="1" max="60"> steps/s
+      <button onclick="play()">Play</button>
+      <button onclick="pause()">Pause</button>
+      <br><br>
+{{ job_controls|safe }}
     </div>
     <script>
-      function toggleCell(x, y) {
+{{ stream_script|safe }}
+{{ job_script|safe }}
+
+      const view = new FrameView(document.getElementById('board'), 420);
+      const streaming = streamFrames(view);
+      let polling = null;
+
+      // Without the stream, fetch the board after each change
+      function refresh() {
+        if (!streaming) {
+          fetchFrame(view);
+        }
+      }
+
+      function toggleCell(event) {
+        const [x, y] = view.cellAt(event);
         fetch('/toggle_cell', {
           method: 'POST',
           headers: {
@@ -140,7 +177,7 @@ HTML_TEMPLATE = """
           body: JSON.stringify({x: x, y: y})
         }).then(response => response.json()).then(data => {
           if (data.success) {
-            location.reload();
+            refresh();
           } else {
             alert(data.message);
           }
@@ -150,12 +187,35 @@ HTML_TEMPLATE = """
       function nextStep() {
         fetch('/step').then(response => response.json()).then(data => {
           if (data.success) {
-            location.reload();
+            refresh();
           } else {
             alert(data.message);
           }
         });
       }
+
+      function play() {
+        const rate = Number(document.getElementById('rate').value);
+        fetch('/play', {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json'
+          },
+          body: JSON.stringify({rate: rate})
+        }).then(() => {
+          if (!streaming) {
+            clearInterval(polling);
+            polling = setInterval(refresh, 1000 / rate);
+          }
+        });
+      }
+
+      function pause() {
+        fetch('/pause', {method: 'POST'}).then(() => {
+          clearInterval(polling);
+          refresh();
+        });
+      }
     </script>
   </body>
 </html>